@@ -0,0 +1,649 @@
+import argparse
+import contextlib
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import resource
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from openpyxl import Workbook
+
+# ==============================================================================
+# Benchmark de extremo a extremo de las migraciones.
+#
+# Genera libros sintéticos con la misma estructura de columnas que los archivos
+# reales de formatos/, carga una BD de prueba (SQLite en memoria por defecto o
+# un esquema MySQL desechable con --mysql) y mide por migración y tamaño:
+# tiempo total, filas/s, consultas emitidas y memoria pico (RSS).
+# Cada caso corre en un proceso nuevo para que la memoria pico sea la suya.
+# ==============================================================================
+
+TAMANOS_DEFECTO = [1000, 10000, 100000]
+SEMILLA = 20250601
+
+# Esquema mínimo (dialecto MySQL) con las columnas que usan los scripts.
+# Para SQLite se traduce con `_traducir_ddl_sqlite`.
+ESQUEMA = [
+    """CREATE TABLE nompersonal (
+        personal_id INT AUTO_INCREMENT PRIMARY KEY, ficha INT, cedula VARCHAR(30),
+        nombres VARCHAR(100), apellidos VARCHAR(100), apenom VARCHAR(200), estado VARCHAR(30),
+        fecing DATE, email VARCHAR(100), correo_institucional VARCHAR(100), codnivel1 INT,
+        codbancob INT, cuentacob VARCHAR(40), tiene_discapacidad INT DEFAULT 0, discapacidad_senadis INT DEFAULT 0
+    )""",
+    "CREATE INDEX idx_nompersonal_ficha ON nompersonal (ficha)",
+    "CREATE INDEX idx_nompersonal_cedula ON nompersonal (cedula)",
+    "CREATE TABLE nomnivel1 (codorg INT PRIMARY KEY, descrip VARCHAR(100))",
+    "CREATE TABLE nombancos (cod_ban INT PRIMARY KEY, des_ban VARCHAR(100))",
+    "CREATE TABLE tipo_justificacion (idtipo INT PRIMARY KEY, descripcion VARCHAR(100), tiempo_maximo INT)",
+    """CREATE TABLE dias_incapacidad (
+        id INT AUTO_INCREMENT PRIMARY KEY, ficha INT, tipo_justificacion INT, fecha DATE, tiempo DECIMAL(10,2),
+        observacion VARCHAR(255), fecha_vence DATETIME, dias INT, horas INT, minutos INT, dias_restante INT,
+        horas_restante INT, minutos_restante INT, created_by VARCHAR(50), created_at DATETIME
+    )""",
+    """CREATE TABLE periodos_vacaciones (
+        id INT AUTO_INCREMENT PRIMARY KEY, cedula VARCHAR(30), tipo INT, fini_periodo DATE, ffin_periodo DATE,
+        asignados INT, dias INT, saldo INT, caducados INT, estatus INT, observacion VARCHAR(255), saldo_anterior INT
+    )""",
+    "CREATE TABLE abogados (id INT AUTO_INCREMENT PRIMARY KEY, nombre VARCHAR(100), activo INT)",
+    """CREATE TABLE casos_legales (
+        id INT AUTO_INCREMENT PRIMARY KEY, empleado_id INT, memo_ref VARCHAR(100), asunto TEXT, estado VARCHAR(30),
+        acciones_tomadas TEXT, fecha_recibido DATE, fecha_cierre DATE, fecha_creacion DATE, observaciones TEXT,
+        de_quien VARCHAR(100), de_empleado_id INT, de_texto_libre VARCHAR(100), para_caso VARCHAR(100),
+        para_empleado_id INT, para_texto_libre VARCHAR(100), abogado_responsable_id INT,
+        nivel_importancia VARCHAR(10), posible_riesgo VARCHAR(10), tipo_reporte VARCHAR(10),
+        created_by VARCHAR(50), activo INT
+    )""",
+    """CREATE TABLE expediente_subtipo (
+        id_expediente_subtipo INT PRIMARY KEY, id_expediente_tipo INT, nombre_subtipo VARCHAR(100), correlativo INT
+    )""",
+    """CREATE TABLE expediente (
+        cod_expediente_det INT AUTO_INCREMENT PRIMARY KEY, cedula VARCHAR(30), personal_id INT, fecha DATE,
+        fecha_inicio_suspension DATE, fecha_fin_suspension DATE, tipo INT, subtipo INT, accion_nro INT,
+        memo VARCHAR(100), falta_cometida TEXT, descripcion TEXT, estatus INT, fecha_creacion DATETIME,
+        usuario_creacion VARCHAR(50)
+    )""",
+    "CREATE TABLE cwprecue (CodCue VARCHAR(40) PRIMARY KEY, Denominacion VARCHAR(255), Tipocta INT, Tipopuc VARCHAR(10))",
+    "CREATE TABLE nomcargos (cod_cargo INT AUTO_INCREMENT PRIMARY KEY, cod_car INT UNIQUE, des_car VARCHAR(255), sueldo DECIMAL(12,2))",
+    """CREATE TABLE nomposicion (
+        id INT AUTO_INCREMENT PRIMARY KEY, nomposicion_id INT UNIQUE, descripcion_posicion VARCHAR(255),
+        sueldo_propuesto DECIMAL(12,2), sueldo_anual DECIMAL(12,2), partida VARCHAR(40), cargo_id INT,
+        mes_1 INT, sueldo_2 DECIMAL(12,2), mes_2 INT, sueldo_3 DECIMAL(12,2), mes_3 INT, sueldo_4 DECIMAL(12,2), mes_4 INT
+    )""",
+    "CREATE TABLE capacitaciones_proveedores (proveedor_id INT AUTO_INCREMENT PRIMARY KEY, nombre_proveedor VARCHAR(255))",
+    """CREATE TABLE capacitaciones_cursos (
+        curso_id INT AUTO_INCREMENT PRIMARY KEY, nombre_curso VARCHAR(255), objetivo_curso TEXT, tipo VARCHAR(30), ambito VARCHAR(30)
+    )""",
+    """CREATE TABLE capacitaciones_ofertas_cursos (
+        oferta_id INT AUTO_INCREMENT PRIMARY KEY, curso_id INT, proveedor_id INT, fecha_inicio DATE, fecha_fin DATE,
+        modalidad VARCHAR(30), costo_por_participante DECIMAL(12,2)
+    )""",
+    """CREATE TABLE capacitaciones_inscripciones (
+        inscripcion_id INT AUTO_INCREMENT PRIMARY KEY, personal_id INT, oferta_id INT, estado_asistencia VARCHAR(30),
+        costo_final_participante DECIMAL(12,2), fecha_inscripcion DATE
+    )""",
+]
+
+BANCOS = ['BANCO GENERAL', 'BANCO NACIONAL DE PANAMA', 'CAJA DE AHORROS', 'BANISTMO S.A.', 'GLOBAL BANK',
+          'BAC INTERNATIONAL BANK', 'MULTIBANK', 'BANESCO', 'CREDICORP BANK', 'BANCO ALIADO']
+NOMBRES = ['JOSE', 'MARIA', 'LUIS', 'ANA', 'CARLOS', 'SOFIA', 'JORGE', 'ELENA', 'PEDRO', 'LAURA']
+APELLIDOS = ['RUIZ', 'GONZALEZ', 'PEREZ', 'RODRIGUEZ', 'SANCHEZ', 'CASTILLO', 'MORENO', 'VARGAS', 'ARIAS', 'DUTARY']
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto', 'Septiembre', 'Octubre',
+         'Noviembre', 'Diciembre']
+
+# ------------------------------------------------------------------------------
+# Sustituto de MySQL sobre SQLite
+# ------------------------------------------------------------------------------
+
+def _traducir_ddl_sqlite(sentencia):
+    return sentencia.replace('INT AUTO_INCREMENT PRIMARY KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT')
+
+def _traducir_sql_sqlite(sentencia):
+    """Traduce las construcciones de MySQL que usan los scripts al dialecto de SQLite."""
+    sql = sentencia.strip().rstrip(';')
+    if re.match(r'(?i)^(SET|START\s+TRANSACTION)\s', sql):
+        return None
+    sql = re.sub(r'(?i)^TRUNCATE\s+TABLE\s+', 'DELETE FROM ', sql)
+    sql = re.sub(r'(?i)^DROP\s+TEMPORARY\s+TABLE\s+', 'DROP TABLE ', sql)
+    sql = sql.replace('<=>', ' IS ')
+    # INSERT ... ON DUPLICATE KEY UPDATE c = VALUES(c)  ->  INSERT ... ON CONFLICT DO UPDATE SET c = excluded.c
+    if re.search(r'(?i)\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', sql):
+        sql = re.sub(r'(?i)\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', 'ON CONFLICT DO UPDATE SET', sql)
+        sql = re.sub(r'(?i)\bVALUES\((\w+)\)', r'excluded.\1', sql)
+    # UPDATE t a JOIN s b ON cond SET a.x = b.x  ->  UPDATE t AS a SET x = b.x FROM s AS b WHERE cond
+    update_join = re.match(r'(?is)^UPDATE\s+(\w+)\s+(\w+)\s+JOIN\s+(\w+)\s+(\w+)\s+ON\s+(.+?)\s+SET\s+(.+)$', sql)
+    if update_join:
+        tabla, alias, origen, alias_origen, condicion, asignaciones = update_join.groups()
+        asignaciones = re.sub(rf'\b{alias}\.(\w+)\s*=', r'\1 =', asignaciones)
+        sql = f"UPDATE {tabla} AS {alias} SET {asignaciones} FROM {origen} AS {alias_origen} WHERE {condicion}"
+    sql = re.sub(r'(?i)@@max_allowed_packet', str(64 * 1024 * 1024), sql)
+    return sql.replace('%s', '?')
+
+def _concat(*valores):
+    # CONCAT de MySQL devuelve NULL si cualquier argumento es NULL
+    if any(v is None for v in valores):
+        return None
+    return ''.join(str(v) for v in valores)
+
+def _anio(valor):
+    return int(str(valor)[:4]) if valor else None
+
+def _adaptadores_sqlite():
+    sqlite3.register_adapter(Decimal, float)
+    sqlite3.register_adapter(date, lambda d: d.isoformat())
+    sqlite3.register_adapter(datetime, lambda d: d.isoformat(' '))
+    sqlite3.register_converter('DATE', lambda b: date.fromisoformat(b.decode()[:10]))
+    sqlite3.register_converter('DATETIME', lambda b: datetime.fromisoformat(b.decode()))
+    try:
+        import numpy as np
+        sqlite3.register_adapter(np.int64, int)
+        sqlite3.register_adapter(np.float64, float)
+    except ImportError:
+        pass
+
+class CursorSQLite:
+    """Cursor con la interfaz de mysql.connector que usan los scripts."""
+
+    def __init__(self, conexion):
+        self._cursor = conexion.cursor()
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, operacion, parametros=()):
+        carga = re.match(r"(?is)^\s*LOAD\s+DATA\s+LOCAL\s+INFILE\s+'([^']+)'\s+INTO\s+TABLE\s+(\w+)\b.*\(([^)]*)\)\s*$", operacion)
+        if carga:
+            self._cargar_datos(*carga.groups())
+            return
+        # Índice único de una sola columna (sesion_db.indice_unico), con los PRAGMA de SQLite
+        if re.search(r'(?i)\binformation_schema\.STATISTICS\b', operacion):
+            tabla, columna = parametros
+            unicos = [[c[2] for c in self._cursor.execute(f"PRAGMA index_info({i[1]})").fetchall()]
+                      for i in self._cursor.execute(f"PRAGMA index_list({tabla})").fetchall() if i[2]]
+            clave = [c[1] for c in self._cursor.execute(f"PRAGMA table_info({tabla})").fetchall() if c[5]]
+            self._cursor.execute("SELECT ?", (int([columna] in unicos or clave == [columna]),))
+            return
+        # Claves foráneas y triggers de una tabla (migracion_vacaciones.dependencias_periodos)
+        if re.search(r'(?i)\binformation_schema\.REFERENTIAL_CONSTRAINTS\b', operacion):
+            tabla = parametros[0]
+            tablas = [t for (t,) in self._cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()]
+            claves = [(f"fk_{t}_{fk[0]}", t, fk[2]) for t in tablas
+                      for fk in self._cursor.execute(f"PRAGMA foreign_key_list({t})").fetchall()
+                      if fk[1] == 0 and tabla in (t, fk[2])]
+            self._resultado(claves, 3)
+            return
+        if re.search(r'(?i)\binformation_schema\.TRIGGERS\b', operacion):
+            self._cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", tuple(parametros))
+            return
+        # CREATE TABLE x LIKE y: se copia la definición guardada de y (sin índices)
+        crear_como = re.match(r'(?i)^\s*CREATE\s+TABLE\s+(\w+)\s+LIKE\s+(\w+)\s*$', operacion)
+        if crear_como:
+            nueva, original = crear_como.groups()
+            definicion = self._cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (original,)).fetchone()[0]
+            self._cursor.execute(re.sub(rf'(?i)^CREATE\s+TABLE\s+"?{original}"?', f'CREATE TABLE {nueva}', definicion))
+            self.rowcount = 0
+            return
+        # RENAME TABLE a TO b, c TO d: un ALTER TABLE ... RENAME por par, en orden
+        renombrar = re.match(r'(?is)^\s*RENAME\s+TABLE\s+(.+?)\s*$', operacion)
+        if renombrar:
+            for par in renombrar.group(1).split(','):
+                origen, destino = re.split(r'(?i)\s+TO\s+', par.strip())
+                self._cursor.execute(f"ALTER TABLE {origen} RENAME TO {destino}")
+            self.rowcount = 0
+            return
+        sql = _traducir_sql_sqlite(operacion)
+        if sql is None:
+            self.rowcount = 0
+            return
+        self._cursor.execute(sql, tuple(parametros or ()))
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+
+    def _resultado(self, filas, columnas):
+        # Deja `filas` como resultado del cursor (para emular consultas a information_schema)
+        if filas:
+            marcas = ', '.join(['(' + ', '.join('?' * columnas) + ')'] * len(filas))
+            self._cursor.execute(f"VALUES {marcas}", [v for fila in filas for v in fila])
+        else:
+            self._cursor.execute(f"SELECT {', '.join(['NULL'] * columnas)} WHERE 0")
+
+    def _cargar_datos(self, ruta, tabla, columnas):
+        # LOAD DATA LOCAL INFILE con el formato por defecto (tabulador, escape con barra invertida, \N = NULL)
+        escapes = {'t': '\t', 'n': '\n', 'r': '\r', '0': '\0', '\\': '\\'}
+        def valor(campo):
+            if campo == '\\N':
+                return None
+            return re.sub(r'\\(.)', lambda m: escapes.get(m.group(1), m.group(1)), campo)
+        with open(ruta, encoding='utf-8') as archivo:
+            filas = [tuple(valor(c) for c in linea.rstrip('\n').split('\t')) for linea in archivo]
+        columnas = [c.strip() for c in columnas.split(',')]
+        self._cursor.executemany(
+            f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})", filas
+        )
+        self.rowcount = len(filas)
+
+    def executemany(self, operacion, secuencia):
+        self._cursor.executemany(_traducir_sql_sqlite(operacion), [tuple(p) for p in secuencia])
+        self.rowcount = self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+class ConexionSQLite:
+    """Conexión SQLite en memoria que se comporta como una de mysql.connector."""
+
+    def __init__(self):
+        _adaptadores_sqlite()
+        self._conexion = sqlite3.connect(':memory:', detect_types=sqlite3.PARSE_DECLTYPES)
+        self._conexion.create_function('CONCAT', -1, _concat)
+        self._conexion.create_function('YEAR', 1, _anio)
+        self._conexion.create_function('NOW', 0, lambda: datetime.now().isoformat(' ', 'seconds'))
+        self.autocommit = False
+        self._abierta = True
+
+    def cursor(self, buffered=None, prepared=None, dictionary=None):
+        return CursorSQLite(self._conexion)
+
+    def commit(self):
+        self._conexion.commit()
+
+    def rollback(self):
+        self._conexion.rollback()
+
+    def is_connected(self):
+        return self._abierta
+
+    def close(self):
+        # Se mantiene abierta: el benchmark consulta la BD después de que el script "cierra"
+        self._abierta = False
+
+# ------------------------------------------------------------------------------
+# Conteo de consultas (funciona sobre SQLite o sobre una conexión MySQL real)
+# ------------------------------------------------------------------------------
+
+def plantilla_sql(operacion):
+    return re.sub(r'\s+', ' ', operacion).strip()
+
+class CursorContado:
+    def __init__(self, cursor, contador):
+        self._cursor = cursor
+        self._contador = contador
+
+    def execute(self, operacion, parametros=()):
+        self._contador[plantilla_sql(operacion)] += 1
+        return self._cursor.execute(operacion, parametros)
+
+    def executemany(self, operacion, secuencia):
+        secuencia = list(secuencia)
+        # mysql.connector convierte un INSERT ... VALUES en una sola sentencia multi-fila;
+        # cualquier otra sentencia se envía una vez por fila
+        veces = 1 if re.match(r'(?is)^\s*INSERT\s.*\sVALUES\s', operacion) else len(secuencia)
+        self._contador[plantilla_sql(operacion)] += veces
+        return self._cursor.executemany(operacion, secuencia)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+class ConexionContada:
+    def __init__(self, conexion):
+        self._conexion = conexion
+        self.consultas = Counter()
+
+    def cursor(self, *args, **kwargs):
+        return CursorContado(self._conexion.cursor(*args, **kwargs), self.consultas)
+
+    def close(self):
+        pass
+
+    def cerrar(self):
+        self._conexion.close()
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def __setattr__(self, nombre, valor):
+        if nombre in ('_conexion', 'consultas'):
+            object.__setattr__(self, nombre, valor)
+        else:
+            setattr(self._conexion, nombre, valor)
+
+def crear_bd_benchmark(motor):
+    """Crea el esquema vacío en SQLite o en el esquema MySQL BENCH_DB_DATABASE."""
+    if motor == 'sqlite':
+        conexion = ConexionSQLite()
+        traducir = _traducir_ddl_sqlite
+    else:
+        import mysql.connector
+        from sesion_db import configuracion_db
+        configuracion = configuracion_db()
+        configuracion['database'] = os.getenv('BENCH_DB_DATABASE')
+        if not configuracion['database'] or configuracion['database'] == os.getenv('DB_DATABASE'):
+            raise RuntimeError("Defina BENCH_DB_DATABASE con un esquema desechable distinto de DB_DATABASE.")
+        conexion = mysql.connector.connect(**configuracion)
+        traducir = lambda sentencia: sentencia
+        cursor = conexion.cursor()
+        for tabla in re.findall(r'CREATE TABLE (\w+)', ' '.join(ESQUEMA)):
+            cursor.execute(f"DROP TABLE IF EXISTS {tabla}")
+        cursor.close()
+
+    cursor = conexion.cursor()
+    for sentencia in ESQUEMA:
+        cursor.execute(traducir(sentencia))
+    cursor.close()
+    conexion.commit()
+    return conexion
+
+# ------------------------------------------------------------------------------
+# Datos sintéticos
+# ------------------------------------------------------------------------------
+
+def _empleado(i):
+    """Empleado sintético i (0-based): ficha, cédula, nombres, apellidos, fecha de ingreso."""
+    rnd = random.Random(SEMILLA + i)
+    return {
+        'ficha': i + 1,
+        'cedula': f"8-{100 + i // 10000}-{i % 10000}",
+        'nombres': f"{NOMBRES[i % len(NOMBRES)]} {i}",
+        'apellidos': APELLIDOS[(i // len(NOMBRES)) % len(APELLIDOS)],
+        'fecing': date(1990, 1, 1) + timedelta(days=rnd.randint(0, 365 * 34)),
+    }
+
+def poblar_bd(conexion, filas):
+    """Carga `filas` empleados y los catálogos que consultan los scripts."""
+    cursor = conexion.cursor()
+    empleados = [_empleado(i) for i in range(filas)]
+    cursor.executemany(
+        "INSERT INTO nompersonal (ficha, cedula, nombres, apellidos, apenom, estado, fecing, email, codnivel1) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        [(e['ficha'], e['cedula'], e['nombres'], e['apellidos'], f"{e['apellidos']} {e['nombres']}",
+          'De Baja' if e['ficha'] % 50 == 0 else 'Activo', e['fecing'], f"personal{e['ficha']}@correo.com",
+          e['ficha'] % 12 + 1) for e in empleados]
+    )
+    cursor.executemany("INSERT INTO nomnivel1 (codorg, descrip) VALUES (%s, %s)",
+                       [(i, f"VP {i}") for i in range(1, 13)])
+    cursor.executemany("INSERT INTO nombancos (cod_ban, des_ban) VALUES (%s, %s)",
+                       [(i + 1, nombre.title()) for i, nombre in enumerate(BANCOS)])
+    cursor.execute("INSERT INTO tipo_justificacion (idtipo, descripcion, tiempo_maximo) VALUES (2, 'Ley 15 - 144 horas', 144)")
+    cursor.executemany(
+        "INSERT INTO expediente_subtipo (id_expediente_subtipo, id_expediente_tipo, nombre_subtipo, correlativo) "
+        "VALUES (%s, 5, %s, 0)",
+        [(1, 'Advertencia verbal'), (3, 'Amonestación Escrita'), (4, 'Suspensión'), (5, 'Despido')]
+    )
+    cursor.close()
+    conexion.commit()
+
+def _guardar(libro, ruta):
+    libro.save(ruta)
+    return ruta
+
+def _ficha_excel(ficha, filas):
+    # ~2% de las filas apuntan a empleados que no existen en la BD
+    return ficha + filas if ficha % 50 == 7 else ficha
+
+def generar_bancos(ruta, filas):
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Reporte (2)')
+    hoja.append(['NUMERO_EMPLEADO', 'IDENTIFICACION', 'NO_CTA_ACH', 'TIPO_CUENTA', 'BANCO'])
+    for i in range(filas):
+        e = _empleado(i)
+        banco = BANCOS[i % len(BANCOS)]
+        if i % 97 == 0:
+            banco = banco.replace('BANCO', 'BANC0')  # errores de digitación reales
+        hoja.append([f"{e['ficha']:010d}", e['cedula'], str(400000000000 + i), 'AHORROS', banco])
+    return _guardar(libro, ruta)
+
+def generar_correos(ruta, filas):
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Hoja2')
+    hoja.append(['Clave', 'Nombre', 'Vicepresidencia', 'Departamento', 'Correo electrónico'])
+    for i in range(filas):
+        e = _empleado(i)
+        correo = None if i % 20 == 0 else f"usuario{e['ficha']}@tocumenpanama.aero"
+        hoja.append([f"E{_ficha_excel(e['ficha'], filas):05d}", e['nombres'], '400 VP Recursos Humanos',
+                     '400 VP Recursos Humanos', correo])
+    return _guardar(libro, ruta)
+
+def generar_144(ruta, filas):
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('linda ')
+    hoja.append(['N°', 'Nombre', 'N° de Empleado', 'Cédula', 'Vicepresidencia', 'Sección', 'Parentesco', 'Motivo',
+                 'Fecha de trámite', 'Status Laboral', 'Aeropuerto ', 'Analista '])
+    for i in range(filas):
+        e = _empleado(i)
+        hoja.append([i + 1, e['nombres'], f"E{_ficha_excel(e['ficha'], filas):05d}", e['cedula'], 'Operaciones',
+                     'Plataforma', 'Hijo', 'Discapacidad', datetime(2024, 2, 8), 'Activo', 'AITSA', 'LINDA'])
+    return _guardar(libro, ruta)
+
+def generar_vacaciones(ruta, filas):
+    rnd = random.Random(SEMILLA)
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Hoja1')
+    hoja.append(['NO. DE EMPLEADO', 'NOMBRE', 'No. DE CEDULA', 'DIAS PENDIENTES  A LA FECHA', 'MES DE ANIVERSARIO',
+                 'DIAS CADUCADOS', 'SUCURSAL'])
+    for i in range(filas):
+        e = _empleado(i)
+        pendientes = rnd.choice([0, 0, 15, 30, 45, 60, 90, -5])
+        caducados = rnd.choice([0, 0, 0, 10, 30, 45])
+        hoja.append([f"{_ficha_excel(e['ficha'], filas):05d}", e['nombres'], e['cedula'], pendientes,
+                     MESES[e['fecing'].month - 1], caducados, 'AITSA'])
+    return _guardar(libro, ruta)
+
+def generar_casos(ruta, filas):
+    asuntos = ['Solicitud de evaluación de caso de nivelación de salario', 'Demanda laboral en tribunal',
+               'Consulta sobre vacaciones', 'Investigación por denuncia', 'Proceso ante fiscalía']
+    responsables = ['M. Allen', 'R. Rivera', 'AFRA', 'AFV Asoc', 'IGRA']
+    libro = Workbook(write_only=True)
+    externos = libro.create_sheet('Externos')
+    externos.append(['No.', 'Nombre', 'Cédula', 'SS', 'Género', 'F.Nacimiento', 'Cargo', 'Departamento', 'Ato.',
+                     'VP/Gte', 'F.Ingreso', 'Salario', 'F.Baja', 'Motivo de Baja', 'Ref', 'Asunto', 'Fecha',
+                     'Fecha de Cierre', 'Acción', 'Responsable', 'Estado'])
+    internos = libro.create_sheet('Internos')
+    internos.append(['No.', 'Nombre', 'Cédula', 'Género', 'F.Nacimiento', 'Cargo', 'Departamento', 'Ato.', 'VP/Gte',
+                     'F.Ingreso', 'Salario', 'Ref', 'Para', 'De', 'Asunto', 'F. Recibido', 'F. Cierre', 'Acciones',
+                     'Responsable', 'Estado'])
+    for i in range(filas):
+        e = _empleado(i)
+        ficha = f"E{_ficha_excel(e['ficha'], filas):05d}"
+        asunto = asuntos[i % len(asuntos)]
+        responsable = responsables[i % len(responsables)]
+        estado = 'Cerrado' if i % 3 == 0 else 'En proceso'
+        if i % 2 == 0:
+            externos.append([ficha, e['nombres'], f"'{e['cedula']}", 9999999, 'M', datetime(1980, 1, 1), 'Cargo',
+                             'Departamento', 'AIT', 'C. Arias', datetime(2010, 1, 1), 1000, None, None,
+                             f"Exp. {i}-MITRADEL", asunto, datetime(2020, 1, 1), None, 'Seguimiento', responsable,
+                             estado])
+        else:
+            internos.append([ficha, e['nombres'], f"'{e['cedula']}", 'F', datetime(1980, 1, 1), 'Cargo',
+                             'Departamento', 'AIT', 'C. Arias', datetime(2010, 1, 1), 1000, f"Memo RRHH-{i}",
+                             'M. Allen', 'S. Vargas', asunto, datetime(2020, 1, 1), None, 'Seguimiento', responsable,
+                             estado])
+    return _guardar(libro, ruta)
+
+def generar_sanciones(ruta, filas):
+    tipos = ['Amonestación', 'Suspensión', 'Verbal', 'Amonestación Panamá Solidario', 'Despido']
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Sanciones')
+    hoja.append(['No.', 'MEF', 'Nombre', 'Cédula ', 'S.S.', 'Género', 'Fecha de Nacimiento', 'Cargo', 'Dep', 'Secc',
+                 'Eqp', 'Ato.', 'VP / Gte', 'Fecha de Ingreso', 'Salario', 'Memo', 'Fecha', 'Tipo', 'Falta Cometida',
+                 'Observaciones'])
+    for i in range(filas):
+        e = _empleado(i)
+        hoja.append([f"E{_ficha_excel(e['ficha'], filas):05d}", i, e['nombres'], f"'{e['cedula']}", 9999999, 'M',
+                     datetime(1980, 1, 1), 'Cargo', 'Dep', 'Secc', 'Eqp', 'AIT', 'C. Dutary', datetime(2010, 1, 1),
+                     1000, f"{i}-2022-OPTLA" if i % 4 else None, datetime(2022, 5, 1), tipos[i % len(tipos)],
+                     'Llegada tardía', None])
+    return _guardar(libro, ruta)
+
+def generar_capacitaciones(ruta, filas):
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Control de Capacitaciones 2022')
+    hoja.append(['ITEM', 'NOMBRE DE LA CAPACITACIÓN', 'OBJETIVO', 'ÁREA / VICEPRESIDENCIA', 'NOMBRE', 'APELLIDO',
+                 'LUGAR / MODALIDAD', 'PROVEEDOR', 'TIPO DE CAPACITACIÓN', 'COSTO POR COLABORADOR', 'FECHA',
+                 'DÍAS DE \nCAPACITACIÓN', 'HORARIO', 'HORAS'])
+    for i in range(filas):
+        e = _empleado(i)
+        curso = i // 10
+        # Como en el archivo real, los datos del curso solo aparecen en la primera fila del grupo
+        if i % 10 == 0:
+            hoja.append([curso + 1, f"Curso {curso}", 'Objetivo del curso', 'Auditoría Interna', e['nombres'],
+                         e['apellidos'], 'VIRTUAL', f"Proveedor {curso % 25}", 'Externa', 350,
+                         f"{curso % 28 + 1} de junio de 2022", 1, '8:00 a.m. - 1:00 p.m.', 5])
+        else:
+            hoja.append([None, None, None, 'Auditoría Interna', e['nombres'], e['apellidos'], None, None, None,
+                         None, None, None, None, None])
+    return _guardar(libro, ruta)
+
+def generar_estructura(ruta, filas):
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Export')
+    hoja.append(['anio', 'codigo', 'posicion', 'nombre', 'apellido', 'cedula', 'tipo_presupuesto', 'programa',
+                 'subprograma', 'actividad', 'fuente', 'objeto_gasto', 'unidad_ejecutora', 'sueldo1', 'mes1',
+                 'sueldo2', 'mes2', 'sueldo3', 'mes3', 'sueldo4', 'mes4', 'sueldo_planilla', 'cargo_entidad',
+                 'desc_cargo', 'cargo_presupuestario'])
+    for i in range(filas):
+        e = _empleado(i)
+        cargo = f"{(i % max(filas // 5, 1)) + 11000:07d}"
+        hoja.append(['2025', '202', str(i + 1), e['nombres'], e['apellidos'], e['cedula'], '0', str(i % 3 + 1),
+                     f"{i % 4 + 1:02d}", f"{i % 6 + 1:02d}", '001', f"{i % 40 + 1:03d}", '1000001', 1500, '12', 0,
+                     '0', 0, '0', 0, '0', 1500 + i % 100, cargo, f"CARGO {cargo}", cargo])
+    return _guardar(libro, ruta)
+
+# ------------------------------------------------------------------------------
+# Casos de benchmark
+# ------------------------------------------------------------------------------
+
+def _ejecutar_bancos(modulo, ruta, conexion):
+    modulo.XLSX_FILE_PATH = ruta
+    modulo.crear_conexion_db = lambda *args, **kwargs: conexion
+    modulo.update_employee_bank_info()
+
+def _ejecutar_capacitaciones(modulo, ruta, conexion):
+    modulo.EXCEL_FILE_PATH = ruta
+    modulo.crear_conexion_db = lambda *args, **kwargs: conexion
+    modulo.main()
+
+def _ejecutar_casos(modulo, ruta, conexion):
+    for hoja in ['Externos', 'Internos']:
+        modulo.migrar_casos_desde_hoja_excel(ruta, hoja, conexion)
+
+# nombre: (módulo, generador, archivo, función que ejecuta la migración)
+CASOS = {
+    'bancos': ('migrar_bancos', generar_bancos, 'Listado_Empleado_InfoBanco.xlsx', _ejecutar_bancos),
+    'correos': ('migracion_correos', generar_correos, 'Correos_V2.xlsx',
+                lambda m, ruta, c: m.migrar_correos_desde_excel(ruta, c)),
+    'discapacidad_144': ('migracion_144', generar_144, '144_horas.xlsx',
+                         lambda m, ruta, c: m.migrar_discapacidad_desde_excel(ruta, c)),
+    'vacaciones': ('migracion_vacaciones', generar_vacaciones, 'VACACIONES-SINTETICO.xlsx',
+                   lambda m, ruta, c: m.migrar_vacaciones_desde_excel(ruta, c)),
+    'casos': ('migracion_casos', generar_casos, 'CasosAbogados.xlsx', _ejecutar_casos),
+    'sanciones': ('migracion_sanciones', generar_sanciones, 'CasosSanciones.xlsx',
+                  lambda m, ruta, c: m.migrar_sanciones_desde_excel(ruta, c)),
+    'capacitaciones': ('migracion_capacitaciones', generar_capacitaciones, 'Control de Capacitaciones excel.xlsx',
+                       _ejecutar_capacitaciones),
+    'estructura': ('migracion_posicion', generar_estructura, 'Estructura-Junio-2025.xlsx',
+                   lambda m, ruta, c: m.migrar_estructura(ruta, c)),
+}
+
+def ejecutar_caso(nombre, filas, ruta_excel, motor, directorio_cache):
+    """Corre en un proceso nuevo: prepara la BD, ejecuta la migración y devuelve las métricas."""
+    # Caché de hojas vacía: se mide la lectura en frío del xlsx
+    os.environ['MIGRACION_CACHE_DIR'] = directorio_cache
+    modulo_nombre, _, _, ejecutar = CASOS[nombre]
+    modulo = importlib.import_module(modulo_nombre)
+    from registro import esperar_registro
+
+    base = crear_bd_benchmark(motor)
+    poblar_bd(base, filas)
+    conexion = ConexionContada(base)
+
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+        inicio = time.perf_counter()
+        ejecutar(modulo, ruta_excel, conexion)
+        segundos = time.perf_counter() - inicio
+        # Los mensajes aún en la cola también deben ir a devnull
+        esperar_registro()
+
+    conexion.cerrar()
+    total_consultas = sum(conexion.consultas.values())
+    return {
+        'migracion': nombre,
+        'filas': filas,
+        'segundos': round(segundos, 3),
+        'filas_por_segundo': round(filas / segundos, 1) if segundos else None,
+        'consultas': total_consultas,
+        'consultas_por_fila': round(total_consultas / filas, 2),
+        'rss_pico_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'plantillas_mas_frecuentes': conexion.consultas.most_common(5),
+    }
+
+def imprimir_resultados(resultados):
+    print("\n" + "=" * 96)
+    print(f"{'Migración':<18} {'Filas':>8} {'Segundos':>10} {'Filas/s':>10} {'Consultas':>10} "
+          f"{'Cons/fila':>10} {'RSS pico MB':>12}")
+    print("-" * 96)
+    for r in resultados:
+        if 'error' in r:
+            print(f"{r['migracion']:<18} {r['filas']:>8} ERROR: {r['error']}")
+            continue
+        print(f"{r['migracion']:<18} {r['filas']:>8} {r['segundos']:>10.2f} {r['filas_por_segundo']:>10.1f} "
+              f"{r['consultas']:>10} {r['consultas_por_fila']:>10.2f} {r['rss_pico_mb']:>12.1f}")
+    print("=" * 96)
+
+# --- Ejecución Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de las migraciones con datos sintéticos.")
+    parser.add_argument('migraciones', nargs='*', help=f"Por defecto todas: {', '.join(CASOS)}")
+    parser.add_argument('--filas', type=int, nargs='+', default=TAMANOS_DEFECTO)
+    parser.add_argument('--mysql', action='store_true',
+                        help="Usa el esquema MySQL BENCH_DB_DATABASE en lugar de SQLite en memoria")
+    parser.add_argument('--json', help="Guarda los resultados en este archivo")
+    args = parser.parse_args()
+
+    seleccion = args.migraciones or list(CASOS)
+    motor = 'mysql' if args.mysql else 'sqlite'
+    resultados = []
+    contexto = multiprocessing.get_context('spawn')
+
+    with tempfile.TemporaryDirectory(prefix='bench_migraciones_') as directorio:
+        for filas in args.filas:
+            for nombre in seleccion:
+                _, generador, archivo, _ = CASOS[nombre]
+                ruta_excel = os.path.join(directorio, f"{filas}_{archivo}")
+                if not os.path.exists(ruta_excel):
+                    print(f"Generando {ruta_excel}...")
+                    generador(ruta_excel, filas)
+
+                print(f"▶️  {nombre} con {filas} filas ({motor})")
+                directorio_cache = tempfile.mkdtemp(dir=directorio)
+                with contexto.Pool(1) as pool:
+                    try:
+                        resultados.append(pool.apply(ejecutar_caso, (nombre, filas, ruta_excel, motor, directorio_cache)))
+                    except Exception as e:
+                        resultados.append({'migracion': nombre, 'filas': filas, 'error': str(e)})
+
+    imprimir_resultados(resultados)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, ensure_ascii=False, indent=2)
+        print(f"Resultados guardados en {args.json}")
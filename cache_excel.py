@@ -0,0 +1,86 @@
+import pandas as pd
+import hashlib
+import os
+import re
+from instrumentacion import fase
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow es opcional: sin él se lee el xlsx directamente
+    pa = None
+
+# Directorio donde se guardan las hojas ya parseadas (Arrow IPC)
+CACHE_DIR = os.getenv('MIGRACION_CACHE_DIR', '.cache_excel')
+
+def hash_archivo(ruta, tamano_bloque=1024 * 1024):
+    """SHA-256 del contenido del archivo, leído por bloques."""
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(tamano_bloque), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+def _ruta_cache(hash_contenido, hoja, dtype):
+    hoja_slug = re.sub(r'[^A-Za-z0-9_-]+', '_', str(hoja))
+    variante = 'texto' if dtype is str else 'nativo'
+    return os.path.join(CACHE_DIR, f"{hash_contenido}-{hoja_slug}-{variante}.arrow")
+
+def _a_tabla_arrow(df):
+    """
+    Convierte el DataFrame a tabla Arrow. Las columnas `object` con tipos mezclados
+    (ej. fichas numéricas y 'E03940' en la misma columna) se guardan como texto.
+    """
+    df = df.copy()
+    for columna in df.columns:
+        if df[columna].dtype != object:
+            continue
+        try:
+            pa.array(df[columna], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[columna] = df[columna].map(lambda v: str(v) if pd.notna(v) else None)
+    df.columns = [str(c) for c in df.columns]
+    return pa.Table.from_pandas(df, preserve_index=True)
+
+def _leer_cache(ruta_cache):
+    # memory_map evita copiar el archivo completo a memoria antes de reconstruir la tabla
+    with pa.memory_map(ruta_cache, 'r') as fuente:
+        return pa.ipc.open_file(fuente).read_all().to_pandas()
+
+def _escribir_cache(ruta_cache, df):
+    """Guarda `df` en la caché y retorna la tabla Arrow escrita."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tabla = _a_tabla_arrow(df)
+    ruta_temporal = f"{ruta_cache}.{os.getpid()}.tmp"
+    with pa.OSFile(ruta_temporal, 'wb') as destino:
+        with pa.ipc.new_file(destino, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+    # Reemplazo atómico: otro proceso nunca ve un archivo a medio escribir
+    os.replace(ruta_temporal, ruta_cache)
+    return tabla
+
+@fase('lectura')
+def leer_hoja_cacheada(ruta_excel, hoja=None, dtype=None):
+    """
+    Equivalente a pd.read_excel(ruta_excel, sheet_name=hoja, dtype=dtype) con caché por
+    contenido: la primera lectura guarda la hoja parseada como Arrow IPC en CACHE_DIR y
+    las siguientes (de este u otro script) la mapean a memoria sin volver a abrir el xlsx.
+    Si el archivo cambia, cambia su hash y se vuelve a parsear. La primera lectura también
+    retorna la hoja reconstruida desde Arrow, así ambas entregan los mismos tipos.
+    """
+    hoja_excel = hoja if hoja is not None else 0
+    if pa is None:
+        return pd.read_excel(ruta_excel, sheet_name=hoja_excel, dtype=dtype)
+
+    ruta_cache = _ruta_cache(hash_archivo(ruta_excel), hoja_excel, dtype)
+    if os.path.exists(ruta_cache):
+        try:
+            return _leer_cache(ruta_cache)
+        except (OSError, pa.ArrowInvalid) as e:
+            print(f"Caché inválida para {ruta_excel} [{hoja_excel}], se vuelve a parsear: {e}")
+
+    df = pd.read_excel(ruta_excel, sheet_name=hoja_excel, dtype=dtype)
+    try:
+        return _escribir_cache(ruta_cache, df).to_pandas()
+    except (OSError, pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        print(f"No se pudo guardar la caché de {ruta_excel} [{hoja_excel}]: {e}")
+    return df
@@ -0,0 +1,125 @@
+import os
+from cache_excel import hash_archivo
+
+# Filas entre commits cuando el script no indica otro valor
+COMMIT_CADA = int(os.getenv('MIGRACION_COMMIT_CADA', 500))
+
+TABLA_CHECKPOINT = 'migracion_checkpoint'
+
+DDL_CHECKPOINT = f"""
+    CREATE TABLE IF NOT EXISTS {TABLA_CHECKPOINT} (
+        script VARCHAR(100) NOT NULL,
+        archivo_hash CHAR(64) NOT NULL,
+        ultima_fila INT NOT NULL,
+        completado TINYINT NOT NULL DEFAULT 0,
+        actualizado DATETIME NULL,
+        PRIMARY KEY (script, archivo_hash)
+    )
+"""
+
+class Checkpoint:
+    """
+    Commit cada N filas con un registro de avance (hash del archivo + última fila confirmada)
+    en la tabla `migracion_checkpoint`. El registro se actualiza en la misma transacción que
+    los datos, así que nunca apunta a filas que no quedaron guardadas.
+
+    Si al iniciar existe un checkpoint sin completar para el mismo script y el mismo archivo,
+    con al menos una fila confirmada, `reanudando` es True y `pendiente(fila)` descarta las filas
+    ya confirmadas. Un checkpoint en -1 (la ejecución anterior no confirmó ninguna fila, por
+    ejemplo porque falló la limpieza inicial) cuenta como ejecución nueva.
+    En modo plan (plan_migracion) solo se conservan los commits por lote: no se lee ni se
+    registra nada en la tabla de checkpoints.
+    `al_confirmar` (opcional) se llama antes de cada commit, para enviar filas acumuladas en
+    memoria en la misma transacción que el checkpoint.
+    """
+
+    def __init__(self, connection, script, ruta_archivo, commit_cada=None, al_confirmar=None):
+        self.connection = connection
+        self.script = script
+        self.archivo_hash = hash_archivo(ruta_archivo)
+        self.commit_cada = commit_cada or COMMIT_CADA
+        self.al_confirmar = al_confirmar
+        self.ultima_fila = None
+        self._fila_actual = None
+        self.filas_sin_commit = 0
+        self._persistente = not getattr(connection, 'modo_plan', False)
+        if not self._persistente:
+            return
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute(DDL_CHECKPOINT)
+            cursor.execute(
+                f"SELECT ultima_fila FROM {TABLA_CHECKPOINT} WHERE script = %s AND archivo_hash = %s AND completado = 0",
+                (script, self.archivo_hash)
+            )
+            resultado = cursor.fetchone()
+            if resultado:
+                if resultado[0] >= 0:
+                    self.ultima_fila = resultado[0]
+            else:
+                # Ejecución nueva: se descartan checkpoints de versiones anteriores del archivo
+                cursor.execute(f"DELETE FROM {TABLA_CHECKPOINT} WHERE script = %s", (script,))
+                cursor.execute(
+                    f"""INSERT INTO {TABLA_CHECKPOINT} (script, archivo_hash, ultima_fila, completado, actualizado)
+                        VALUES (%s, %s, -1, 0, NOW())""",
+                    (script, self.archivo_hash)
+                )
+        finally:
+            cursor.close()
+        connection.commit()
+
+    @property
+    def reanudando(self):
+        return self.ultima_fila is not None
+
+    def pendiente(self, fila):
+        """True si la fila aún no fue confirmada en una ejecución anterior."""
+        return self.ultima_fila is None or fila > self.ultima_fila
+
+    def filas(self, filas):
+        """
+        Envuelve un iterable de (fila, datos): salta las filas ya confirmadas y marca cada
+        fila como procesada cuando el bucle pide la siguiente (aunque haya hecho `continue`).
+        """
+        for fila, datos in filas:
+            if not self.pendiente(fila):
+                continue
+            yield fila, datos
+            self.avanzar(fila)
+
+    def avanzar(self, fila):
+        """Marca la fila como procesada; cada `commit_cada` filas guarda el checkpoint y confirma."""
+        self._fila_actual = fila
+        self.filas_sin_commit += 1
+        if self.filas_sin_commit >= self.commit_cada:
+            self.confirmar()
+
+    def confirmar(self):
+        if self.al_confirmar:
+            self.al_confirmar()
+        if self._fila_actual is not None:
+            self._guardar(self._fila_actual, completado=0)
+        self.connection.commit()
+        self.filas_sin_commit = 0
+
+    def completar(self):
+        """Confirma lo pendiente y marca la ejecución como terminada (la próxima empieza de cero)."""
+        if self.al_confirmar:
+            self.al_confirmar()
+        self._guardar(self._fila_actual if self._fila_actual is not None else -1, completado=1)
+        self.connection.commit()
+        self.filas_sin_commit = 0
+
+    def _guardar(self, fila, completado):
+        if not self._persistente:
+            return
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(
+                f"""UPDATE {TABLA_CHECKPOINT} SET ultima_fila = %s, completado = %s, actualizado = NOW()
+                    WHERE script = %s AND archivo_hash = %s""",
+                (fila, completado, self.script, self.archivo_hash)
+            )
+        finally:
+            cursor.close()
@@ -0,0 +1,121 @@
+import pandas as pd
+from mysql.connector import Error
+import re
+from collections import namedtuple
+from instrumentacion import fase
+
+# Registro de empleado tal como queda en memoria después de escanear `nompersonal`.
+# `cedula` es el valor original de la BD (el que se usa para insertar en otras tablas)
+# y `cedula_canonica` la forma normalizada que se usa como llave de búsqueda.
+Empleado = namedtuple('Empleado', [
+    'personal_id', 'ficha', 'cedula', 'cedula_canonica',
+    'nombres', 'apellidos', 'nombre_completo', 'estado', 'fecing'
+])
+
+ESTADO_BAJA = 'De Baja'
+
+def limpiar_ficha(valor):
+    """
+    Convierte cualquier representación de ficha a entero.
+    Ej: 'E03940' -> 3940, '00003' -> 3, 3940.0 -> 3940, '3940.0' -> 3940
+    """
+    if valor is None or pd.isna(valor):
+        return None
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return int(valor)
+
+    valor_str = str(valor).strip()
+    # Celdas numéricas leídas como texto ('3940.0')
+    if re.fullmatch(r'\d+\.0+', valor_str):
+        valor_str = valor_str.split('.')[0]
+
+    solo_digitos = re.sub(r'\D', '', valor_str)
+    return int(solo_digitos) if solo_digitos else None
+
+def normalizar_cedula(valor):
+    """
+    Forma canónica de una cédula para comparar Excel contra BD.
+    Ej: "'8-709-1591" -> '8-709-1591', 'e-08-0012345 ' -> 'E-8-12345', '8-326-492 -' -> '8-326-492'
+    """
+    if valor is None or pd.isna(valor):
+        return None
+
+    valor_str = str(valor).strip().upper()
+    if valor_str.endswith('.0'):
+        valor_str = valor_str[:-2]
+
+    partes = [p for p in re.split(r'[^A-Z0-9]+', valor_str) if p]
+    # Los ceros a la izquierda de cada segmento numérico no son significativos
+    partes = [(p.lstrip('0') or '0') if p.isdigit() else p for p in partes]
+    return '-'.join(partes) if partes else None
+
+class IndiceEmpleados:
+    """Índice en memoria de `nompersonal` por personal_id, ficha y cédula canónica."""
+
+    def __init__(self, empleados=()):
+        self.por_id = {}
+        self.fichas = {}
+        self.cedulas = {}
+        for empleado in empleados:
+            self.agregar(empleado)
+
+    def __len__(self):
+        return len(self.por_id)
+
+    def agregar(self, empleado):
+        self.por_id[empleado.personal_id] = empleado
+        if empleado.ficha is not None:
+            # Ante fichas duplicadas se conserva el primer registro (menor personal_id)
+            self.fichas.setdefault(empleado.ficha, empleado)
+        if empleado.cedula_canonica:
+            self.cedulas.setdefault(empleado.cedula_canonica, []).append(empleado)
+
+    def por_personal_id(self, personal_id):
+        return self.por_id.get(personal_id)
+
+    def por_ficha(self, ficha):
+        """Busca por ficha; acepta el valor crudo del Excel ('E03940') o ya limpio."""
+        ficha_limpia = limpiar_ficha(ficha)
+        if ficha_limpia is None:
+            return None
+        return self.fichas.get(ficha_limpia)
+
+    def por_cedula(self, cedula, solo_activos=False):
+        """Busca por cédula canónica; con `solo_activos` ignora empleados 'De Baja'."""
+        cedula_canonica = normalizar_cedula(cedula)
+        if not cedula_canonica:
+            return None
+        for empleado in self.cedulas.get(cedula_canonica, []):
+            if not solo_activos or empleado.estado != ESTADO_BAJA:
+                return empleado
+        return None
+
+    def resolver(self, ficha=None, cedula=None, solo_activos=False):
+        """Busca primero por ficha y, si no aparece, por cédula."""
+        empleado = self.por_ficha(ficha)
+        if empleado is not None and (not solo_activos or empleado.estado != ESTADO_BAJA):
+            return empleado
+        return self.por_cedula(cedula, solo_activos)
+
+@fase('resolucion')
+def cargar_indice_empleados(cursor):
+    """Escanea `nompersonal` una sola vez y construye el índice de identidad."""
+    query = """
+        SELECT personal_id, ficha, cedula, nombres, apellidos,
+               CONCAT(nombres, ' ', apellidos) as nombre_completo, estado, fecing
+        FROM nompersonal
+        ORDER BY personal_id
+    """
+    indice = IndiceEmpleados()
+    try:
+        cursor.execute(query)
+        for personal_id, ficha, cedula, nombres, apellidos, nombre_completo, estado, fecing in cursor.fetchall():
+            indice.agregar(Empleado(
+                personal_id, limpiar_ficha(ficha), cedula, normalizar_cedula(cedula),
+                nombres, apellidos, nombre_completo, estado, fecing
+            ))
+    except Error as e:
+        print(f"Error cargando índice de empleados: {e}")
+        raise
+    print(f"Índice de empleados cargado: {len(indice)} registros de nompersonal.")
+    return indice
@@ -0,0 +1,252 @@
+import atexit
+import json
+import os
+import re
+import sys
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from datetime import datetime
+
+# ==============================================================================
+# Instrumentación por fases y por consulta.
+#
+# Se activa con MIGRACION_INSTRUMENTAR=1. Las conexiones que entrega sesion_db
+# quedan envueltas y cada consulta se cuenta por plantilla (con su histograma de
+# latencias); los scripts marcan sus fases con `fase('lectura')`, `fase('resolucion')`,
+# etc. Al terminar se escribe un reporte JSON en MIGRACION_REPORTES_DIR (reportes/).
+# Sin la variable de entorno, `fase` y `instrumentar_conexion` no hacen nada.
+# ==============================================================================
+
+REPORTES_DIR = os.getenv('MIGRACION_REPORTES_DIR', 'reportes')
+
+# Límites superiores (ms) de las cubetas del histograma de latencias
+CUBETAS_MS = [0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000]
+
+_activa = None
+
+def plantilla_consulta(operacion):
+    """
+    Normaliza una sentencia para agrupar sus ejecuciones: colapsa espacios y las listas
+    de marcadores de largo variable ('IN (%s, %s, %s)' y los VALUES multi-fila).
+    """
+    if isinstance(operacion, (bytes, bytearray)):
+        operacion = operacion.decode('utf-8', 'replace')
+    plantilla = re.sub(r'\s+', ' ', operacion).strip()
+    plantilla = re.sub(r'%s(?:\s*,\s*%s)+', '%s, ...', plantilla)
+    plantilla = re.sub(r'(\([^()]*\))(?:\s*,\s*\1)+', r'\1, ...', plantilla)
+    return plantilla
+
+class EstadisticaConsulta:
+    def __init__(self):
+        self.conteo = 0
+        self.filas_enviadas = 0
+        self.segundos = 0.0
+        self.maximo_ms = 0.0
+        self.histograma = [0] * (len(CUBETAS_MS) + 1)
+
+    def registrar(self, segundos, filas=1):
+        milisegundos = segundos * 1000
+        self.conteo += 1
+        self.filas_enviadas += filas
+        self.segundos += segundos
+        self.maximo_ms = max(self.maximo_ms, milisegundos)
+        self.histograma[bisect_left(CUBETAS_MS, milisegundos)] += 1
+
+    def a_dict(self, plantilla):
+        etiquetas = [f"<={c}ms" for c in CUBETAS_MS] + [f">{CUBETAS_MS[-1]}ms"]
+        return {
+            'plantilla': plantilla,
+            'ejecuciones': self.conteo,
+            'filas_enviadas': self.filas_enviadas,
+            'segundos': round(self.segundos, 4),
+            'promedio_ms': round(self.segundos * 1000 / self.conteo, 3) if self.conteo else 0,
+            'maximo_ms': round(self.maximo_ms, 3),
+            'histograma': {e: n for e, n in zip(etiquetas, self.histograma) if n},
+        }
+
+class Instrumentacion:
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.inicio = time.perf_counter()
+        self.fecha_inicio = datetime.now()
+        self.consultas = {}
+        self.fases = {}
+        self.filas_entrada = 0
+
+    def registrar_consulta(self, operacion, segundos, filas=1):
+        plantilla = plantilla_consulta(operacion)
+        if plantilla not in self.consultas:
+            self.consultas[plantilla] = EstadisticaConsulta()
+        self.consultas[plantilla].registrar(segundos, filas)
+
+    def registrar_fase(self, nombre, segundos):
+        fase_actual = self.fases.setdefault(nombre, {'segundos': 0.0, 'veces': 0})
+        fase_actual['segundos'] += segundos
+        fase_actual['veces'] += 1
+
+    def reporte(self):
+        total_consultas = sum(e.conteo for e in self.consultas.values())
+        plantillas = sorted(self.consultas.items(), key=lambda item: item[1].segundos, reverse=True)
+        return {
+            'script': self.nombre,
+            'inicio': self.fecha_inicio.isoformat(timespec='seconds'),
+            'duracion_segundos': round(time.perf_counter() - self.inicio, 3),
+            'filas_entrada': self.filas_entrada,
+            'consultas_totales': total_consultas,
+            'consultas_por_fila': round(total_consultas / self.filas_entrada, 2) if self.filas_entrada else None,
+            'fases': {n: {'segundos': round(f['segundos'], 4), 'veces': f['veces']} for n, f in self.fases.items()},
+            'plantillas': [estadistica.a_dict(plantilla) for plantilla, estadistica in plantillas],
+        }
+
+    def guardar_reporte(self):
+        reporte = self.reporte()
+        os.makedirs(REPORTES_DIR, exist_ok=True)
+        nombre_archivo = f"{self.nombre}_{self.fecha_inicio.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.json"
+        ruta = os.path.join(REPORTES_DIR, nombre_archivo)
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, ensure_ascii=False, indent=2)
+
+        print(f"\n📊 Reporte de instrumentación: {ruta}")
+        print(f"   Duración: {reporte['duracion_segundos']}s | Filas: {reporte['filas_entrada']} | "
+              f"Consultas: {reporte['consultas_totales']} ({reporte['consultas_por_fila']} por fila)")
+        for nombre, datos in reporte['fases'].items():
+            print(f"   Fase {nombre:<20} {datos['segundos']:>9.3f}s ({datos['veces']} veces)")
+        return ruta
+
+class CursorInstrumentado:
+    def __init__(self, cursor, instrumentacion):
+        self._cursor = cursor
+        self._instrumentacion = instrumentacion
+        self._ultima_operacion = None
+
+    def execute(self, operacion, parametros=None, *args, **kwargs):
+        self._ultima_operacion = operacion
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(operacion, parametros, *args, **kwargs)
+        finally:
+            self._instrumentacion.registrar_consulta(operacion, time.perf_counter() - inicio)
+
+    def executemany(self, operacion, secuencia, *args, **kwargs):
+        secuencia = list(secuencia)
+        self._ultima_operacion = operacion
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(operacion, secuencia, *args, **kwargs)
+        finally:
+            self._instrumentacion.registrar_consulta(operacion, time.perf_counter() - inicio, len(secuencia))
+
+    def _medir_lectura(self, metodo, *args):
+        # El tiempo de traer resultados se suma a la plantilla que los produjo
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args)
+        finally:
+            if self._ultima_operacion is not None:
+                plantilla = plantilla_consulta(self._ultima_operacion)
+                estadistica = self._instrumentacion.consultas.get(plantilla)
+                if estadistica:
+                    estadistica.segundos += time.perf_counter() - inicio
+
+    def fetchone(self):
+        return self._medir_lectura(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._medir_lectura(self._cursor.fetchall)
+
+    def fetchmany(self, *args):
+        return self._medir_lectura(self._cursor.fetchmany, *args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+class ConexionInstrumentada:
+    def __init__(self, connection, instrumentacion):
+        object.__setattr__(self, '_connection', connection)
+        object.__setattr__(self, '_instrumentacion', instrumentacion)
+
+    def cursor(self, *args, **kwargs):
+        return CursorInstrumentado(self._connection.cursor(*args, **kwargs), self._instrumentacion)
+
+    def commit(self):
+        inicio = time.perf_counter()
+        try:
+            return self._connection.commit()
+        finally:
+            segundos = time.perf_counter() - inicio
+            self._instrumentacion.registrar_consulta('COMMIT', segundos)
+            self._instrumentacion.registrar_fase('commit', segundos)
+
+    def rollback(self):
+        inicio = time.perf_counter()
+        try:
+            return self._connection.rollback()
+        finally:
+            self._instrumentacion.registrar_consulta('ROLLBACK', time.perf_counter() - inicio)
+
+    def __getattr__(self, nombre):
+        return getattr(self._connection, nombre)
+
+    def __setattr__(self, nombre, valor):
+        # Propiedades como `autocommit` se aplican a la conexión real
+        setattr(self._connection, nombre, valor)
+
+class fase(ContextDecorator):
+    """
+    Mide una fase con nombre. Se usa como `with fase('resolucion'):` o como decorador
+    `@fase('generar_periodos')`. Las fases anidadas se cuentan por separado (la externa
+    incluye el tiempo de la interna).
+    """
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self._inicios = []
+
+    def __enter__(self):
+        self._inicios.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        inicio = self._inicios.pop()
+        if _activa is not None:
+            _activa.registrar_fase(self.nombre, time.perf_counter() - inicio)
+        return False
+
+def instrumentacion_activa():
+    return _activa
+
+def iniciar_instrumentacion(nombre=None):
+    """Activa la instrumentación para esta ejecución (o para una migración del orquestador)."""
+    global _activa
+    nombre = nombre or os.path.splitext(os.path.basename(sys.argv[0] or 'migracion'))[0] or 'migracion'
+    _activa = Instrumentacion(nombre)
+    return _activa
+
+def finalizar_instrumentacion():
+    """Escribe el reporte JSON de la ejecución activa y desactiva la instrumentación."""
+    global _activa
+    if _activa is None:
+        return None
+    instrumentacion, _activa = _activa, None
+    return instrumentacion.guardar_reporte()
+
+def registrar_filas(cantidad):
+    """Suma filas de entrada para calcular consultas por fila."""
+    if _activa is not None:
+        _activa.filas_entrada += int(cantidad)
+
+def instrumentar_conexion(connection):
+    if _activa is None or connection is None or isinstance(connection, ConexionInstrumentada):
+        return connection
+    return ConexionInstrumentada(connection, _activa)
+
+def instrumentacion_habilitada():
+    return os.getenv('MIGRACION_INSTRUMENTAR', '').lower() in ('1', 'true', 'si', 'sí')
+
+if instrumentacion_habilitada():
+    iniciar_instrumentacion()
+    atexit.register(finalizar_instrumentacion)
@@ -0,0 +1,89 @@
+import pandas as pd
+import re
+from openpyxl import load_workbook
+from instrumentacion import fase
+
+TAMANO_LOTE_DEFECTO = 500
+
+def normalizar_encabezado(encabezado):
+    """Colapsa espacios repetidos: 'DIAS PENDIENTES  A LA FECHA' -> 'DIAS PENDIENTES A LA FECHA'"""
+    if encabezado is None:
+        return None
+    return re.sub(r'\s+', ' ', str(encabezado)).strip()
+
+def _abrir_hoja(ruta_excel, hoja=None):
+    # data_only=True devuelve el valor calculado de las fórmulas, igual que pd.read_excel
+    libro = load_workbook(ruta_excel, read_only=True, data_only=True)
+    hoja_excel = libro[hoja] if hoja else libro.worksheets[0]
+    return libro, hoja_excel
+
+def leer_encabezados(ruta_excel, hoja=None, fila_encabezado=1):
+    """Retorna los encabezados normalizados de la hoja sin leer el resto del archivo."""
+    libro, hoja_excel = _abrir_hoja(ruta_excel, hoja)
+    try:
+        for fila in hoja_excel.iter_rows(min_row=fila_encabezado, max_row=fila_encabezado, values_only=True):
+            return [normalizar_encabezado(valor) for valor in fila]
+        return []
+    finally:
+        libro.close()
+
+def leer_excel_por_lotes(ruta_excel, columnas=None, hoja=None, tamano_lote=TAMANO_LOTE_DEFECTO,
+                         como_texto=True, fila_encabezado=1):
+    """
+    Lee la hoja en modo streaming (openpyxl read_only) y entrega DataFrames de `tamano_lote` filas
+    con solo las `columnas` pedidas. El índice de cada lote conserva la numeración de pd.read_excel
+    (fila de Excel - 2), de modo que `index + 2` sigue siendo la fila real del archivo.
+
+    Con `como_texto=True` los valores se convierten a str como con `dtype=str`.
+    Las columnas faltantes se detectan antes de empezar a iterar (ValueError).
+    """
+    encabezados = leer_encabezados(ruta_excel, hoja, fila_encabezado)
+    if columnas is None:
+        columnas = [c for c in encabezados if c]
+    columnas = [normalizar_encabezado(c) for c in columnas]
+
+    faltantes = [c for c in columnas if c not in encabezados]
+    if faltantes:
+        raise ValueError(f"Columnas no encontradas en {ruta_excel}: {', '.join(faltantes)}")
+
+    posiciones = [encabezados.index(c) for c in columnas]
+    return _generar_lotes(ruta_excel, hoja, columnas, posiciones, tamano_lote, como_texto, fila_encabezado)
+
+def _siguiente_lote(filas, columnas, posiciones, tamano_lote, como_texto):
+    """Consume hasta `tamano_lote` filas no vacías; retorna None cuando ya no quedan."""
+    registros = []
+    indices = []
+    for numero_fila, fila in filas:
+        valores = [fila[p] if p < len(fila) else None for p in posiciones]
+        if all(v is None for v in valores):
+            continue
+        if como_texto:
+            valores = [str(v) if v is not None else None for v in valores]
+        registros.append(valores)
+        indices.append(numero_fila - 2)
+        if len(registros) >= tamano_lote:
+            break
+
+    if not registros:
+        return None
+    return pd.DataFrame(registros, columns=columnas, index=indices)
+
+def _generar_lotes(ruta_excel, hoja, columnas, posiciones, tamano_lote, como_texto, fila_encabezado):
+    libro, hoja_excel = _abrir_hoja(ruta_excel, hoja)
+    try:
+        primera_fila = fila_encabezado + 1
+        filas = enumerate(hoja_excel.iter_rows(min_row=primera_fila, values_only=True), start=primera_fila)
+        while True:
+            # Solo se mide el parseo; el tiempo que el script pasa procesando cada lote queda fuera
+            with fase('lectura'):
+                lote = _siguiente_lote(filas, columnas, posiciones, tamano_lote, como_texto)
+            if lote is None:
+                break
+            yield lote
+    finally:
+        libro.close()
+
+def iterar_filas(lotes):
+    """Aplana los lotes en pares (index, row) como `df.iterrows()`."""
+    for lote in lotes:
+        yield from lote.iterrows()
@@ -1,59 +1,29 @@
-import pandas as pd
-import mysql.connector
 from mysql.connector import Error
 import os
-from dotenv import load_dotenv
-import re
+import argparse
 from datetime import datetime, timedelta
+from identidad_empleados import ESTADO_BAJA, cargar_indice_empleados, limpiar_ficha
+from cache_excel import leer_hoja_cacheada
+from sesion_db import crear_conexion_db, insertar_multifila, max_allowed_packet
+from checkpoint import Checkpoint
+from instrumentacion import fase, registrar_filas
+from registro import MigracionFallida
 
-# Cargar variables de entorno desde el archivo .env
-load_dotenv()
+# 'conjunto' -> un UPDATE y un INSERT multi-fila para todo el archivo (por defecto)
+# 'fila'     -> una actualización por empleado con checkpoint (comportamiento original)
+MODO_144 = os.getenv('DISCAPACIDAD_MODO', 'conjunto')
 
-def crear_conexion_db():
-    """Crea y retorna una conexión a la base de datos MySQL."""
-    try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_DATABASE')
-        )
-        if connection.is_connected():
-            print("Conexión a MySQL exitosa.")
-            return connection
-    except Error as e:
-        print(f"Error al conectar a MySQL: {e}")
-        return None
+OBSERVACION_LEY_15 = 'ACREDITACIÓN ANUAL LEY 15'
 
-def limpiar_ficha(num_empleado):
-    """
-    Limpia el número de empleado, extrayendo solo los dígitos
-    y convirtiéndolo a entero.
-    """
-    if pd.isna(num_empleado) or not isinstance(num_empleado, str):
-        return None
+INSERT_ACREDITACION = """INSERT INTO dias_incapacidad (
+            ficha, tipo_justificacion, fecha, tiempo, observacion, fecha_vence, 
+            dias, horas, minutos, dias_restante, horas_restante, minutos_restante, 
+            created_by, created_at
+        )"""
 
-    try:
-        solo_digitos = re.sub(r'\D', '', num_empleado)
-        if solo_digitos:
-            return int(solo_digitos)
-        else:
-            return None
-    except (ValueError, TypeError):
-        return None
-
-def obtener_personal_id_por_ficha(cursor, ficha):
-    """Busca un empleado por su número de ficha y retorna su ID y nombre."""
-    if ficha is None:
-        return None
-    try:
-        query = "SELECT personal_id, CONCAT(nombres, ' ', apellidos) as nombre_completo FROM nompersonal WHERE ficha = %s"
-        cursor.execute(query, (ficha,))
-        resultado = cursor.fetchone()
-        return resultado if resultado else None
-    except Error as e:
-        print(f"Error buscando ficha {ficha}: {e}")
-        return None
+SQL_ACREDITACION = INSERT_ACREDITACION + """ VALUES (
+            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW()
+        )"""
 
 def obtener_tipo_justificacion(cursor):
     """Obtiene el ID del tipo de justificación para 144 horas."""
@@ -82,39 +52,48 @@ def verificar_horas_ya_acreditadas(cursor, ficha, tipo_justificacion):
         print(f"Error verificando horas ya acreditadas: {e}")
         return False
 
+def fechas_acreditacion(fecha=None):
+    """(fecha, observación, fecha de vencimiento) de una acreditación hecha en `fecha` (por defecto, ahora)."""
+    fecha = fecha or datetime.now()
+    return (
+        fecha.strftime('%Y-%m-%d'),
+        f"{OBSERVACION_LEY_15} - Año {fecha.year}",
+        (fecha + timedelta(days=365)).strftime('%Y-%m-%d %H:%M:%S'),
+    )
+
+def valores_acreditacion(ficha, tipo_justificacion, fecha=None):
+    """Valores de SQL_ACREDITACION para acreditar las 144 horas a una ficha (por defecto, con fecha de hoy)."""
+    fecha_acreditacion, observacion_val, fecha_vence_val = fechas_acreditacion(fecha)
+    tiempo_val = 144.0
+    
+    # 144 horas equivalen a 18 días en una jornada de 8 horas (144 / 8 = 18)
+    dias_val = 18
+    horas_val = 0
+    minutos_val = 0
+    
+    dias_restante_val = dias_val
+    horas_restante_val = horas_val
+    minutos_restante_val = minutos_val
+    created_by_val = 'admin'
+    return (
+        ficha, tipo_justificacion, fecha_acreditacion, tiempo_val, observacion_val, 
+        fecha_vence_val, dias_val, horas_val, minutos_val, dias_restante_val, 
+        horas_restante_val, minutos_restante_val, created_by_val
+    )
+
+def fichas_con_horas_acreditadas(cursor, tipo_justificacion, anio):
+    """Fichas que ya tienen la acreditación anual de Ley 15 en `anio`, en una sola consulta."""
+    query = """SELECT DISTINCT ficha FROM dias_incapacidad
+               WHERE tipo_justificacion = %s
+               AND fecha >= %s AND fecha < %s
+               AND observacion LIKE %s"""
+    cursor.execute(query, (tipo_justificacion, f"{anio}-01-01", f"{anio + 1}-01-01", f"%{OBSERVACION_LEY_15}%"))
+    return {limpiar_ficha(fila[0]) for fila in cursor.fetchall()}
+
 def acreditar_144_horas(cursor, ficha, tipo_justificacion):
     """Acredita las 144 horas en la tabla dias_incapacidad."""
     try:
-        fecha_acreditacion = datetime.now().strftime('%Y-%m-%d')
-        anio_acreditacion = datetime.now().year
-        tiempo_val = 144.0
-        observacion_val = f"ACREDITACIÓN ANUAL LEY 15 - Año {anio_acreditacion}"
-        fecha_vence_val = (datetime.now() + timedelta(days=365)).strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 144 horas equivalen a 18 días en una jornada de 8 horas (144 / 8 = 18)
-        dias_val = 18
-        horas_val = 0
-        minutos_val = 0
-        
-        dias_restante_val = dias_val
-        horas_restante_val = horas_val
-        minutos_restante_val = minutos_val
-        created_by_val = 'admin'
-        
-        insert_query = """INSERT INTO dias_incapacidad (
-            ficha, tipo_justificacion, fecha, tiempo, observacion, fecha_vence, 
-            dias, horas, minutos, dias_restante, horas_restante, minutos_restante, 
-            created_by, created_at
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW()
-        )"""
-        
-        cursor.execute(insert_query, (
-            ficha, tipo_justificacion, fecha_acreditacion, tiempo_val, observacion_val, 
-            fecha_vence_val, dias_val, horas_val, minutos_val, dias_restante_val, 
-            horas_restante_val, minutos_restante_val, created_by_val
-        ))
-        
+        cursor.execute(SQL_ACREDITACION, valores_acreditacion(ficha, tipo_justificacion))
         return cursor.rowcount > 0
     except Error as e:
         print(f"Error acreditando 144 horas: {e}")
@@ -153,20 +132,24 @@ def actualizar_discapacidad_y_horas(cursor, personal_id, ficha):
         print(f"Error al actualizar personal_id {personal_id}: {e}")
         return False, f"Error: {e}"
 
-def migrar_discapacidad_desde_excel(ruta_excel, connection):
-    """Función principal para leer el Excel y actualizar los datos de discapacidad."""
+def migrar_discapacidad_desde_excel(ruta_excel, connection, commit_cada=None, modo=None):
+    """
+    Función principal para leer el Excel y actualizar los datos de discapacidad.
+    `modo` (ver MODO_144): 'conjunto' escribe todo en una transacción con un número fijo de sentencias;
+    'fila' confirma cada `commit_cada` filas y retoma desde el checkpoint si la ejecución anterior se interrumpió.
+    Lanza MigracionFallida si el archivo no se puede usar o se revierte la transacción.
+    """
     print(f"\n=== Iniciando Migración desde: {ruta_excel} ===")
     
     try:
-        df = pd.read_excel(ruta_excel, dtype=str)
-    except FileNotFoundError:
-        print(f"❌ ERROR: Archivo no encontrado en la ruta: {ruta_excel}")
-        return
+        df = leer_hoja_cacheada(ruta_excel, dtype=str)
+    except FileNotFoundError as e:
+        raise MigracionFallida(f"ERROR: Archivo no encontrado en la ruta: {ruta_excel}") from e
     except Exception as e:
-        print(f"❌ ERROR: No se pudo leer el archivo Excel. Causa: {e}")
-        return
+        raise MigracionFallida(f"ERROR: No se pudo leer el archivo Excel. Causa: {e}") from e
 
     print(f"Filas totales en el archivo: {len(df)}")
+    registrar_filas(len(df))
 
     # Limpiar los nombres de las columnas
     df.columns = df.columns.str.strip()
@@ -174,8 +157,7 @@ def migrar_discapacidad_desde_excel(ruta_excel, connection):
     
     # Solo necesitamos la columna del número de empleado
     if 'N° de Empleado' not in df.columns:
-        print(f"❌ ERROR: La columna 'N° de Empleado' no se encontró en el archivo Excel.")
-        return
+        raise MigracionFallida("ERROR: La columna 'N° de Empleado' no se encontró en el archivo Excel.")
 
     # Filtrar filas que tengan número de empleado
     df_valido = df.dropna(subset=['N° de Empleado'])
@@ -186,12 +168,19 @@ def migrar_discapacidad_desde_excel(ruta_excel, connection):
         return
     
     cursor = connection.cursor()
+    indice = cargar_indice_empleados(cursor)
+    if (modo or MODO_144) == 'conjunto':
+        acreditar_en_conjunto(df_valido, connection, cursor, indice)
+        return
+    checkpoint = Checkpoint(connection, 'discapacidad_144', ruta_excel, commit_cada)
+    if checkpoint.reanudando:
+        print(f"Reanudando desde el checkpoint: filas confirmadas hasta la {checkpoint.ultima_fila + 2} del Excel.")
     actualizados = 0
     errores = 0
     no_encontrados = 0
     ya_tenian_horas = 0
 
-    for index, row in df_valido.iterrows():
+    for index, row in checkpoint.filas(df_valido.iterrows()):
         try:
             ficha = limpiar_ficha(row.get('N° de Empleado'))
 
@@ -200,15 +189,17 @@ def migrar_discapacidad_desde_excel(ruta_excel, connection):
                 errores += 1
                 continue
 
-            empleado_info = obtener_personal_id_por_ficha(cursor, ficha)
-            if not empleado_info:
+            with fase('resolucion'):
+                empleado = indice.por_ficha(ficha)
+            if not empleado:
                 print(f"❓ Fila {index+2}: Empleado con ficha {ficha} no encontrado en la BD. SALTANDO.")
                 no_encontrados += 1
                 continue
             
-            personal_id, nombre_completo = empleado_info
+            personal_id, nombre_completo = empleado.personal_id, empleado.nombre_completo
             
-            actualizado, mensaje = actualizar_discapacidad_y_horas(cursor, personal_id, ficha)
+            with fase('escritura'):
+                actualizado, mensaje = actualizar_discapacidad_y_horas(cursor, personal_id, ficha)
             
             if actualizado:
                 print(f"✅ Ficha {ficha} ({nombre_completo}): {mensaje}")
@@ -224,8 +215,8 @@ def migrar_discapacidad_desde_excel(ruta_excel, connection):
             errores += 1
             continue
 
-    # Confirmar todos los cambios en la base de datos
-    connection.commit()
+    # Confirmar el último lote y cerrar el checkpoint
+    checkpoint.completar()
     cursor.close()
     print("\n" + "="*60)
     print("=== Resumen de la Migración ===")
@@ -236,19 +227,150 @@ def migrar_discapacidad_desde_excel(ruta_excel, connection):
     print("="*60)
 
 
+def acreditar_en_conjunto(df_valido, connection, cursor, indice):
+    """
+    Marca la discapacidad de todos los empleados del archivo con un UPDATE por cada 1000 empleados
+    y acredita las 144 horas faltantes con INSERT multi-fila, todo en una sola transacción.
+    El tipo de justificación y las fichas ya acreditadas este año se consultan una sola vez.
+    """
+    errores = 0
+    no_encontrados = 0
+    empleados = {}
+    with fase('resolucion'):
+        for index, valor in df_valido['N° de Empleado'].items():
+            ficha = limpiar_ficha(valor)
+            if ficha is None:
+                print(f"⚠️ Fila {index+2}: N° de Empleado '{valor}' inválido. SALTANDO.")
+                errores += 1
+                continue
+            empleado = indice.por_ficha(ficha)
+            if not empleado:
+                print(f"❓ Fila {index+2}: Empleado con ficha {ficha} no encontrado en la BD. SALTANDO.")
+                no_encontrados += 1
+                continue
+            empleados[empleado.personal_id] = (ficha, empleado)
+
+    if not empleados:
+        cursor.close()
+        print("No hay empleados para actualizar.")
+        return
+
+    try:
+        tipo_justificacion = obtener_tipo_justificacion(cursor)
+        with fase('resolucion'):
+            ya_acreditadas = fichas_con_horas_acreditadas(cursor, tipo_justificacion, datetime.now().year)
+        por_acreditar = sorted({ficha for ficha, _ in empleados.values()} - ya_acreditadas)
+
+        with fase('escritura'):
+            ids = list(empleados)
+            for inicio in range(0, len(ids), 1000):
+                lote = ids[inicio:inicio + 1000]
+                cursor.execute(
+                    "UPDATE nompersonal SET tiene_discapacidad = 1, discapacidad_senadis = 1 "
+                    f"WHERE personal_id IN ({', '.join(['%s'] * len(lote))})",
+                    lote
+                )
+            insertar_multifila(cursor, SQL_ACREDITACION,
+                               [valores_acreditacion(ficha, tipo_justificacion) for ficha in por_acreditar],
+                               max_bytes=max_allowed_packet(connection) // 2)
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        raise MigracionFallida(f"Error en la actualización en conjunto, no se guardó ningún cambio: {e}") from e
+    finally:
+        cursor.close()
+
+    print("\n" + "="*60)
+    print("=== Resumen de la Migración ===")
+    print(f"Registros actualizados exitosamente: {len(empleados)}")
+    print(f"Horas acreditadas: {len(por_acreditar)}")
+    print(f"Empleados que ya tenían horas este año: {len(empleados) - len(por_acreditar)}")
+    print(f"Empleados no encontrados en la BD: {no_encontrados}")
+    print(f"Registros con errores o saltados: {errores}")
+    print("="*60)
+
+def acumular_144_horas(connection, anio=None, desde=None):
+    """
+    Acreditación anual sin Excel: a todo empleado con `tiene_discapacidad = 1` que no tenga la
+    acreditación de Ley 15 en el año le inserta las 144 horas con un solo INSERT ... SELECT por año.
+    Los empleados 'De Baja' no se acreditan y una ficha repetida en nompersonal se acredita una vez.
+    La fecha es el 1 de enero del año y vence 365 días después. Con `desde` se recorren todos los
+    años de `desde` a `anio` (para completar años anteriores; `desde` posterior a `anio` lanza
+    ValueError). Todo en una sola transacción; si falla se revierte y lanza MigracionFallida.
+    """
+    anio = anio or datetime.now().year
+    if desde is not None and desde > anio:
+        raise ValueError(f"El año inicial ({desde}) no puede ser posterior al año a acreditar ({anio}).")
+    anios = range(desde or anio, anio + 1)
+    print(f"\n=== Acreditación anual Ley 15: {anios[0]}{f' a {anio}' if len(anios) > 1 else ''} ===")
+
+    cursor = connection.cursor()
+    acreditados = {}
+    try:
+        tipo_justificacion = obtener_tipo_justificacion(cursor)
+        with fase('escritura'):
+            for anio_credito in anios:
+                fecha, observacion, fecha_vence = fechas_acreditacion(datetime(anio_credito, 1, 1))
+                cursor.execute(INSERT_ACREDITACION + """
+                    SELECT DISTINCT p.ficha, %s, %s, 144.0, %s, %s, 18, 0, 0, 18, 0, 0, 'admin', NOW()
+                    FROM nompersonal p
+                    WHERE p.tiene_discapacidad = 1
+                    AND NOT (p.estado <=> %s)
+                    AND NOT EXISTS (
+                        SELECT 1 FROM dias_incapacidad d
+                        WHERE d.ficha = p.ficha
+                        AND d.tipo_justificacion = %s
+                        AND d.fecha >= %s AND d.fecha < %s
+                        AND d.observacion LIKE %s
+                    )""", (
+                    tipo_justificacion, fecha, observacion, fecha_vence, ESTADO_BAJA,
+                    tipo_justificacion, f"{anio_credito}-01-01", f"{anio_credito + 1}-01-01", f"%{OBSERVACION_LEY_15}%"
+                ))
+                acreditados[anio_credito] = cursor.rowcount
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        raise MigracionFallida(f"Error en la acreditación anual, no se guardó ningún cambio: {e}") from e
+    finally:
+        cursor.close()
+
+    for anio_credito, cantidad in acreditados.items():
+        print(f"✅ Año {anio_credito}: {cantidad} empleados acreditados con 144 horas.")
+    return acreditados
+
 # --- Bloque de Ejecución Principal ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Discapacidad y acreditación anual de 144 horas (Ley 15).")
+    parser.add_argument('--acumular', action='store_true',
+                        help="Acredita a todos los empleados con discapacidad sin usar el Excel")
+    parser.add_argument('--anio', type=int, default=None, help="Año a acreditar (por defecto el actual)")
+    parser.add_argument('--desde', type=int, default=None, help="Primer año a completar con --acumular")
+    args = parser.parse_args()
+    if not args.acumular:
+        if args.desde is not None:
+            parser.error("--desde solo se puede usar con --acumular")
+        if args.anio is not None:
+            parser.error("--anio solo se puede usar con --acumular")
+    elif args.desde is not None and args.desde > (args.anio or datetime.now().year):
+        parser.error(f"--desde ({args.desde}) no puede ser posterior al año a acreditar "
+                     f"({args.anio or datetime.now().year})")
+
     db_connection = crear_conexion_db()
 
     if db_connection:
         ruta_archivo_excel = 'formatos/144_horas.xlsx' 
         
-        if not os.path.exists(ruta_archivo_excel):
-            print(f"El archivo no se encuentra en la ruta especificada: {ruta_archivo_excel}")
-        else:
-            print("🚀 Iniciando actualización de discapacidad y acreditación de 144 horas...")
-            
-            migrar_discapacidad_desde_excel(ruta_archivo_excel, db_connection)
-            
+        try:
+            if args.acumular:
+                acumular_144_horas(db_connection, args.anio, args.desde)
+            elif not os.path.exists(ruta_archivo_excel):
+                print(f"El archivo no se encuentra en la ruta especificada: {ruta_archivo_excel}")
+            else:
+                print("🚀 Iniciando actualización de discapacidad y acreditación de 144 horas...")
+
+                migrar_discapacidad_desde_excel(ruta_archivo_excel, db_connection)
+        except MigracionFallida as e:
+            print(f"❌ {e}")
+
         db_connection.close()
         print("\n🏁 Proceso de migración completado.")
\ No newline at end of file
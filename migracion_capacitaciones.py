@@ -1,22 +1,20 @@
 import pandas as pd
-import mysql.connector
 from mysql.connector import Error
 from tqdm import tqdm
 import re
 from datetime import datetime
 import unicodedata
+from cache_excel import leer_hoja_cacheada
+from sesion_db import crear_conexion_db
+from instrumentacion import fase, registrar_filas
+from registro import MigracionFallida
 
 # ==============================================================================
 # CONFIGURACIÓN - ¡IMPORTANTE! DEBES RELLENAR ESTA SECCIÓN
 # ==============================================================================
 
 # --- Conexión a la Base de Datos ---
-DB_CONFIG = {
-    'host': 'localhost',        # O la IP de tu servidor de base de datos
-    'user': 'root',
-    'password': 'root',
-    'database': 'aitsa_rrhh'
-}
+# Se toma del .env (DB_HOST, DB_USER, DB_PASSWORD, DB_DATABASE) a través de sesion_db
 
 # --- Ruta al Archivo de Origen ---
 EXCEL_FILE_PATH = 'formatos/Control de Capacitaciones excel.xlsx'
@@ -26,17 +24,6 @@ EXCEL_FILE_PATH = 'formatos/Control de Capacitaciones excel.xlsx'
 # ==============================================================================
 
 
-def connect_db():
-    """Establece la conexión con la base de datos."""
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        if conn.is_connected():
-            print("Conexión a la base de datos establecida correctamente.")
-            return conn
-    except Error as e:
-        print(f"Error al conectar a la base de datos: {e}")
-        return None
-
 def clean_text(text):
     """Limpia y estandariza una cadena de texto."""
     if not isinstance(text, str):
@@ -53,6 +40,7 @@ def normalize_name(name):
     name = ''.join(char for char in name if unicodedata.category(char) != 'Mn')
     return name.lower().strip()
 
+@fase('resolucion')
 def get_or_create(cursor, table, data_dict, lookup_column):
     """
     Busca un registro en una tabla. Si no existe, lo crea.
@@ -75,6 +63,7 @@ def get_or_create(cursor, table, data_dict, lookup_column):
         cursor.execute(insert_query, list(data_dict.values()))
         return cursor.lastrowid
 
+@fase('resolucion')
 def find_employee_id(cursor, first_name, last_name):
     """Busca el personal_id en la tabla nompersonal con búsqueda inteligente."""
     
@@ -188,37 +177,40 @@ def parse_dates(date_string):
 
 
 def main():
-    """Función principal que ejecuta el proceso de migración."""
+    """
+    Función principal que ejecuta el proceso de migración.
+    Lanza MigracionFallida si no se pudo leer el archivo, conectar o guardar los cambios.
+    """
     print("Iniciando proceso de migración...")
     
     # --- 1. EXTRACCIÓN ---
     try:
-        df = pd.read_excel(EXCEL_FILE_PATH, sheet_name='Control de Capacitaciones 2022')
+        df = leer_hoja_cacheada(EXCEL_FILE_PATH, 'Control de Capacitaciones 2022')
         print(f"Archivo Excel '{EXCEL_FILE_PATH}' cargado. {len(df)} filas encontradas.")
-    except FileNotFoundError:
-        print(f"ERROR: No se encontró el archivo en la ruta: {EXCEL_FILE_PATH}")
-        return
+        registrar_filas(len(df))
+    except FileNotFoundError as e:
+        raise MigracionFallida(f"ERROR: No se encontró el archivo en la ruta: {EXCEL_FILE_PATH}") from e
     except Exception as e:
-        print(f"ERROR: No se pudo leer el archivo Excel: {e}")
-        return
+        raise MigracionFallida(f"ERROR: No se pudo leer el archivo Excel: {e}") from e
 
     # --- 2. TRANSFORMACIÓN ---
     print("Transformando datos...")
     
     # Definir las columnas a propagar (rellenar hacia abajo) - CORREGIDO el warning
     cols_to_fill = ['NOMBRE DE LA CAPACITACIÓN', 'OBJETIVO', 'PROVEEDOR', 'FECHA', 'LUGAR / MODALIDAD', 'COSTO POR COLABORADOR']
-    df[cols_to_fill] = df[cols_to_fill].ffill()  # Usar ffill() en lugar de fillna(method='ffill')
-    
-    # Eliminar filas sin nombre o apellido de empleado
-    df.dropna(subset=['NOMBRE', 'APELLIDO'], inplace=True)
-    df.reset_index(drop=True, inplace=True)
+    with fase('limpieza'):
+        df[cols_to_fill] = df[cols_to_fill].ffill()  # Usar ffill() en lugar de fillna(method='ffill')
+        
+        # Eliminar filas sin nombre o apellido de empleado
+        df.dropna(subset=['NOMBRE', 'APELLIDO'], inplace=True)
+        df.reset_index(drop=True, inplace=True)
     
     print(f"Datos transformados. {len(df)} registros de inscripción válidos para procesar.")
 
     # --- 3. CARGA ---
-    conn = connect_db()
+    conn = crear_conexion_db()
     if not conn:
-        return
+        raise MigracionFallida("ERROR: No se pudo conectar a la base de datos.")
         
     # Usar buffered=True para evitar "Unread result found"
     cursor = conn.cursor(buffered=True)
@@ -289,7 +281,8 @@ def main():
                 columns = ', '.join(oferta_data.keys())
                 placeholders = ', '.join(['%s'] * len(oferta_data))
                 insert_query = f"INSERT INTO capacitaciones_ofertas_cursos ({columns}) VALUES ({placeholders})"
-                cursor.execute(insert_query, list(oferta_data.values()))
+                with fase('escritura'):
+                    cursor.execute(insert_query, list(oferta_data.values()))
                 oferta_id = cursor.lastrowid
                 cache['ofertas'][oferta_key] = oferta_id
             oferta_id = cache['ofertas'][oferta_key]
@@ -305,9 +298,10 @@ def main():
 
             # Verificar si ya existe la inscripción
             check_query = "SELECT inscripcion_id FROM capacitaciones_inscripciones WHERE personal_id = %s AND oferta_id = %s"
-            cursor.execute(check_query, (personal_id, oferta_id))
-            existing = cursor.fetchone()
-            cursor.fetchall()  # Consumir resultados pendientes
+            with fase('resolucion'):
+                cursor.execute(check_query, (personal_id, oferta_id))
+                existing = cursor.fetchone()
+                cursor.fetchall()  # Consumir resultados pendientes
             
             if existing:
                 continue
@@ -323,7 +317,8 @@ def main():
             columns = ', '.join(inscripcion_data.keys())
             placeholders = ', '.join(['%s'] * len(inscripcion_data))
             insert_query = f"INSERT INTO capacitaciones_inscripciones ({columns}) VALUES ({placeholders})"
-            cursor.execute(insert_query, list(inscripcion_data.values()))
+            with fase('escritura'):
+                cursor.execute(insert_query, list(inscripcion_data.values()))
 
         conn.commit()
         print("\n¡Migración completada con éxito!")
@@ -333,8 +328,8 @@ def main():
                 print(f"- {emp}")
 
     except Error as e:
-        print(f"\nERROR: Ocurrió un error durante la carga de datos. Se revertirán los cambios. Detalle: {e}")
         conn.rollback()
+        raise MigracionFallida(f"ERROR: Ocurrió un error durante la carga de datos. Se revirtieron los cambios. Detalle: {e}") from e
     finally:
         if conn.is_connected():
             cursor.close()
@@ -343,4 +338,7 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    try:
+        main()
+    except MigracionFallida as e:
+        print(f"\n❌ {e}")
\ No newline at end of file
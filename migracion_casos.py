@@ -1,51 +1,16 @@
 import pandas as pd
-import mysql.connector
 from mysql.connector import Error
 import os
-from dotenv import load_dotenv
-import re
 from datetime import date
+from identidad_empleados import cargar_indice_empleados
+from cache_excel import leer_hoja_cacheada
+from sesion_db import crear_conexion_db, cursor_preparado
+from instrumentacion import fase, registrar_filas
+from registro import MigracionFallida, ResumenMigracion, obtener_logger
 
-load_dotenv()
-
-def crear_conexion_db():
-    try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_DATABASE')
-        )
-        if connection.is_connected():
-            print("Conectado a MySQL")
-            return connection
-    except Error as e:
-        print(f"Error MySQL: {e}")
-        return None
-
-def limpiar_y_convertir_ficha(ficha_str):
-    """Convierte E03940 a 3940"""
-    if pd.isna(ficha_str) or not isinstance(ficha_str, str):
-        return None
-    numeros = re.findall(r'\d+', ficha_str)
-    if numeros:
-        return int("".join(numeros))
-    return None
-
-def obtener_personal_id_por_ficha(cursor, ficha_str):
-    ficha_limpia = limpiar_y_convertir_ficha(ficha_str)
-    if ficha_limpia is None:
-        return None
-    
-    try:
-        query = "SELECT personal_id FROM nompersonal WHERE ficha = %s"
-        cursor.execute(query, (ficha_limpia,))
-        resultado = cursor.fetchone()
-        return resultado[0] if resultado else None
-    except Error as e:
-        print(f"Error buscando ficha {ficha_limpia}: {e}")
-        return None
+logger = obtener_logger('casos')
 
+@fase('resolucion')
 def obtener_o_crear_abogado_id(cursor, nombre_abogado):
     if pd.isna(nombre_abogado) or not str(nombre_abogado).strip():
         return None
@@ -73,14 +38,15 @@ def obtener_o_crear_abogado_id(cursor, nombre_abogado):
         if resultado:
             return resultado[0]
         else:
-            print(f"Creando abogado: '{nombre_abogado}'")
+            logger.info(f"Creando abogado: '{nombre_abogado}'")
             query_insert = "INSERT INTO abogados (nombre, activo) VALUES (%s, 1)"
             cursor.execute(query_insert, (nombre_abogado,))
             return cursor.lastrowid
     except Error as e:
-        print(f"Error con abogado '{nombre_abogado}': {e}")
+        logger.warning(f"Error con abogado '{nombre_abogado}': {e}")
         return None
 
+@fase('resolucion')
 def buscar_empleado_por_nombre_aproximado(cursor, nombre):
     """Busca empleado por nombre aproximado para campos Para/De"""
     if pd.isna(nombre) or not str(nombre).strip():
@@ -106,7 +72,7 @@ def buscar_empleado_por_nombre_aproximado(cursor, nombre):
         resultado = cursor.fetchone()
         return resultado[0] if resultado else None
     except Error as e:
-        print(f"Error buscando empleado '{nombre}': {e}")
+        logger.warning(f"Error buscando empleado '{nombre}': {e}")
         return None
 
 def limpiar_valor(valor):
@@ -158,12 +124,12 @@ def migrar_casos_desde_hoja_excel(ruta_excel, nombre_hoja, connection):
     print(f"\n=== Procesando: {nombre_hoja} ===")
     
     try:
-        df = pd.read_excel(ruta_excel, sheet_name=nombre_hoja)
+        df = leer_hoja_cacheada(ruta_excel, nombre_hoja)
     except Exception as e:
-        print(f"ERROR leyendo {nombre_hoja}: {e}")
-        return
+        raise MigracionFallida(f"ERROR leyendo {nombre_hoja}: {e}") from e
 
     print(f"Filas totales: {len(df)}")
+    registrar_filas(len(df))
     
     # Filtrar solo filas que tengan "Ref" (memo_ref)
     df = df.dropna(subset=['Ref'])
@@ -175,15 +141,20 @@ def migrar_casos_desde_hoja_excel(ruta_excel, nombre_hoja, connection):
         return
     
     cursor = connection.cursor()
+    # El INSERT de casos se repite en cada fila: se prepara una sola vez
+    cursor_insercion = cursor_preparado(connection)
+    indice = cargar_indice_empleados(cursor)
+    resumen = ResumenMigracion(f"casos_{nombre_hoja.lower()}")
     insertados = 0
     errores = 0
 
-    for index, row in df.iterrows():
+    for procesadas, (index, row) in enumerate(df.iterrows(), start=1):
+        resumen.progreso(procesadas, len(df))
         try:
             # Validar que tenga Ref (memo_ref)
             memo_ref = limpiar_valor(row.get('Ref'))
             if not memo_ref:
-                print(f"⚠ Fila {index+1}: Sin memo/referencia")
+                resumen.rechazar(index+1, 'Sin memo/referencia')
                 errores += 1
                 continue
             
@@ -199,24 +170,15 @@ def migrar_casos_desde_hoja_excel(ruta_excel, nombre_hoja, connection):
             # Primero intentar por campo "No." si existe
             ficha_excel = row.get('No.') if 'No.' in df.columns and pd.notna(row.get('No.')) else None
             
-            if ficha_excel:
-                empleado_id_principal = obtener_personal_id_por_ficha(cursor, ficha_excel)
-            
             # Si no se encontró por ficha, intentar por cédula (especialmente para Internos)
-            if empleado_id_principal is None:
-                cedula = limpiar_valor(row.get('Cédula'))
-                if cedula:
-                    try:
-                        query_cedula = "SELECT personal_id FROM nompersonal WHERE cedula = %s LIMIT 1"
-                        cursor.execute(query_cedula, (cedula,))
-                        resultado_cedula = cursor.fetchone()
-                        empleado_id_principal = resultado_cedula[0] if resultado_cedula else None
-                    except Error as e:
-                        print(f"Error buscando por cédula {cedula}: {e}")
+            with fase('resolucion'):
+                empleado = indice.resolver(ficha_excel, limpiar_valor(row.get('Cédula')))
+            if empleado is not None:
+                empleado_id_principal = empleado.personal_id
             
             # SI NO ENCUENTRA EMPLEADO, NO INSERTAR (mantener esta validación)
             if empleado_id_principal is None:
-                print(f"⚠ Fila {index+1}: Empleado no encontrado para ficha '{ficha_excel}' o cédula - SALTANDO")
+                resumen.rechazar(index+1, 'Empleado no encontrado', ficha=ficha_excel, cedula=row.get('Cédula'))
                 errores += 1
                 continue
 
@@ -252,7 +214,7 @@ def migrar_casos_desde_hoja_excel(ruta_excel, nombre_hoja, connection):
                 para_texto_libre = para_valor if para_valor and not para_empleado_id else None
                 de_texto_libre = de_valor if de_valor and not de_empleado_id else None
             else:
-                print(f"⚠ Hoja desconocida: {nombre_hoja}")
+                logger.warning(f"⚠ Hoja desconocida: {nombre_hoja}")
                 continue
 
             # Procesar abogado responsable
@@ -313,22 +275,25 @@ def migrar_casos_desde_hoja_excel(ruta_excel, nombre_hoja, connection):
                 'migracion_excel'      # created_by
             )
             
-            cursor.execute(query, values)
-            print(f"✓ {memo_ref} ({nombre_hoja}) - {asunto[:30]}...")
+            with fase('escritura'):
+                cursor_insercion.execute(query, values)
+            logger.debug(f"✓ {memo_ref} ({nombre_hoja}) - {asunto[:30]}...")
             insertados += 1
 
         except Error as e:
-            print(f"✗ Fila {index+1} ({memo_ref}): {e}")
+            resumen.rechazar(index+1, 'Error de base de datos', memo_ref=memo_ref, error=str(e))
             errores += 1
             connection.rollback()
             continue
         except Exception as e:
-            print(f"✗ Fila {index+1}: Error general - {e}")
+            resumen.rechazar(index+1, 'Error general', error=str(e))
             errores += 1
             continue
 
     connection.commit()
+    cursor_insercion.close()
     cursor.close()
+    resumen.cerrar()
     print(f"=== Resultado {nombre_hoja}: {insertados} insertados, {errores} errores ===")
 
 # Ejecución principal
@@ -347,7 +312,10 @@ if __name__ == "__main__":
             hojas_a_procesar = ['Externos', 'Internos']
             
             for hoja in hojas_a_procesar:
-                migrar_casos_desde_hoja_excel(ruta_archivo_excel, hoja, db_connection)
+                try:
+                    migrar_casos_desde_hoja_excel(ruta_archivo_excel, hoja, db_connection)
+                except MigracionFallida as e:
+                    print(f"❌ {e}")
             
         db_connection.close()
         print("\n🏁 Migración completada")
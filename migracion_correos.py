@@ -1,35 +1,32 @@
 import pandas as pd
-import mysql.connector
 from mysql.connector import Error
 import os
-from dotenv import load_dotenv
-import re
+import argparse
+import heapq
+import json
+from collections import Counter
+from datetime import datetime
+from identidad_empleados import ESTADO_BAJA, cargar_indice_empleados, limpiar_ficha
+from cache_excel import leer_hoja_cacheada
+from sesion_db import crear_conexion_db
+from instrumentacion import fase, registrar_filas
+from registro import MigracionFallida, ResumenMigracion, obtener_logger
 
-load_dotenv()
+logger = obtener_logger('correos')
 
-def crear_conexion_db():
-    try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_DATABASE')
-        )
-        if connection.is_connected():
-            print("Conectado a MySQL")
-            return connection
-    except Error as e:
-        print(f"Error MySQL: {e}")
-        return None
+# 'conjunto' -> limpieza vectorizada + un UPDATE por lote en una sola transacción (por defecto)
+# 'fila'     -> un UPDATE por empleado (comportamiento original)
+MODO_CORREOS = os.getenv('CORREOS_MODO', 'conjunto')
+# Empleados por sentencia UPDATE ... CASE
+LOTE_CORREOS = 1000
+# Contadores de cobertura y empleados sin correo, para actualizarla sin recorrer nompersonal otra vez
+RUTA_COBERTURA = os.getenv('CORREOS_COBERTURA_ESTADO', os.path.join('reportes', 'cobertura_correos.json'))
+# Horas que puede pasar el estado guardado sin un recorrido completo antes de volver a escanear
+COBERTURA_MAX_HORAS = float(os.getenv('CORREOS_COBERTURA_MAX_HORAS', 24))
 
 def limpiar_y_convertir_clave(clave_str):
     """Convierte E03940 a 3940 para que coincida con ficha"""
-    if pd.isna(clave_str) or not isinstance(clave_str, str):
-        return None
-    numeros = re.findall(r'\d+', clave_str)
-    if numeros:
-        return int("".join(numeros))
-    return None
+    return limpiar_ficha(clave_str)
 
 def limpiar_correo(correo):
     """Limpia y valida formato de correo electrónico"""
@@ -46,19 +43,37 @@ def limpiar_correo(correo):
     
     return None
 
-def obtener_personal_id_por_ficha(cursor, ficha):
-    """Busca empleado por ficha"""
-    if ficha is None:
-        return None
-    
-    try:
-        query = "SELECT personal_id, CONCAT(nombres, ' ', apellidos) as nombre_completo FROM nompersonal WHERE ficha = %s"
-        cursor.execute(query, (ficha,))
-        resultado = cursor.fetchone()
-        return resultado if resultado else None
-    except Error as e:
-        print(f"Error buscando ficha {ficha}: {e}")
-        return None
+def limpiar_claves(serie):
+    """Versión vectorizada de `limpiar_y_convertir_clave` sobre una columna completa."""
+    numericas = serie.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool) and not pd.isna(v))
+    texto = serie[~numericas & serie.notna()].astype(str).str.strip()
+    texto = texto.str.replace(r'^(\d+)\.0+$', r'\1', regex=True).str.replace(r'\D', '', regex=True)
+    digitos = texto[texto != ""]
+    fichas = {**serie[numericas].map(int).to_dict(), **digitos.map(int).to_dict()}
+    return pd.Series([fichas.get(i) for i in serie.index], index=serie.index, dtype=object)
+
+def limpiar_correos(serie):
+    """Versión vectorizada de `limpiar_correo`: None donde el correo no tiene formato válido."""
+    texto = serie.astype(str).str.strip().str.replace("'", "", regex=False).str.replace('"', "", regex=False).str.strip()
+    validos = serie.notna() & (texto != "") & texto.str.contains("@", regex=False) & texto.str.contains(".", regex=False)
+    return pd.Series([c if v else None for c, v in zip(texto, validos)], index=serie.index, dtype=object)
+
+def actualizar_correos_por_lotes(cursor, asignaciones, tamano_lote=LOTE_CORREOS):
+    """
+    Aplica {personal_id: correo} con un UPDATE ... CASE por cada `tamano_lote` empleados.
+    No confirma: la transacción la cierra quien llama.
+    """
+    pares = list(asignaciones.items())
+    for inicio in range(0, len(pares), tamano_lote):
+        lote = pares[inicio:inicio + tamano_lote]
+        casos = " ".join(["WHEN %s THEN %s"] * len(lote))
+        marcadores = ", ".join(["%s"] * len(lote))
+        parametros = [valor for par in lote for valor in par] + [personal_id for personal_id, _ in lote]
+        cursor.execute(
+            f"UPDATE nompersonal SET correo_institucional = CASE personal_id {casos} END "
+            f"WHERE personal_id IN ({marcadores})",
+            parametros
+        )
 
 def actualizar_correo_institucional(cursor, personal_id, correo):
     """Actualiza el correo institucional del empleado"""
@@ -67,131 +82,377 @@ def actualizar_correo_institucional(cursor, personal_id, correo):
         cursor.execute(query, (correo, personal_id))
         return cursor.rowcount > 0
     except Error as e:
-        print(f"Error actualizando correo para personal_id {personal_id}: {e}")
+        logger.warning(f"Error actualizando correo para personal_id {personal_id}: {e}")
         return False
 
-def migrar_correos_desde_excel(ruta_excel, connection):
+def migrar_correos_desde_excel(ruta_excel, connection, modo=None):
+    """
+    `modo`: 'conjunto' (un UPDATE por lote) o 'fila' (un UPDATE por empleado); ver MODO_CORREOS.
+    Retorna {personal_id: correo} con los correos escritos, para actualizar la cobertura.
+    Lanza MigracionFallida si no se pudo leer el archivo o se revirtió la escritura.
+    """
     print(f"\n=== Procesando: Correos Institucionales ===")
     
     try:
-        df = pd.read_excel(ruta_excel)
+        df = leer_hoja_cacheada(ruta_excel)
     except Exception as e:
-        print(f"ERROR leyendo archivo Excel: {e}")
-        return
+        raise MigracionFallida(f"ERROR leyendo archivo Excel: {e}") from e
 
     print(f"Filas totales: {len(df)}")
+    registrar_filas(len(df))
     
     # Filtrar filas que tengan al menos clave y correo
-    df_valido = df[df['Clave'].notna() & df['Correo electrónico'].notna()]
+    with fase('limpieza'):
+        df_valido = df[df['Clave'].notna() & df['Correo electrónico'].notna()]
     print(f"Filas con clave y correo válidos: {len(df_valido)}")
     
     if df_valido.empty:
         print("No hay datos válidos para procesar")
-        return
+        return {}
     
     cursor = connection.cursor()
+    indice = cargar_indice_empleados(cursor)
+    resumen = ResumenMigracion('correos')
+    if (modo or MODO_CORREOS) == 'conjunto':
+        return migrar_correos_en_conjunto(df_valido, connection, cursor, indice, resumen)
+    cambios = {}
     actualizados = 0
     errores = 0
     no_encontrados = 0
 
-    for index, row in df_valido.iterrows():
+    for procesadas, (index, row) in enumerate(df_valido.iterrows(), start=1):
+        resumen.progreso(procesadas, len(df_valido))
         try:
             # Limpiar y convertir clave a ficha
             ficha = limpiar_y_convertir_clave(row['Clave'])
             if ficha is None:
-                print(f"⚠ Fila {index+1}: Clave inválida '{row['Clave']}' - SALTANDO")
+                resumen.rechazar(index+1, 'Clave inválida', clave=row['Clave'])
                 errores += 1
                 continue
             
             # Limpiar correo
             correo = limpiar_correo(row['Correo electrónico'])
             if correo is None:
-                print(f"⚠ Fila {index+1}: Correo inválido '{row['Correo electrónico']}' - SALTANDO")
+                resumen.rechazar(index+1, 'Correo inválido', correo=row['Correo electrónico'])
                 errores += 1
                 continue
             
             # Buscar empleado por ficha
-            empleado_info = obtener_personal_id_por_ficha(cursor, ficha)
-            if empleado_info is None:
-                print(f"⚠ Fila {index+1}: Empleado no encontrado para ficha {ficha} - SALTANDO")
+            with fase('resolucion'):
+                empleado = indice.por_ficha(ficha)
+            if empleado is None:
+                resumen.rechazar(index+1, 'Empleado no encontrado', ficha=ficha)
                 no_encontrados += 1
                 continue
             
-            personal_id, nombre_completo = empleado_info
+            personal_id, nombre_completo = empleado.personal_id, empleado.nombre_completo
             
             # Actualizar correo institucional
-            if actualizar_correo_institucional(cursor, personal_id, correo):
-                print(f"✓ Ficha {ficha} - {nombre_completo} - {correo}")
+            with fase('escritura'):
+                actualizado = actualizar_correo_institucional(cursor, personal_id, correo)
+            if actualizado:
+                logger.debug(f"✓ Ficha {ficha} - {nombre_completo} - {correo}")
+                cambios[personal_id] = correo
                 actualizados += 1
             else:
-                print(f"✗ Fila {index+1}: Error actualizando correo para {nombre_completo}")
+                resumen.rechazar(index+1, 'Error actualizando correo', ficha=ficha)
                 errores += 1
 
         except Error as e:
-            print(f"✗ Fila {index+1}: Error de base de datos - {e}")
+            resumen.rechazar(index+1, 'Error de base de datos', error=str(e))
             errores += 1
             connection.rollback()
             continue
         except Exception as e:
-            print(f"✗ Fila {index+1}: Error general - {e}")
+            resumen.rechazar(index+1, 'Error general', error=str(e))
             errores += 1
             continue
 
     connection.commit()
     cursor.close()
+    resumen.cerrar()
     print(f"=== Resultado Correos: {actualizados} actualizados, {no_encontrados} no encontrados, {errores} errores ===")
+    return cambios
+
+def migrar_correos_en_conjunto(df_valido, connection, cursor, indice, resumen):
+    """
+    Limpia las columnas de una vez, descarta fichas y correos repetidos en el archivo,
+    resuelve cada ficha en el índice y escribe todo en una sola transacción.
+    Si una ficha se repite con correos distintos gana la última fila; un correo asignado
+    a más de una ficha no se aplica a ninguna (queda en rechazos para revisión).
+    """
+    with fase('limpieza'):
+        datos = pd.DataFrame({
+            'ficha': limpiar_claves(df_valido['Clave']),
+            'correo': limpiar_correos(df_valido['Correo electrónico']),
+        })
+    for index in datos.index[datos['ficha'].isna()]:
+        resumen.rechazar(index+1, 'Clave inválida', clave=df_valido.at[index, 'Clave'])
+    for index in datos.index[datos['ficha'].notna() & datos['correo'].isna()]:
+        resumen.rechazar(index+1, 'Correo inválido', correo=df_valido.at[index, 'Correo electrónico'])
+    errores = int((datos['ficha'].isna() | datos['correo'].isna()).sum())
+    datos = datos.dropna()
+
+    with fase('limpieza'):
+        # Filas idénticas repetidas no cuentan como conflicto
+        datos = datos[~datos.duplicated(keep='last')]
+        ficha_repetida = datos['ficha'].duplicated(keep='last')
+        correo_clave = datos['correo'].str.lower()
+        correo_repetido = correo_clave.map(correo_clave[~ficha_repetida].value_counts()).fillna(0) > 1
+    for index in datos.index[ficha_repetida]:
+        resumen.rechazar(index+1, 'Ficha duplicada en el archivo (se usa la última fila)',
+                         ficha=datos.at[index, 'ficha'], correo=datos.at[index, 'correo'])
+    for index in datos.index[~ficha_repetida & correo_repetido]:
+        resumen.rechazar(index+1, 'Correo asignado a más de una ficha',
+                         ficha=datos.at[index, 'ficha'], correo=datos.at[index, 'correo'])
+    errores += int((~ficha_repetida & correo_repetido).sum())
+    datos = datos[~ficha_repetida & ~correo_repetido]
+
+    asignaciones = {}
+    fichas_sin_empleado = []
+    with fase('resolucion'):
+        for index, ficha, correo in zip(datos.index, datos['ficha'], datos['correo']):
+            empleado = indice.por_ficha(ficha)
+            if empleado is None:
+                resumen.rechazar(index+1, 'Empleado no encontrado', ficha=ficha)
+                fichas_sin_empleado.append(ficha)
+            else:
+                asignaciones[empleado.personal_id] = correo
 
-def mostrar_estadisticas_correos(connection):
-    """Muestra las estadísticas de los correos después de la migración"""
     try:
-        cursor = connection.cursor()
-        
-        print(f"\n=== Estadísticas Post-Migración ===")
-        
-        # Estadísticas generales
-        query_stats = """
-            SELECT 
-                COUNT(*) as total_empleados,
-                COUNT(correo_institucional) as con_correo_institucional,
-                COUNT(email) as con_correo_personal,
-                COUNT(CASE WHEN correo_institucional IS NOT NULL AND correo_institucional != '' THEN 1 END) as con_correo_institucional_valido
-            FROM nompersonal
-            WHERE estado != 'De Baja'
+        with fase('escritura'):
+            actualizar_correos_por_lotes(cursor, asignaciones)
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        resumen.cerrar()
+        raise MigracionFallida(f"Error aplicando los correos, no se guardó ningún cambio: {e}") from e
+    finally:
+        cursor.close()
+    resumen.cerrar()
+    if fichas_sin_empleado:
+        print(f"Fichas sin empleado en nompersonal ({len(fichas_sin_empleado)}): "
+              f"{', '.join(str(f) for f in sorted(fichas_sin_empleado))}")
+    print(f"=== Resultado Correos: {len(asignaciones)} actualizados, {len(fichas_sin_empleado)} no encontrados, {errores} errores ===")
+    return asignaciones
+
+class CoberturaCorreos:
+    """
+    Cobertura de correo institucional de los empleados activos: totales, empleados sin correo
+    y desglose por gerencia (nompersonal.codnivel1 -> nomnivel1). Se construye con un solo
+    recorrido de `nompersonal` y después se actualiza solo con los correos que cambió la
+    migración. Se guardan los contadores y los empleados sin correo, no un registro por
+    empleado, así actualizarla no depende de la cantidad de empleados.
+    """
+
+    SIN_CORREO, VACIO, VALIDO = 0, 1, 2
+
+    def __init__(self):
+        self.con_correo_personal = 0
+        self.conteo = Counter()
+        # gerencia -> [empleados, con correo válido]
+        self.por_gerencia = {}
+        # personal_id -> [ficha, nombre, gerencia, estado del correo] de quienes no tienen correo válido
+        self.faltantes = {}
+        self.max_personal_id = 0
+        self.generado = None
+        # Fecha del último recorrido completo (las actualizaciones incrementales no la cambian)
+        self.escaneado = None
+
+    @property
+    def total(self):
+        return sum(self.conteo.values())
+
+    @classmethod
+    def _estado_correo(cls, correo):
+        if correo is None:
+            return cls.SIN_CORREO
+        return cls.VALIDO if str(correo) != '' else cls.VACIO
+
+    def agregar(self, personal_id, ficha, nombre, gerencia, correo_institucional, email):
+        estado = self._estado_correo(correo_institucional)
+        self.con_correo_personal += email is not None
+        self.max_personal_id = max(self.max_personal_id, personal_id)
+        self.conteo[estado] += 1
+        totales = self.por_gerencia.setdefault(gerencia, [0, 0])
+        totales[0] += 1
+        if estado == self.VALIDO:
+            totales[1] += 1
+        else:
+            self.faltantes[personal_id] = [ficha, nombre, gerencia, estado]
+
+    def actualizar(self, cambios):
         """
-        
-        cursor.execute(query_stats)
-        stats = cursor.fetchone()
-        
-        print(f"Total empleados activos: {stats[0]}")
-        print(f"Con correo institucional: {stats[1]}")
-        print(f"Con correo personal: {stats[2]}")
-        print(f"Con correo institucional válido: {stats[3]}")
-        
-        # Empleados sin correo institucional
-        query_sin_correo = """
-            SELECT ficha, CONCAT(nombres, ' ', apellidos) as nombre_completo
-            FROM nompersonal 
-            WHERE estado != 'De Baja' 
-            AND (correo_institucional IS NULL OR correo_institucional = '')
-            ORDER BY ficha
-            LIMIT 10
+        Aplica {personal_id: correo_institucional} escritos por la migración, que solo escribe
+        correos válidos: un empleado que estaba entre los faltantes pasa a tener correo; uno que no
+        estaba ya lo tenía (o está de baja) y no cambia nada. Retorna cuántos cambios no se pudieron
+        ubicar (un correo vacío para un empleado fuera de los faltantes); con alguno hay que escanear.
         """
-        
-        cursor.execute(query_sin_correo)
-        sin_correo = cursor.fetchall()
-        
-        if sin_correo:
-            print(f"\n=== Empleados sin correo institucional (muestra de 10) ===")
-            for ficha, nombre in sin_correo:
+        sin_ubicar = 0
+        for personal_id, correo in cambios.items():
+            estado = self._estado_correo(correo)
+            empleado = self.faltantes.get(personal_id)
+            if empleado is None:
+                sin_ubicar += estado != self.VALIDO
+                continue
+            self.conteo[empleado[3]] -= 1
+            self.conteo[estado] += 1
+            if estado == self.VALIDO:
+                self.por_gerencia[empleado[2]][1] += 1
+                del self.faltantes[personal_id]
+            else:
+                empleado[3] = estado
+        self.generado = datetime.now().isoformat(timespec='seconds')
+        return sin_ubicar
+
+    @classmethod
+    def escanear(cls, connection, tamano_lote=5000):
+        """Un solo recorrido de los empleados activos con cursor no bufferizado (filas en streaming)."""
+        cobertura = cls()
+        cursor = connection.cursor(buffered=False)
+        try:
+            cursor.execute(f"""
+                SELECT p.personal_id, p.ficha, CONCAT(p.nombres, ' ', p.apellidos),
+                       COALESCE(n.descrip, 'SIN GERENCIA'), p.correo_institucional, p.email
+                FROM nompersonal p
+                LEFT JOIN nomnivel1 n ON n.codorg = p.codnivel1
+                WHERE p.estado != '{ESTADO_BAJA}'
+            """)
+            while True:
+                filas = cursor.fetchmany(tamano_lote)
+                if not filas:
+                    break
+                for fila in filas:
+                    cobertura.agregar(*fila)
+        finally:
+            cursor.close()
+        cobertura.generado = cobertura.escaneado = datetime.now().isoformat(timespec='seconds')
+        return cobertura
+
+    def vencida(self, max_horas=None):
+        """Motivo si pasó más de `max_horas` desde el último recorrido completo (o None). No consulta la BD."""
+        max_horas = COBERTURA_MAX_HORAS if max_horas is None else max_horas
+        if not self.escaneado:
+            return "sin fecha de recorrido completo"
+        horas = (datetime.now() - datetime.fromisoformat(self.escaneado)).total_seconds() / 3600
+        if horas > max_horas:
+            return f"último recorrido completo hace {horas:.0f} h"
+        return None
+
+    def difiere_de_tabla(self, connection):
+        """
+        Motivo si los totales de empleados activos (altas, bajas, correos escritos por otros
+        procesos) no coinciden con una consulta de agregados sobre `nompersonal` (o None).
+        Recorre la tabla, por eso solo se usa a pedido (`--verificar`).
+        """
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT COUNT(*), MAX(personal_id), SUM(correo_institucional IS NULL),
+                       SUM(correo_institucional = ''), SUM(email IS NOT NULL)
+                FROM nompersonal
+                WHERE estado != '{ESTADO_BAJA}'
+            """)
+            en_tabla = [int(valor or 0) for valor in cursor.fetchone()]
+        finally:
+            cursor.close()
+        esperado = [self.total, self.max_personal_id, self.conteo[self.SIN_CORREO],
+                    self.conteo[self.VACIO], self.con_correo_personal]
+        if en_tabla != esperado:
+            return "nompersonal cambió fuera de esta migración"
+        return None
+
+    def guardar(self, ruta):
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump({
+                'generado': self.generado,
+                'escaneado': self.escaneado,
+                'con_correo_personal': self.con_correo_personal,
+                'max_personal_id': self.max_personal_id,
+                'conteo': {str(estado): cantidad for estado, cantidad in self.conteo.items()},
+                'por_gerencia': [[gerencia] + totales for gerencia, totales in self.por_gerencia.items()],
+                'faltantes': [[personal_id] + datos for personal_id, datos in self.faltantes.items()],
+            }, archivo, ensure_ascii=False, default=str)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Estado guardado por `guardar`, o None si el archivo tiene el formato anterior (por empleado)."""
+        with open(ruta, encoding='utf-8') as archivo:
+            estado = json.load(archivo)
+        if 'conteo' not in estado:
+            return None
+        cobertura = cls()
+        cobertura.con_correo_personal = estado['con_correo_personal']
+        cobertura.max_personal_id = estado['max_personal_id']
+        cobertura.conteo = Counter({int(estado_correo): cantidad for estado_correo, cantidad in estado['conteo'].items()})
+        cobertura.por_gerencia = {gerencia: [empleados, con_correo]
+                                  for gerencia, empleados, con_correo in estado['por_gerencia']}
+        cobertura.faltantes = {personal_id: datos for personal_id, *datos in estado['faltantes']}
+        cobertura.generado = estado['generado']
+        cobertura.escaneado = estado.get('escaneado')
+        return cobertura
+
+    def mostrar(self, muestra=10):
+        total = self.total
+        print(f"\n=== Estadísticas Post-Migración ===")
+        print(f"Total empleados activos: {total}")
+        print(f"Con correo institucional: {self.conteo[self.VACIO] + self.conteo[self.VALIDO]}")
+        print(f"Con correo personal: {self.con_correo_personal}")
+        print(f"Con correo institucional válido: {self.conteo[self.VALIDO]}")
+        if total:
+            print(f"Cobertura: {self.conteo[self.VALIDO] / total:.1%}")
+
+        print(f"\n=== Cobertura por gerencia ===")
+        for gerencia, (empleados, con_correo) in sorted(self.por_gerencia.items(), key=lambda item: str(item[0])):
+            if empleados:
+                print(f"{gerencia}: {con_correo}/{empleados} ({con_correo / empleados:.1%})")
+
+        if self.faltantes:
+            print(f"\n=== Empleados sin correo institucional: {len(self.faltantes)} (muestra de {muestra}) ===")
+            primeros = heapq.nsmallest(muestra, self.faltantes.values(), key=lambda datos: limpiar_ficha(datos[0]) or 0)
+            for ficha, nombre, _, _ in primeros:
                 print(f"Ficha {ficha}: {nombre}")
-        
-        cursor.close()
-        
+
+def mostrar_estadisticas_correos(connection, cambios=None, reescanear=False, ruta_estado=None, verificar=False):
+    """
+    Muestra las estadísticas de los correos después de la migración.
+    Con `cambios` ({personal_id: correo}, lo que retorna migrar_correos_desde_excel) y un estado
+    guardado de una ejecución anterior, actualiza los contadores sin consultar `nompersonal`.
+    Hace un recorrido completo si no hay estado, si tiene más de COBERTURA_MAX_HORAS, si
+    `reescanear` es True o si, con `verificar`, los totales no coinciden con la tabla.
+    """
+    ruta_estado = ruta_estado or RUTA_COBERTURA
+    try:
+        cobertura = None
+        if cambios is not None and not reescanear and os.path.exists(ruta_estado):
+            cobertura = CoberturaCorreos.cargar(ruta_estado)
+            motivo = "estado con formato anterior" if cobertura is None else cobertura.vencida()
+            if not motivo and cobertura.actualizar(cambios):
+                motivo = "correos vacíos para empleados fuera de los faltantes"
+            if not motivo and verificar:
+                motivo = cobertura.difiere_de_tabla(connection)
+            if motivo:
+                print(f"Estado de cobertura desactualizado ({motivo}): se hace un recorrido completo.")
+                cobertura = None
+            else:
+                print(f"Cobertura actualizada con {len(cambios)} cambios (recorrido base: {ruta_estado}).")
+        if cobertura is None:
+            cobertura = CoberturaCorreos.escanear(connection)
+        cobertura.guardar(ruta_estado)
+        cobertura.mostrar()
     except Error as e:
         print(f"Error obteniendo estadísticas: {e}")
 
 # Ejecución principal
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Actualiza los correos institucionales desde Excel.")
+    parser.add_argument('--verificar', action='store_true',
+                        help="Compara el estado de cobertura guardado con nompersonal (consulta de agregados)")
+    parser.add_argument('--reescanear', action='store_true',
+                        help="Recalcula la cobertura con un recorrido completo de nompersonal")
+    args = parser.parse_args()
+
     db_connection = crear_conexion_db()
 
     if db_connection:
@@ -203,10 +464,14 @@ if __name__ == "__main__":
             print("🚀 Iniciando actualización de correos institucionales...")
             print("=" * 60)
             
-            migrar_correos_desde_excel(ruta_archivo_excel, db_connection)
-            
-            # Mostrar estadísticas finales
-            mostrar_estadisticas_correos(db_connection)
+            try:
+                cambios = migrar_correos_desde_excel(ruta_archivo_excel, db_connection)
+            except MigracionFallida as e:
+                print(f"❌ {e}")
+            else:
+                # Mostrar estadísticas finales (incrementales si hay un recorrido anterior guardado)
+                mostrar_estadisticas_correos(db_connection, cambios, reescanear=args.reescanear,
+                                             verificar=args.verificar)
             
         db_connection.close()
         print("\n🏁 Actualización completada")
@@ -1,29 +1,34 @@
+import numpy as np
 import pandas as pd
-import mysql.connector
 from mysql.connector import Error
 import os
-from dotenv import load_dotenv
+from collections import Counter
 from decimal import Decimal, InvalidOperation
+from cache_excel import leer_hoja_cacheada
+from sesion_db import crear_conexion_db, indice_unico, insertar_multifila, max_allowed_packet
+from checkpoint import Checkpoint
+from instrumentacion import fase, registrar_filas
+from registro import MigracionFallida, ResumenMigracion, obtener_logger
 
-# Cargar variables de entorno desde el archivo .env
-load_dotenv()
+logger = obtener_logger('posicion')
 
-def crear_conexion_db():
-    """Crea y retorna una conexión a la base de datos MySQL."""
-    try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_DATABASE')
-        )
-        if connection.is_connected():
-            print("✅ Conectado exitosamente a la base de datos MySQL.")
-            return connection
-    except Error as e:
-        print(f"❌ Error al conectar a MySQL: {e}")
-        return None
-    return None
+# Columnas de la partida presupuestaria y su ancho con ceros a la izquierda
+REGLAS_PARTIDA = {
+    'codigo': 3, 'tipo_presupuesto': 1, 'programa': 1,
+    'fuente': 3, 'subprograma': 2, 'actividad': 2, 'objeto_gasto': 3
+}
+# Columna auxiliar con la partida ya calculada para todo el DataFrame
+COLUMNA_PARTIDA = '_partida'
+
+# 'masivo' -> upserts multi-fila deduplicados en una transacción (por defecto); 'fila' -> fila a fila.
+# 'masivo' solo se usa si las claves de CLAVES_UPSERT tienen índice único; si no, se usa 'fila'.
+MODO_ESTRUCTURA = os.getenv('ESTRUCTURA_MODO', 'masivo')
+SAVEPOINT_FILA = 'fila_estructura'
+
+# cwprecue: 'sincronizar' solo agrega partidas nuevas (por defecto); 'recargar' hace TRUNCATE y recarga.
+# Al sincronizar, las partidas que ya no vienen en el Excel se 'reportar' (por defecto) o se 'eliminar'.
+MODO_CWPRECUE = os.getenv('CWPRECUE_MODO', 'sincronizar')
+CWPRECUE_OBSOLETAS = os.getenv('CWPRECUE_OBSOLETAS', 'reportar')
 
 def limpiar_valor(valor, tipo='str'):
     """Limpia y convierte valores de Pandas, manejando NaNs."""
@@ -46,23 +51,44 @@ def limpiar_valor(valor, tipo='str'):
 
 def generar_partida_formateada(row):
     """Genera una cadena de partida presupuestaria formateada a partir de una fila."""
-    partida_format_rules = {
-        'codigo': 3, 'tipo_presupuesto': 1, 'programa': 1,
-        'fuente': 3, 'subprograma': 2, 'actividad': 2, 'objeto_gasto': 3
-    }
+    if COLUMNA_PARTIDA in row:
+        return row[COLUMNA_PARTIDA]
     partes_formateadas = []
-    for col, padding in partida_format_rules.items():
+    for col, padding in REGLAS_PARTIDA.items():
         valor_limpio = limpiar_valor(row.get(col), 'int')
         valor_str = str(valor_limpio) if valor_limpio is not None else '0'
         partes_formateadas.append(valor_str.zfill(padding))
     return ".".join(partes_formateadas)
 
-def migrar_partidas_cwprecue(cursor, df):
-    """Limpia e inserta las partidas presupuestarias únicas en la tabla cwprecue."""
+def calcular_partidas(df):
+    """
+    Partida formateada de todas las filas a la vez (misma regla que `generar_partida_formateada`):
+    cada columna se convierte a número, se trunca a entero y se rellena con ceros; vacío -> '0'.
+    """
+    partes = []
+    for col, padding in REGLAS_PARTIDA.items():
+        if col not in df.columns:
+            partes.append(pd.Series('0'.zfill(padding), index=df.index))
+            continue
+        numeros = pd.to_numeric(df[col].astype(str).str.strip(), errors='coerce')
+        numeros = np.trunc(numeros.where(np.isfinite(numeros)))
+        partes.append(numeros.fillna(0).astype('int64').astype(str).str.zfill(padding))
+    return partes[0].str.cat(partes[1:], sep='.')
+
+@fase('cwprecue')
+def migrar_partidas_cwprecue(cursor, df, modo=None, obsoletas=None):
+    """
+    Lleva las partidas presupuestarias únicas a la tabla cwprecue.
+    `modo` (ver MODO_CWPRECUE): 'sincronizar' inserta solo las partidas nuevas, sin vaciar la tabla;
+    'recargar' vacía la tabla y la vuelve a llenar. `obsoletas` ('reportar' o 'eliminar', ver
+    CWPRECUE_OBSOLETAS) indica qué hacer al sincronizar con las partidas que ya no están en el Excel.
+    """
     print("\n--- Iniciando migración de partidas a `cwprecue` ---")
     
     # 1. Obtener todas las partidas únicas del DataFrame
-    unique_partidas = {generar_partida_formateada(row) for index, row in df.iterrows()}
+    with fase('limpieza'):
+        partidas = df[COLUMNA_PARTIDA] if COLUMNA_PARTIDA in df.columns else calcular_partidas(df)
+        unique_partidas = set(partidas)
     
     if not unique_partidas:
         print("ℹ️ No se encontraron partidas para migrar a `cwprecue`.")
@@ -70,36 +96,110 @@ def migrar_partidas_cwprecue(cursor, df):
 
     print(f"🔍 Se encontraron {len(unique_partidas)} partidas presupuestarias únicas.")
 
+    query_insert = """
+        INSERT INTO cwprecue (CodCue, Denominacion, Tipocta, Tipopuc)
+        VALUES (%s, %s, %s, %s)
+    """
     try:
-        # 2. Limpiar la tabla `cwprecue`
-        print("🗑️  Limpiando la tabla `cwprecue`...")
-        cursor.execute("TRUNCATE TABLE cwprecue")
-        
-        # 3. Preparar los datos para la inserción
-        datos_para_insertar = [
-            (partida, partida, 0, '') for partida in unique_partidas
-        ]
-        
-        # 4. Insertar los datos en lote
-        query_insert = """
-            INSERT INTO cwprecue (CodCue, Denominacion, Tipocta, Tipopuc)
-            VALUES (%s, %s, %s, %s)
-        """
-        cursor.executemany(query_insert, datos_para_insertar)
-        print(f"✨ Se insertaron {cursor.rowcount} registros en `cwprecue`.")
+        if (modo or MODO_CWPRECUE) == 'recargar':
+            print("🗑️  Limpiando la tabla `cwprecue`...")
+            with fase('escritura'):
+                cursor.execute("TRUNCATE TABLE cwprecue")
+            nuevas = unique_partidas
+        else:
+            with fase('resolucion'):
+                cursor.execute("SELECT CodCue FROM cwprecue")
+                existentes = {fila[0] for fila in cursor.fetchall()}
+            nuevas = unique_partidas - existentes
+            sobrantes = sorted(existentes - unique_partidas)
+            print(f"   {len(unique_partidas) - len(nuevas)} ya existen, {len(nuevas)} nuevas, "
+                  f"{len(sobrantes)} en `cwprecue` que no están en el Excel.")
+            if sobrantes:
+                migrar_partidas_obsoletas(cursor, sobrantes, obsoletas or CWPRECUE_OBSOLETAS)
+
+        # Insertar solo lo que falta, en sentencias multi-fila
+        with fase('escritura'):
+            insertadas = insertar_multifila(cursor, query_insert, [(partida, partida, 0, '') for partida in sorted(nuevas)])
+        print(f"✨ Se insertaron {insertadas} registros en `cwprecue`.")
         
     except Error as e:
         print(f"❌ Error durante la migración de `cwprecue`: {e}")
         raise # Re-lanza para que la transacción principal falle
 
-def procesar_cargo(cursor, row):
-    """Actualiza o inserta un registro en la tabla `nomcargos`."""
+def migrar_partidas_obsoletas(cursor, sobrantes, accion):
+    """Reporta (muestra de 20) o elimina las partidas de `cwprecue` que ya no vienen en el Excel."""
+    if accion == 'eliminar':
+        with fase('escritura'):
+            for inicio in range(0, len(sobrantes), 1000):
+                lote = sobrantes[inicio:inicio + 1000]
+                cursor.execute(f"DELETE FROM cwprecue WHERE CodCue IN ({', '.join(['%s'] * len(lote))})", lote)
+        print(f"🗑️  Se eliminaron {len(sobrantes)} partidas obsoletas de `cwprecue`.")
+        return
+    print(f"⚠️ Partidas obsoletas en `cwprecue` (se conservan): {len(sobrantes)}")
+    for partida in sobrantes[:20]:
+        print(f"   - {partida}")
+    if len(sobrantes) > 20:
+        print(f"   … y {len(sobrantes) - 20} más")
+
+# Columnas que ON DUPLICATE KEY UPDATE necesita con índice único para no duplicar filas
+CLAVES_UPSERT = [('nomcargos', 'cod_car'), ('nomposicion', 'nomposicion_id')]
+
+def claves_upsert_faltantes(cursor):
+    """Claves de CLAVES_UPSERT sin índice único propio (tabla.columna)."""
+    return [f"{tabla}.{columna}" for tabla, columna in CLAVES_UPSERT if not indice_unico(cursor, tabla, columna)]
+
+SQL_UPSERT_CARGO = """
+    INSERT INTO nomcargos (cod_car, des_car, sueldo) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE des_car = VALUES(des_car), sueldo = VALUES(sueldo)
+"""
+
+SQL_UPSERT_POSICION = """
+    INSERT INTO nomposicion (
+        nomposicion_id, descripcion_posicion, sueldo_propuesto, sueldo_anual, partida,
+        cargo_id, mes_1, sueldo_2, mes_2, sueldo_3, mes_3, sueldo_4, mes_4
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        descripcion_posicion = VALUES(descripcion_posicion), sueldo_propuesto = VALUES(sueldo_propuesto),
+        sueldo_anual = VALUES(sueldo_anual), partida = VALUES(partida), cargo_id = VALUES(cargo_id),
+        mes_1 = VALUES(mes_1), sueldo_2 = VALUES(sueldo_2), mes_2 = VALUES(mes_2), sueldo_3 = VALUES(sueldo_3),
+        mes_3 = VALUES(mes_3), sueldo_4 = VALUES(sueldo_4), mes_4 = VALUES(mes_4)
+"""
+
+def valores_cargo(row):
+    """(cod_car, des_car, sueldo) de la fila, o None si no tiene cargo presupuestario."""
     cod_car = limpiar_valor(row.get('cargo_presupuestario'), 'int')
     if not cod_car:
-        return
+        return None
+    return (cod_car, limpiar_valor(row.get('desc_cargo')), limpiar_valor(row.get('sueldo_planilla'), 'decimal'))
 
-    des_car = limpiar_valor(row.get('desc_cargo'))
-    sueldo = limpiar_valor(row.get('sueldo_planilla'), 'decimal')
+def valores_posicion(row):
+    """Valores de `nomposicion` en el orden de SQL_UPSERT_POSICION, o None si la fila no tiene posición."""
+    nomposicion_id = limpiar_valor(row.get('posicion'), 'int')
+    if not nomposicion_id:
+        return None
+    sueldo_propuesto = limpiar_valor(row.get('sueldo_planilla'), 'decimal')
+    return (
+        nomposicion_id,
+        limpiar_valor(row.get('desc_cargo')),
+        sueldo_propuesto,
+        sueldo_propuesto * 12 if sueldo_propuesto else None,
+        generar_partida_formateada(row),
+        limpiar_valor(row.get('cargo_presupuestario'), 'int'),
+        limpiar_valor(row.get('mes1'), 'int'),
+        limpiar_valor(row.get('sueldo2'), 'decimal'),
+        limpiar_valor(row.get('mes2'), 'int'),
+        limpiar_valor(row.get('sueldo3'), 'decimal'),
+        limpiar_valor(row.get('mes3'), 'int'),
+        limpiar_valor(row.get('sueldo4'), 'decimal'),
+        limpiar_valor(row.get('mes4'), 'int'),
+    )
+
+def procesar_cargo(cursor, row):
+    """Actualiza o inserta un registro en la tabla `nomcargos`."""
+    valores = valores_cargo(row)
+    if valores is None:
+        return
+    cod_car, des_car, sueldo = valores
 
     try:
         cursor.execute("SELECT cod_cargo FROM nomcargos WHERE cod_car = %s", (cod_car,))
@@ -107,37 +207,23 @@ def procesar_cargo(cursor, row):
             query = "UPDATE nomcargos SET des_car = %s, sueldo = %s WHERE cod_car = %s"
             values = (des_car, sueldo, cod_car)
             cursor.execute(query, values)
-            print(f"  → Cargo actualizado: {cod_car} - {des_car}")
+            logger.debug(f"  → Cargo actualizado: {cod_car} - {des_car}")
         else:
             query = "INSERT INTO nomcargos (cod_car, des_car, sueldo) VALUES (%s, %s, %s)"
             values = (cod_car, des_car, sueldo)
             cursor.execute(query, values)
-            print(f"  → Cargo CREADO: {cod_car} - {des_car}")
+            logger.debug(f"  → Cargo CREADO: {cod_car} - {des_car}")
     except Error as e:
-        print(f"  ❌ Error procesando cargo {cod_car}: {e}")
+        logger.debug(f"  ❌ Error procesando cargo {cod_car}: {e}")
         raise
 
 def procesar_posicion(cursor, row):
     """Actualiza o inserta un registro en la tabla `nomposicion`."""
-    nomposicion_id = limpiar_valor(row.get('posicion'), 'int')
-    if not nomposicion_id:
-        print("  ⚠️ Fila sin 'posicion', no se puede procesar `nomposicion`.")
+    valores = valores_posicion(row)
+    if valores is None:
+        logger.debug("  ⚠️ Fila sin 'posicion', no se puede procesar `nomposicion`.")
         return
-
-    partida_presupuestaria = generar_partida_formateada(row)
-    sueldo_propuesto = limpiar_valor(row.get('sueldo_planilla'), 'decimal')
-    
-    sueldo_anual = sueldo_propuesto * 12 if sueldo_propuesto else None
-    cargo_id = limpiar_valor(row.get('cargo_presupuestario'), 'int')
-    descripcion_posicion = limpiar_valor(row.get('desc_cargo'))
-    
-    sueldo_2 = limpiar_valor(row.get('sueldo2'), 'decimal')
-    mes_1 = limpiar_valor(row.get('mes1'), 'int')
-    sueldo_3 = limpiar_valor(row.get('sueldo3'), 'decimal')
-    mes_2 = limpiar_valor(row.get('mes2'), 'int')
-    sueldo_4 = limpiar_valor(row.get('sueldo4'), 'decimal')
-    mes_3 = limpiar_valor(row.get('mes3'), 'int')
-    mes_4 = limpiar_valor(row.get('mes4'), 'int')
+    nomposicion_id, partida_presupuestaria = valores[0], valores[4]
 
     try:
         cursor.execute("SELECT id FROM nomposicion WHERE nomposicion_id = %s", (nomposicion_id,))
@@ -149,11 +235,8 @@ def procesar_posicion(cursor, row):
                     mes_3 = %s, sueldo_4 = %s, mes_4 = %s
                 WHERE nomposicion_id = %s
             """
-            values = (
-                descripcion_posicion, sueldo_propuesto, sueldo_anual, partida_presupuestaria, cargo_id,
-                mes_1, sueldo_2, mes_2, sueldo_3, mes_3, sueldo_4, mes_4, nomposicion_id
-            )
-            print(f"  ✓ Posición actualizada: {nomposicion_id} (Partida: {partida_presupuestaria})")
+            values = valores[1:] + (nomposicion_id,)
+            logger.debug(f"  ✓ Posición actualizada: {nomposicion_id} (Partida: {partida_presupuestaria})")
         else:
             query = """
                 INSERT INTO nomposicion (
@@ -161,74 +244,167 @@ def procesar_posicion(cursor, row):
                     cargo_id, mes_1, sueldo_2, mes_2, sueldo_3, mes_3, sueldo_4, mes_4
                 ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
-            values = (
-                nomposicion_id, descripcion_posicion, sueldo_propuesto, sueldo_anual, partida_presupuestaria,
-                cargo_id, mes_1, sueldo_2, mes_2, sueldo_3, mes_3, sueldo_4, mes_4
-            )
-            print(f"  ✓ Posición CREADA: {nomposicion_id} (Partida: {partida_presupuestaria})")
+            values = valores
+            logger.debug(f"  ✓ Posición CREADA: {nomposicion_id} (Partida: {partida_presupuestaria})")
         
         cursor.execute(query, values)
     except Error as e:
-        print(f"  ❌ Error procesando posición {nomposicion_id}: {e}")
+        logger.debug(f"  ❌ Error procesando posición {nomposicion_id}: {e}")
         raise
 
-def migrar_estructura(ruta_excel, connection):
-    """Función principal que orquesta la migración desde el archivo Excel."""
+def procesar_fila_estructura(cursor, row):
+    with fase('escritura'):
+        procesar_cargo(cursor, row)
+        procesar_posicion(cursor, row)
+
+def deduplicar_estructura(df):
+    """
+    Un registro por cargo y por posición. Si el mismo `cargo_presupuestario` o la misma
+    `posicion` aparece en varias filas, gana la última fila del Excel (igual que al
+    procesar fila a fila, donde cada fila sobrescribe a la anterior).
+    Retorna (cargos, posiciones, filas_reemplazadas) con cargos/posiciones como {clave: valores}.
+    """
+    cargos = {}
+    posiciones = {}
+    reemplazadas = Counter()
+    for row in df.to_dict('records'):
+        cargo = valores_cargo(row)
+        if cargo is not None:
+            reemplazadas['cargos'] += cargo[0] in cargos
+            cargos[cargo[0]] = cargo
+        posicion = valores_posicion(row)
+        if posicion is not None:
+            reemplazadas['posiciones'] += posicion[0] in posiciones
+            posiciones[posicion[0]] = posicion
+    return cargos, posiciones, reemplazadas
+
+def upsert_estructura(connection, cursor, df):
+    """
+    Escribe cargos y posiciones con INSERT ... ON DUPLICATE KEY UPDATE multi-fila (requiere
+    índice único en nomcargos.cod_car y nomposicion.nomposicion_id). No confirma.
+    """
+    with fase('limpieza'):
+        cargos, posiciones, reemplazadas = deduplicar_estructura(df)
+    print(f"🔍 {len(cargos)} cargos y {len(posiciones)} posiciones distintos "
+          f"({reemplazadas['cargos']} y {reemplazadas['posiciones']} filas repetidas; gana la última).")
+    max_bytes = max_allowed_packet(connection) // 2
+    with fase('escritura'):
+        insertar_multifila(cursor, SQL_UPSERT_CARGO, cargos.values(), max_bytes=max_bytes)
+        insertar_multifila(cursor, SQL_UPSERT_POSICION, posiciones.values(), max_bytes=max_bytes)
+    return len(cargos), len(posiciones)
+
+def migrar_estructura(ruta_excel, connection, commit_cada=None, modo=None):
+    """
+    Función principal que orquesta la migración desde el archivo Excel.
+    `modo` (ver MODO_ESTRUCTURA):
+      'masivo' -> cwprecue, cargos y posiciones en una sola transacción con upserts multi-fila.
+                  Si falla, se revierte y se repite fila por fila para aislar las filas con error.
+                  Sin índice único en las claves (CLAVES_UPSERT) se usa 'fila'.
+      'fila'   -> cargos y posiciones fila a fila con un SAVEPOINT por fila, confirmados cada
+                  `commit_cada` filas con checkpoint.
+    Lanza MigracionFallida si no se pudo leer el archivo o se revirtió la migración.
+    """
     print(f"\n🚀 Iniciando migración desde: {ruta_excel}")
     
     try:
-        df = pd.read_excel(ruta_excel, dtype=str)
+        df = leer_hoja_cacheada(ruta_excel, dtype=str)
         print(f"📄 Archivo Excel leído. Se encontraron {len(df)} filas.")
-    except FileNotFoundError:
-        print(f"❌ ERROR: No se encontró el archivo en la ruta: {ruta_excel}")
-        return
+        registrar_filas(len(df))
+        with fase('limpieza'):
+            df[COLUMNA_PARTIDA] = calcular_partidas(df)
+    except FileNotFoundError as e:
+        raise MigracionFallida(f"ERROR: No se encontró el archivo en la ruta: {ruta_excel}") from e
     except Exception as e:
-        print(f"❌ ERROR: No se pudo leer el archivo Excel: {e}")
-        return
+        raise MigracionFallida(f"ERROR: No se pudo leer el archivo Excel: {e}") from e
 
     cursor = connection.cursor()
     
     try:
-        # PRIMER PASO: Migrar las partidas únicas a `cwprecue`
-        migrar_partidas_cwprecue(cursor, df)
-        connection.commit() # Guardamos este paso
-        
-        # SEGUNDO PASO: Procesar cada fila para `nomcargos` y `nomposicion`
-        print("\n--- Iniciando migración de Cargos y Posiciones ---")
-        insertados_actualizados = 0
-        errores = 0
-        for index, row in df.iterrows():
-            print(f"\nProcesando Fila {index + 2} del Excel...")
+        modo = modo or MODO_ESTRUCTURA
+        if modo == 'masivo':
+            faltantes = claves_upsert_faltantes(cursor)
+            if faltantes:
+                print(f"⚠️ Sin índice único en {', '.join(faltantes)}: los upserts duplicarían filas. "
+                      "Se procesará fila por fila.")
+                modo = 'fila'
+        if modo == 'masivo':
             try:
-                procesar_cargo(cursor, row)
-                procesar_posicion(cursor, row)
+                migrar_partidas_cwprecue(cursor, df)
+                print("\n--- Iniciando migración de Cargos y Posiciones ---")
+                cargos, posiciones = upsert_estructura(connection, cursor, df)
                 connection.commit()
-                insertados_actualizados += 1
-                print(f"✅ Fila {index + 2} procesada y guardada.")
-            except Error:
-                print(f"ROLLBACK: Se revirtieron los cambios para la fila {index + 2} debido a un error.")
+                print("\n" + "="*60)
+                print("🏁 Migración de Cargos y Posiciones completada.")
+                print(f"   - Cargos escritos: {cargos}")
+                print(f"   - Posiciones escritas: {posiciones}")
+                print("="*60)
+                return
+            except Error as e:
                 connection.rollback()
-                errores += 1
-                continue
-        
-        print("\n" + "="*60)
-        print("🏁 Migración de Cargos y Posiciones completada.")
-        print(f"   - Filas procesadas con éxito: {insertados_actualizados}")
-        print(f"   - Filas con errores (revertidas): {errores}")
-        print("="*60)
+                print(f"⚠️ Falló la carga masiva ({e}). Se revirtió y se procesará fila por fila.")
+        migrar_estructura_por_filas(ruta_excel, df, connection, cursor, commit_cada)
 
     except Exception as e:
-        print(f"❌ ERROR CRÍTICO durante la migración. Revirtiendo todos los cambios. Error: {e}")
         connection.rollback()
+        raise MigracionFallida(f"ERROR CRÍTICO durante la migración. Se revirtieron los cambios. Error: {e}") from e
     finally:
         cursor.close()
 
+def migrar_estructura_por_filas(ruta_excel, df, connection, cursor, commit_cada=None):
+    """
+    Cargos y posiciones fila a fila, confirmados cada `commit_cada` filas con checkpoint.
+    Antes de cada fila se abre un SAVEPOINT: si la fila falla solo se deshace hasta ese punto,
+    se registra como rechazada y el resto del lote se confirma normalmente.
+    """
+    checkpoint = Checkpoint(connection, 'estructura', ruta_excel, commit_cada)
+
+    # PRIMER PASO: Migrar las partidas únicas a `cwprecue`
+    if checkpoint.reanudando:
+        print(f"\nReanudando desde el checkpoint (fila {checkpoint.ultima_fila + 2}); `cwprecue` ya fue migrada.")
+    else:
+        migrar_partidas_cwprecue(cursor, df)
+        connection.commit() # Guardamos este paso
+    
+    # SEGUNDO PASO: Procesar cada fila para `nomcargos` y `nomposicion`
+    print("\n--- Iniciando migración de Cargos y Posiciones ---")
+    resumen = ResumenMigracion('posicion')
+    insertados_actualizados = 0
+    errores = 0
+    for procesadas, (index, row) in enumerate(checkpoint.filas(df.iterrows()), start=1):
+        resumen.progreso(procesadas, len(df))
+        logger.debug(f"Procesando Fila {index + 2} del Excel...")
+        # Un SAVEPOINT con el mismo nombre reemplaza al de la fila anterior
+        cursor.execute(f"SAVEPOINT {SAVEPOINT_FILA}")
+        try:
+            procesar_fila_estructura(cursor, row)
+            insertados_actualizados += 1
+            logger.debug(f"✅ Fila {index + 2} procesada.")
+        except Error as e:
+            # Solo se deshace esta fila. Si el servidor ya revirtió toda la transacción
+            # (deadlock), el savepoint no existe y el error sube al manejo general.
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {SAVEPOINT_FILA}")
+            resumen.rechazar(index + 2, 'Error de base de datos (fila revertida)',
+                             posicion=row.get('posicion'), cargo=row.get('cargo_presupuestario'), error=str(e))
+            errores += 1
+            continue
+    checkpoint.completar()
+    resumen.cerrar()
+    
+    print("\n" + "="*60)
+    print("🏁 Migración de Cargos y Posiciones completada.")
+    print(f"   - Filas procesadas con éxito: {insertados_actualizados}")
+    print(f"   - Filas con errores (revertidas): {errores}")
+    print("="*60)
+
 # --- Bloque de Ejecución Principal ---
 if __name__ == "__main__":
     db_connection = crear_conexion_db()
 
     if db_connection:
         ruta_archivo_excel = 'formatos/Estructura-Junio-2025.xlsx'
-        migrar_estructura(ruta_archivo_excel, db_connection)
+        try:
+            migrar_estructura(ruta_archivo_excel, db_connection)
+        except MigracionFallida as e:
+            print(f"❌ {e}")
         db_connection.close()
         print("\n🔒 Conexión a la base de datos cerrada.")
\ No newline at end of file
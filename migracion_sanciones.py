@@ -1,82 +1,16 @@
 import pandas as pd
-import mysql.connector
 from mysql.connector import Error
 import os
-from dotenv import load_dotenv
-import re
 from datetime import date
+from identidad_empleados import cargar_indice_empleados
+from cache_excel import leer_hoja_cacheada
+from sesion_db import crear_conexion_db, cursor_preparado
+from instrumentacion import fase, registrar_filas
+from registro import MigracionFallida, ResumenMigracion, obtener_logger
 
-load_dotenv()
-
-def crear_conexion_db():
-    try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_DATABASE')
-        )
-        if connection.is_connected():
-            print("Conectado a MySQL")
-            return connection
-    except Error as e:
-        print(f"Error MySQL: {e}")
-        return None
-
-def limpiar_y_convertir_ficha(ficha_str):
-    """Convierte E03940 a 3940"""
-    if pd.isna(ficha_str) or not isinstance(ficha_str, str):
-        return None
-    numeros = re.findall(r'\d+', ficha_str)
-    if numeros:
-        return int("".join(numeros))
-    return None
-
-def limpiar_cedula(cedula):
-    """Limpia formato de cédula"""
-    if pd.isna(cedula):
-        return None
-    
-    cedula_str = str(cedula).strip()
-    # Remover comillas, espacios y guiones extras
-    cedula_limpia = cedula_str.replace("'", "").replace('"', "").strip()
-    
-    # Si tiene espacios o guiones al final, limpiarlos
-    if cedula_limpia.endswith(' -') or cedula_limpia.endswith('-'):
-        cedula_limpia = cedula_limpia.rstrip(' -')
-    
-    return cedula_limpia if cedula_limpia else None
-
-def obtener_personal_id_por_ficha(cursor, ficha_str):
-    """Busca empleado por ficha"""
-    ficha_limpia = limpiar_y_convertir_ficha(ficha_str)
-    if ficha_limpia is None:
-        return None
-    
-    try:
-        query = "SELECT personal_id FROM nompersonal WHERE ficha = %s"
-        cursor.execute(query, (ficha_limpia,))
-        resultado = cursor.fetchone()
-        return resultado[0] if resultado else None
-    except Error as e:
-        print(f"Error buscando ficha {ficha_limpia}: {e}")
-        return None
-
-def obtener_personal_id_por_cedula(cursor, cedula):
-    """Busca empleado por cédula"""
-    cedula_limpia = limpiar_cedula(cedula)
-    if not cedula_limpia:
-        return None
-    
-    try:
-        query = "SELECT personal_id FROM nompersonal WHERE cedula = %s AND estado != 'De Baja'"
-        cursor.execute(query, (cedula_limpia,))
-        resultado = cursor.fetchone()
-        return resultado[0] if resultado else None
-    except Error as e:
-        print(f"Error buscando cédula {cedula_limpia}: {e}")
-        return None
+logger = obtener_logger('sanciones')
 
+@fase('resolucion')
 def mapear_tipo_sancion_a_subtipo_id(cursor, tipo_sancion):
     """Mapea el tipo del Excel al ID del subtipo en la BD"""
     if pd.isna(tipo_sancion):
@@ -104,7 +38,7 @@ def mapear_tipo_sancion_a_subtipo_id(cursor, tipo_sancion):
     
     nombre_subtipo = mapeo_tipos.get(tipo_limpio)
     if not nombre_subtipo:
-        print(f"⚠ Tipo de sanción no mapeado: '{tipo_sancion}' -> usando 'Amonestación Escrita' por defecto")
+        logger.debug(f"⚠ Tipo de sanción no mapeado: '{tipo_sancion}' -> usando 'Amonestación Escrita' por defecto")
         nombre_subtipo = 'Amonestación Escrita'
     
     try:
@@ -117,13 +51,14 @@ def mapear_tipo_sancion_a_subtipo_id(cursor, tipo_sancion):
         if resultado:
             return resultado[0]
         else:
-            print(f"⚠ Subtipo no encontrado en BD: '{nombre_subtipo}' - usando ID 3 por defecto")
+            logger.debug(f"⚠ Subtipo no encontrado en BD: '{nombre_subtipo}' - usando ID 3 por defecto")
             return 3  # Amonestación Escrita por defecto
             
     except Error as e:
-        print(f"Error buscando subtipo '{nombre_subtipo}': {e}")
+        logger.warning(f"Error buscando subtipo '{nombre_subtipo}': {e}")
         return 3  # Default
 
+@fase('escritura')
 def generar_numero_expediente(cursor, subtipo_id):
     """Genera número de expediente incrementando correlativo del subtipo"""
     try:
@@ -139,7 +74,7 @@ def generar_numero_expediente(cursor, subtipo_id):
         return resultado[0] if resultado else 1
         
     except Error as e:
-        print(f"Error generando número de expediente para subtipo {subtipo_id}: {e}")
+        logger.warning(f"Error generando número de expediente para subtipo {subtipo_id}: {e}")
         return 1
 
 def limpiar_valor(valor):
@@ -165,27 +100,16 @@ def procesar_fecha(fecha_raw):
     except:
         return None
 
-def obtener_cedula_empleado(cursor, personal_id):
-    """Obtiene la cédula del empleado por su personal_id"""
-    try:
-        query = "SELECT cedula FROM nompersonal WHERE personal_id = %s"
-        cursor.execute(query, (personal_id,))
-        resultado = cursor.fetchone()
-        return resultado[0] if resultado else None
-    except Error as e:
-        print(f"Error obteniendo cédula para personal_id {personal_id}: {e}")
-        return None
-
 def migrar_sanciones_desde_excel(ruta_excel, connection):
     print(f"\n=== Procesando: Sanciones ===")
     
     try:
-        df = pd.read_excel(ruta_excel)
+        df = leer_hoja_cacheada(ruta_excel)
     except Exception as e:
-        print(f"ERROR leyendo archivo Excel: {e}")
-        return
+        raise MigracionFallida(f"ERROR leyendo archivo Excel: {e}") from e
 
     print(f"Filas totales: {len(df)}")
+    registrar_filas(len(df))
     
     # Filtrar filas que tengan al menos ficha o cédula
     df_valido = df[df['No.'].notna() | df['Cédula '].notna()]
@@ -196,35 +120,41 @@ def migrar_sanciones_desde_excel(ruta_excel, connection):
         return
     
     cursor = connection.cursor()
+    # El INSERT de expedientes se repite en cada fila: se prepara una sola vez
+    cursor_insercion = cursor_preparado(connection)
+    indice = cargar_indice_empleados(cursor)
+    resumen = ResumenMigracion('sanciones')
     insertados = 0
     errores = 0
 
-    for index, row in df_valido.iterrows():
+    for procesadas, (index, row) in enumerate(df_valido.iterrows(), start=1):
+        resumen.progreso(procesadas, len(df_valido))
         try:
             # Buscar empleado primero por ficha, luego por cédula
-            empleado_id = None
+            empleado = None
             identificador = ""
             
-            # Intentar por ficha
-            if pd.notna(row.get('No.')):
-                empleado_id = obtener_personal_id_por_ficha(cursor, row['No.'])
-                identificador = f"ficha {row['No.']}"
-            
-            # Si no se encontró por ficha, intentar por cédula
-            if empleado_id is None and pd.notna(row.get('Cédula ')):
-                empleado_id = obtener_personal_id_por_cedula(cursor, row['Cédula '])
-                identificador = f"cédula {row['Cédula ']}"
+            with fase('resolucion'):
+                # Intentar por ficha
+                if pd.notna(row.get('No.')):
+                    empleado = indice.por_ficha(row['No.'])
+                    identificador = f"ficha {row['No.']}"
+                
+                # Si no se encontró por ficha, intentar por cédula
+                if empleado is None and pd.notna(row.get('Cédula ')):
+                    empleado = indice.por_cedula(row['Cédula '], solo_activos=True)
+                    identificador = f"cédula {row['Cédula ']}"
             
             # Validar que se encontró el empleado
-            if empleado_id is None:
-                print(f"⚠ Fila {index+1}: Empleado no encontrado para {identificador} - SALTANDO")
+            if empleado is None:
+                resumen.rechazar(index+1, 'Empleado no encontrado', identificador=identificador)
                 errores += 1
                 continue
             
-            # Obtener cédula del empleado
-            cedula_empleado = obtener_cedula_empleado(cursor, empleado_id)
+            empleado_id = empleado.personal_id
+            cedula_empleado = empleado.cedula
             if not cedula_empleado:
-                print(f"⚠ Fila {index+1}: No se pudo obtener cédula del empleado ID {empleado_id}")
+                resumen.rechazar(index+1, 'Empleado sin cédula', personal_id=empleado_id)
                 errores += 1
                 continue
             
@@ -239,7 +169,7 @@ def migrar_sanciones_desde_excel(ruta_excel, connection):
             
             tipo_sancion = limpiar_valor(row.get('Tipo'))
             if not tipo_sancion:
-                print(f"⚠ Fila {index+1}: Sin tipo de sanción - SALTANDO")
+                resumen.rechazar(index+1, 'Sin tipo de sanción', memo=memo)
                 errores += 1
                 continue
             
@@ -255,8 +185,9 @@ def migrar_sanciones_desde_excel(ruta_excel, connection):
             
             # Verificar si ya existe este memo
             query_check = "SELECT COUNT(*) FROM expediente WHERE memo = %s AND tipo = 5"
-            cursor.execute(query_check, (memo,))
-            existe = cursor.fetchone()[0] > 0
+            with fase('resolucion'):
+                cursor.execute(query_check, (memo,))
+                existe = cursor.fetchone()[0] > 0
             
             if existe:
                 memo = f"{memo}-{accion_nro}"  # Modificar memo si existe
@@ -294,29 +225,28 @@ def migrar_sanciones_desde_excel(ruta_excel, connection):
                 descripcion               # descripcion (NOT NULL)
             )
             
-            cursor.execute(query_insert, valores)
+            with fase('escritura'):
+                cursor_insercion.execute(query_insert, valores)
             
-            # Obtener nombre del empleado para el log
-            query_nombre = "SELECT CONCAT(nombres, ' ', apellidos) FROM nompersonal WHERE personal_id = %s"
-            cursor.execute(query_nombre, (empleado_id,))
-            nombre_empleado = cursor.fetchone()
-            nombre_empleado = nombre_empleado[0] if nombre_empleado else "N/A"
+            nombre_empleado = empleado.nombre_completo or "N/A"
             
-            print(f"✓ {memo} - {nombre_empleado} - {tipo_sancion}")
+            logger.debug(f"✓ {memo} - {nombre_empleado} - {tipo_sancion}")
             insertados += 1
 
         except Error as e:
-            print(f"✗ Fila {index+1} ({memo if 'memo' in locals() else 'S/N'}): {e}")
+            resumen.rechazar(index+1, 'Error de base de datos', memo=memo if 'memo' in locals() else 'S/N', error=str(e))
             errores += 1
             connection.rollback()
             continue
         except Exception as e:
-            print(f"✗ Fila {index+1}: Error general - {e}")
+            resumen.rechazar(index+1, 'Error general', error=str(e))
             errores += 1
             continue
 
     connection.commit()
+    cursor_insercion.close()
     cursor.close()
+    resumen.cerrar()
     print(f"=== Resultado Sanciones: {insertados} insertados, {errores} errores ===")
 
 def mostrar_estadisticas_subtipos(connection):
@@ -370,10 +300,13 @@ if __name__ == "__main__":
             print("🚀 Iniciando migración de sanciones disciplinarias...")
             print("=" * 60)
             
-            migrar_sanciones_desde_excel(ruta_archivo_excel, db_connection)
-            
-            # Mostrar estadísticas finales
-            mostrar_estadisticas_subtipos(db_connection)
+            try:
+                migrar_sanciones_desde_excel(ruta_archivo_excel, db_connection)
+            except MigracionFallida as e:
+                print(f"❌ {e}")
+            else:
+                # Mostrar estadísticas finales
+                mostrar_estadisticas_subtipos(db_connection)
             
         db_connection.close()
         print("\n🏁 Migración completada")
@@ -1,30 +1,46 @@
+import numpy as np
 import pandas as pd
-import mysql.connector
 from mysql.connector import Error
+import argparse
+import json
 import os
-from dotenv import load_dotenv
-import re
 from datetime import datetime, timedelta, date
 from dateutil.relativedelta import relativedelta
+from identidad_empleados import cargar_indice_empleados, limpiar_ficha, normalizar_cedula
+from lectura_excel import iterar_filas, leer_encabezados, leer_excel_por_lotes
+from sesion_db import BufferInserciones, cargar_datos_local, crear_conexion_db, insertar_multifila, max_allowed_packet
+from checkpoint import Checkpoint
+from plan_migracion import al_aplicar
+from instrumentacion import fase, registrar_filas
+from registro import MigracionFallida, ResumenMigracion
 
-# Cargar variables de entorno desde el archivo .env
-load_dotenv()
+# 'directo' -> TRUNCATE de periodos_vacaciones y carga con checkpoint (por defecto)
+# 'sombra'  -> carga completa en una tabla sombra, validación y RENAME TABLE atómico
+# 'delta'   -> solo regenera los empleados cuyo saldo cambió respecto del snapshot anterior
+MODO_VACACIONES = os.getenv('VACACIONES_MODO', 'directo')
 
-def crear_conexion_db():
-    """Crea y retorna una conexión a la base de datos MySQL."""
-    try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            database=os.getenv('DB_DATABASE')
-        )
-        if connection.is_connected():
-            print("Conexión a MySQL exitosa.")
-            return connection
-    except Error as e:
-        print(f"Error al conectar a MySQL: {e}")
-        return None
+# Snapshot del último archivo aplicado (modo 'delta'): por empleado, cédula, ingreso y días,
+# más la fecha de referencia con la que se calcularon los períodos. 'sombra' lo reescribe y
+# 'directo' lo borra (la siguiente ejecución 'delta' regenera toda la tabla). En modo plan ambos
+# cambios se registran en el plan y se hacen al aplicarlo (plan_migracion.al_aplicar).
+RUTA_SNAPSHOT = os.getenv('VACACIONES_SNAPSHOT', os.path.join('reportes', 'snapshot_vacaciones.json'))
+
+# Cédulas por DELETE ... IN en el modo 'delta'
+LOTE_BORRADO = 1000
+
+TABLA_PERIODOS = 'periodos_vacaciones'
+# Savepoint por empleado al reintentar un lote de INSERT que falló
+SAVEPOINT_EMPLEADO = 'empleado_vacaciones'
+TABLA_SOMBRA = 'periodos_vacaciones_nueva'
+TABLA_ANTERIOR = 'periodos_vacaciones_anterior'
+
+# Mapeo de columnas robusto a posibles variaciones
+MAPEO_COLUMNAS = {
+    'ficha': 'NO. DE EMPLEADO',
+    'cedula': 'No. DE CEDULA',
+    'dias_pendientes': 'DIAS PENDIENTES A LA FECHA',
+    'dias_caducados': 'DIAS CADUCADOS'
+}
 
 def limpiar_tablas_vacaciones(cursor):
     """Limpia la tabla de vacaciones usando TRUNCATE para reiniciar el auto_increment."""
@@ -40,34 +56,6 @@ def limpiar_tablas_vacaciones(cursor):
         print(f"Error limpiando tablas: {e}")
         return False
 
-def limpiar_ficha(num_empleado):
-    """Limpia el número de empleado, extrayendo solo los dígitos."""
-    if pd.isna(num_empleado):
-        return None
-    try:
-        # Extrae todos los dígitos de la cadena
-        solo_digitos = re.sub(r'\D', '', str(num_empleado))
-        return int(solo_digitos) if solo_digitos else None
-    except (ValueError, TypeError):
-        return None
-
-def limpiar_cedula(cedula_raw):
-    """Limpia y formatea el número de cédula."""
-    if pd.isna(cedula_raw):
-        return None
-    # Elimina todo lo que no sea número o letra (para casos como E-8-12345)
-    return re.sub(r'[^a-zA-Z0-9]', '', str(cedula_raw)).strip()
-
-def obtener_empleado_por_ficha_cedula(cursor, ficha, cedula):
-    """Busca un empleado por su número de ficha o cédula."""
-    try:
-        query = "SELECT personal_id, cedula, apenom, fecing, ficha FROM nompersonal WHERE ficha = %s OR cedula = %s"
-        cursor.execute(query, (ficha, cedula))
-        return cursor.fetchone()
-    except Error as e:
-        print(f"Error buscando empleado (ficha {ficha}, cédula {cedula}): {e}")
-        return None
-
 def normalizar_fecha(fecha_input):
     """Convierte de forma segura varios formatos de fecha a un objeto datetime."""
     if pd.isna(fecha_input):
@@ -78,25 +66,55 @@ def normalizar_fecha(fecha_input):
         return datetime.combine(fecha_input, datetime.min.time())
     return None # Si no es un tipo de fecha reconocido, no se procesa
 
-def generar_periodos_historicos(cursor, empleado_info, dias_pendientes, dias_caducados):
+# Columnas de cada período generado, en el orden del INSERT
+COLUMNAS_PERIODO = [
+    'cedula', 'tipo', 'fini_periodo', 'ffin_periodo', 'asignados', 'dias', 'saldo',
+    'caducados', 'estatus', 'observacion', 'saldo_anterior'
+]
+
+SQL_PERIODO = """INSERT INTO periodos_vacaciones (cedula, tipo, fini_periodo, ffin_periodo, asignados, dias, saldo, caducados, estatus, observacion, saldo_anterior)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+
+# Carga de los períodos generados: 'multifila' (INSERT de varias filas, en trozos según
+# max_allowed_packet) o 'load_data' (LOAD DATA LOCAL INFILE; requiere DB_LOCAL_INFILE=1)
+CARGA_VACACIONES = os.getenv('VACACIONES_CARGA', 'multifila')
+
+def insertar_periodos(connection, cursor, filas, metodo=None, tabla='periodos_vacaciones'):
+    """
+    Inserta filas de períodos (orden de COLUMNAS_PERIODO) en bloque. Retorna cuántas envió.
+    En modo plan siempre usa 'multifila': el archivo temporal de LOAD DATA no sobrevive al plan.
+    """
+    metodo = metodo or CARGA_VACACIONES
+    if metodo not in ('multifila', 'load_data'):
+        raise ValueError(f"Método de carga desconocido: {metodo}")
+    with fase('escritura'):
+        if metodo == 'load_data' and not getattr(connection, 'modo_plan', False):
+            return cargar_datos_local(cursor, tabla, COLUMNAS_PERIODO, filas)
+        sentencia = SQL_PERIODO.replace('INTO periodos_vacaciones', f'INTO {tabla}', 1)
+        return insertar_multifila(cursor, sentencia, filas, max_bytes=max_allowed_packet(connection) // 2)
+
+def calcular_periodos_historicos(empleado_info, dias_pendientes, dias_caducados, fecha_actual=None):
     """
     Genera los períodos históricos de forma precisa, distribuyendo tanto los días
     caducados como el saldo en sus respectivos períodos hacia atrás, respetando
     la regla de adquisición de derecho a los 11 meses.
+    No escribe nada: retorna (exito, mensaje, filas) con las filas en el orden de COLUMNAS_PERIODO.
+    `fecha_actual` es la fecha de referencia (por defecto, ahora).
     """
+    filas = []
     try:
         personal_id, cedula, nombre_completo, fecing, ficha = empleado_info
         
         fecha_ingreso = normalizar_fecha(fecing)
         if not fecha_ingreso:
-            return False, f"Empleado {ficha} no tiene fecha de ingreso válida."
+            return False, f"Empleado {ficha} no tiene fecha de ingreso válida.", filas
 
         dias_saldo = int(float(dias_pendientes)) if pd.notna(dias_pendientes) else 0
         dias_caducados_int = int(float(dias_caducados)) if pd.notna(dias_caducados) else 0
+        fecha_actual = fecha_actual or datetime.now()
         
         # --- MANEJO DE SALDO NEGATIVO ---
         if dias_saldo < 0:
-            fecha_actual = datetime.now()
             anio_actual_aniversario = fecha_ingreso.year + (fecha_actual.year - fecha_ingreso.year)
             fecha_aniversario_actual = fecha_ingreso.replace(year=anio_actual_aniversario)
             
@@ -108,21 +126,16 @@ def generar_periodos_historicos(cursor, empleado_info, dias_pendientes, dias_cad
                 fecha_fin_periodo = fecha_aniversario_actual + relativedelta(years=1) - timedelta(days=1)
             
             descripcion = f"Ajuste por migración de saldo negativo: {dias_saldo} días"
-            cursor.execute(
-                """INSERT INTO periodos_vacaciones (cedula, tipo, fini_periodo, ffin_periodo, asignados, dias, saldo, caducados, estatus, observacion, saldo_anterior)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                (cedula, 4, fecha_inicio_periodo.date(), fecha_fin_periodo.date(), 0, abs(dias_saldo), dias_saldo, 0, 1, descripcion, 0)
-            )
-            return True, f"Ajuste por saldo negativo ({dias_saldo} días) creado."
+            filas.append((cedula, 4, fecha_inicio_periodo.date(), fecha_fin_periodo.date(), 0, abs(dias_saldo), dias_saldo, 0, 1, descripcion, 0))
+            return True, f"Ajuste por saldo negativo ({dias_saldo} días) creado.", filas
 
         if dias_saldo <= 0 and dias_caducados_int <= 0:
-            return False, "No hay días positivos para migrar."
+            return False, "No hay días positivos para migrar.", filas
 
         # --- LÓGICA UNIFICADA Y CORREGIDA PARA CREAR PERÍODOS HISTÓRICOS ---
         
         dias_caducados_restantes = dias_caducados_int
         dias_saldo_restantes = dias_saldo
-        fecha_actual = datetime.now()
         
         # --- INICIO DE LA MODIFICACIÓN CLAVE ---
         # Determina el punto de partida del bucle basado en la regla de los 11 meses.
@@ -139,8 +152,6 @@ def generar_periodos_historicos(cursor, empleado_info, dias_pendientes, dias_cad
         
         anio_periodo_actual = punto_partida_loop.year
         # --- FIN DE LA MODIFICACIÓN CLAVE ---
-        
-        periodos_creados = 0
 
         while (dias_saldo_restantes > 0 or dias_caducados_restantes > 0) and anio_periodo_actual >= fecha_ingreso.year:
             
@@ -174,129 +185,663 @@ def generar_periodos_historicos(cursor, empleado_info, dias_pendientes, dias_cad
                 fini_db = fecha_inicio_periodo_trabajo.date()
                 ffin_db = (fecha_adquisicion - timedelta(days=1)).date()
 
-                cursor.execute(
-                    """INSERT INTO periodos_vacaciones (cedula, tipo, fini_periodo, ffin_periodo, asignados, dias, saldo, caducados, estatus, observacion, saldo_anterior)
-                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                    (cedula, 1, fini_db, ffin_db, total_asignados, 0, saldo_este_periodo, caducados_este_periodo, 1, descripcion, 0)
-                )
-                periodos_creados += 1
+                filas.append((cedula, 1, fini_db, ffin_db, total_asignados, 0, saldo_este_periodo, caducados_este_periodo, 1, descripcion, 0))
 
             anio_periodo_actual -= 1
 
-        if periodos_creados > 0:
-            return True, f"Migrados {dias_saldo} días de saldo y {dias_caducados_int} caducados en {periodos_creados} período(s) históricos."
+        if filas:
+            return True, f"Migrados {dias_saldo} días de saldo y {dias_caducados_int} caducados en {len(filas)} período(s) históricos.", filas
         else:
-            return False, "No se generaron períodos (revisar datos de entrada)."
+            return False, "No se generaron períodos (revisar datos de entrada).", filas
 
+    except Exception as e:
+        return False, f"Error inesperado en la lógica de generación: {e}", []
+
+@fase('generar_periodos')
+def generar_periodos_historicos(cursor, empleado_info, dias_pendientes, dias_caducados, fecha_actual=None):
+    """
+    Calcula los períodos de un empleado (ver `calcular_periodos_historicos`) y los inserta.
+    Los INSERT se miden aparte en la fase 'escritura'.
+    """
+    exito, mensaje, filas = calcular_periodos_historicos(empleado_info, dias_pendientes, dias_caducados, fecha_actual)
+    try:
+        with fase('escritura'):
+            for fila in filas:
+                cursor.execute(SQL_PERIODO, fila)
     except Error as e:
         return False, f"Error de base de datos: {e}"
-    except Exception as e:
-        return False, f"Error inesperado en la lógica de generación: {e}"
+    return exito, mensaje
+
+# --- Motor vectorizado ---------------------------------------------------------
+
+def _fechas(anios, meses, dias):
+    """datetime64[D] a partir de arreglos de año, mes (1-12) y día."""
+    meses_epoca = ((anios - 1970) * 12 + (meses - 1)).astype('datetime64[M]')
+    return meses_epoca.astype('datetime64[D]') + (dias - 1).astype('timedelta64[D]')
+
+def _dias_del_mes(anios, meses):
+    meses_epoca = ((anios - 1970) * 12 + (meses - 1)).astype('datetime64[M]')
+    return ((meses_epoca + 1).astype('datetime64[D]') - meses_epoca.astype('datetime64[D]')).astype(np.int64)
+
+def _expandir(conteos):
+    """Para grupos con `conteos[i]` filas: (grupo de cada fila, posición 0..conteos[i]-1 dentro del grupo)."""
+    grupo = np.repeat(np.arange(len(conteos)), conteos)
+    inicio = np.repeat(np.cumsum(conteos) - conteos, conteos)
+    return grupo, np.arange(len(grupo)) - inicio
+
+def _dias_enteros(serie):
+    """int(float(x)) de toda la columna (vacío -> 0) y máscara de valores que no se pueden convertir así."""
+    numeros = pd.to_numeric(serie, errors='coerce').astype(float)
+    invalidos = (serie.notna() & (numeros.isna() | ~np.isfinite(numeros))).to_numpy()
+    return np.trunc(numeros.where(~invalidos, 0).fillna(0)).to_numpy().astype(np.int64), invalidos
+
+@fase('generar_periodos')
+def generar_periodos_vectorizado(empleados, fecha_actual=None):
+    """
+    Motor vectorizado equivalente a `calcular_periodos_historicos` para todos los empleados a la vez.
+    `empleados` es un DataFrame con columnas cedula, fecing, dias_pendientes, dias_caducados y
+    opcionalmente ficha. Retorna (periodos, resultados):
+      - periodos: DataFrame con 'indice' (etiqueta del empleado) + COLUMNAS_PERIODO, en el mismo
+        orden en que los generaría la función por empleado.
+      - resultados: DataFrame con 'exito' y 'mensaje' por empleado (mismo índice que `empleados`).
+    Las filas que la aritmética de fechas no cubre igual que dateutil (ingreso un 29 de febrero,
+    fecing que no es fecha, días que no son numéricos) se delegan a la función por empleado.
+    """
+    fecha_actual = fecha_actual or datetime.now()
+    ahora = np.datetime64(fecha_actual, 'us')
+    n = len(empleados)
+    fecing = empleados['fecing']
+    fichas = empleados['ficha'] if 'ficha' in empleados.columns else pd.Series(None, index=empleados.index, dtype=object)
+
+    # --- Entradas y filas irregulares ---
+    if pd.api.types.is_datetime64_any_dtype(fecing) and getattr(fecing.dt, 'tz', None) is None:
+        es_fecha = fecing.notna().to_numpy()
+        ingreso = fecing.to_numpy(dtype='datetime64[us]')
+    else:
+        es_fecha = np.array([isinstance(v, date) and not pd.isna(v) and getattr(v, 'tzinfo', None) is None
+                             for v in fecing], dtype=bool)
+        ingreso = np.full(n, np.datetime64('2000-01-01', 'us'))
+        if es_fecha.any():
+            ingreso[es_fecha] = pd.to_datetime(fecing[es_fecha]).to_numpy(dtype='datetime64[us]')
+    ingreso = np.where(es_fecha, ingreso, np.datetime64('2000-01-01', 'us'))
+    saldo, saldo_invalido = _dias_enteros(empleados['dias_pendientes'])
+    caducados, caducados_invalidos = _dias_enteros(empleados['dias_caducados'])
+
+    dia_ingreso = ingreso.astype('datetime64[D]')
+    hora_ingreso = ingreso - dia_ingreso.astype('datetime64[us]')
+    anio_ingreso = dia_ingreso.astype('datetime64[Y]').astype(np.int64) + 1970
+    mes_ingreso = dia_ingreso.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    dia_mes = (dia_ingreso - dia_ingreso.astype('datetime64[M]').astype('datetime64[D]')).astype(np.int64) + 1
+    irregular = ~es_fecha | saldo_invalido | (es_fecha & (mes_ingreso == 2) & (dia_mes == 29))
+    # Si la fecha es válida pero los días no, la función por empleado da el error de conversión
+    irregular |= caducados_invalidos
+
+    # --- Fechas de referencia por empleado ---
+    anio_actual = np.full(n, fecha_actual.year, dtype=np.int64)
+    def aniversario(anios):
+        return _fechas(anios, mes_ingreso, dia_mes)
+    aniversario_actual = aniversario(anio_actual)
+    aniversario_actual_hora = aniversario_actual.astype('datetime64[us]') + hora_ingreso
+
+    # Saldo negativo: un solo período tipo 4 que contiene la fecha actual
+    negativo = ~irregular & (saldo < 0)
+    antes_aniversario = ahora < aniversario_actual_hora
+    fini_negativo = np.where(antes_aniversario, aniversario(anio_actual - 1), aniversario_actual)
+    ffin_negativo = np.where(antes_aniversario, aniversario_actual, aniversario(anio_actual + 1)) - np.timedelta64(1, 'D')
+
+    # Regla de los 11 meses: el derecho del año en curso se adquiere un mes antes del aniversario
+    mes_derecho = np.where(mes_ingreso == 1, 12, mes_ingreso - 1)
+    anio_derecho = np.where(mes_ingreso == 1, anio_actual - 1, anio_actual)
+    dia_derecho = np.minimum(dia_mes, _dias_del_mes(anio_derecho, mes_derecho))
+    derecho = _fechas(anio_derecho, mes_derecho, dia_derecho).astype('datetime64[us]') + hora_ingreso
+    anio_inicio = np.where(ahora >= derecho, anio_actual, anio_actual - 1)
+    # Un período (año de adquisición y) caduca cuando ahora > aniversario(y + 3); primer año sin caducar:
+    primer_vigente = np.where(aniversario_actual_hora >= ahora, anio_actual - 3, anio_actual - 2)
+    primer_anio = anio_ingreso + 1
+    vigentes = np.clip(anio_inicio - np.maximum(primer_vigente, primer_anio) + 1, 0, None)
+    ultimo_caducado = np.minimum(primer_vigente - 1, anio_inicio)
+    caducables = np.clip(ultimo_caducado - primer_anio + 1, 0, None)
+
+    positivo = ~irregular & ~negativo
+    filas_saldo = np.where(positivo & (saldo > 0), np.minimum(vigentes, -(-saldo // 30)), 0)
+    filas_caducados = np.where(positivo & (caducados > 0), np.minimum(caducables, -(-caducados // 30)), 0)
+
+    # --- Filas: saldo en los años vigentes más recientes, caducados en los caducados más recientes ---
+    cedulas = empleados['cedula'].to_numpy(dtype=object)
+    bloques = []
+    grupo, k = _expandir(filas_saldo)
+    anio = anio_inicio[grupo] - k
+    dias = np.minimum(saldo[grupo] - 30 * k, 30)
+    bloques.append((grupo, k, 1, anio, dias, np.zeros_like(dias)))
+    grupo, k = _expandir(filas_caducados)
+    anio = ultimo_caducado[grupo] - k
+    dias = np.minimum(caducados[grupo] - 30 * k, 30)
+    bloques.append((grupo, filas_saldo[grupo] + k, 1, anio, np.zeros_like(dias), dias))
+
+    partes = []
+    for grupo, orden, tipo, anio, dias_saldo, dias_caducados in bloques:
+        parte = pd.DataFrame({
+            'posicion': grupo, 'orden': orden,
+            'cedula': cedulas[grupo], 'tipo': tipo,
+            'fini_periodo': _fechas(anio - 1, mes_ingreso[grupo], dia_mes[grupo]).astype(object),
+            'ffin_periodo': (_fechas(anio, mes_ingreso[grupo], dia_mes[grupo]) - np.timedelta64(1, 'D')).astype(object),
+            'asignados': dias_saldo + dias_caducados, 'dias': 0,
+            'saldo': dias_saldo, 'caducados': dias_caducados, 'estatus': 1,
+        })
+        parte['observacion'] = ("Migración histórica - Saldo: " + parte['saldo'].astype(str)
+                                + ", Caducados: " + parte['caducados'].astype(str))
+        partes.append(parte)
+
+    grupo = np.flatnonzero(negativo)
+    parte = pd.DataFrame({
+        'posicion': grupo, 'orden': 0, 'cedula': cedulas[grupo], 'tipo': 4,
+        'fini_periodo': fini_negativo[grupo].astype(object), 'ffin_periodo': ffin_negativo[grupo].astype(object),
+        'asignados': 0, 'dias': -saldo[grupo], 'saldo': saldo[grupo], 'caducados': 0, 'estatus': 1,
+    })
+    parte['observacion'] = "Ajuste por migración de saldo negativo: " + parte['saldo'].astype(str) + " días"
+    partes.append(parte)
+
+    # --- Resultados por empleado ---
+    total_filas = filas_saldo + filas_caducados
+    texto_saldo = pd.Series(saldo, index=empleados.index).astype(str)
+    texto_caducados = pd.Series(caducados, index=empleados.index).astype(str)
+    mensajes = np.where(
+        negativo, ("Ajuste por saldo negativo (" + texto_saldo + " días) creado.").to_numpy(),
+        np.where((saldo <= 0) & (caducados <= 0), "No hay días positivos para migrar.",
+                 np.where(total_filas > 0,
+                          ("Migrados " + texto_saldo + " días de saldo y " + texto_caducados + " caducados en "
+                           + pd.Series(total_filas, index=empleados.index).astype(str) + " período(s) históricos.").to_numpy(),
+                          "No se generaron períodos (revisar datos de entrada).")))
+    mensajes = mensajes.astype(object)
+    exitos = negativo | (positivo & (total_filas > 0))
+
+    # --- Filas irregulares: función por empleado ---
+    pendientes = empleados['dias_pendientes'].to_numpy(dtype=object)
+    caducados_originales = empleados['dias_caducados'].to_numpy(dtype=object)
+    fecing_originales = fecing.to_numpy(dtype=object)
+    fichas = fichas.to_numpy(dtype=object)
+    for posicion in np.flatnonzero(irregular):
+        info = (None, cedulas[posicion], None, fecing_originales[posicion], fichas[posicion])
+        exitos[posicion], mensajes[posicion], filas = calcular_periodos_historicos(
+            info, pendientes[posicion], caducados_originales[posicion], fecha_actual)
+        if filas:
+            parte = pd.DataFrame(filas, columns=COLUMNAS_PERIODO)
+            parte.insert(0, 'orden', np.arange(len(filas)))
+            parte.insert(0, 'posicion', posicion)
+            partes.append(parte)
+
+    periodos = pd.concat(partes, ignore_index=True)
+    periodos = periodos.sort_values(['posicion', 'orden'], kind='stable', ignore_index=True)
+    periodos['saldo_anterior'] = 0
+    periodos.insert(0, 'indice', empleados.index[periodos['posicion'].to_numpy()])
+    resultados = pd.DataFrame({'exito': exitos, 'mensaje': mensajes}, index=empleados.index)
+    return periodos[['indice'] + COLUMNAS_PERIODO], resultados
+
+def filas_periodos(periodos):
+    """Tuplas (en el orden de COLUMNAS_PERIODO, con tipos de Python) listas para SQL_PERIODO."""
+    return [tuple(fila) for fila in periodos[COLUMNAS_PERIODO].to_numpy(dtype=object).tolist()]
+
+def abrir_excel_vacaciones(ruta_excel):
+    """Retorna (encabezados, lotes) con las columnas de MAPEO_COLUMNAS presentes en el archivo."""
+    # Los encabezados se normalizan (espacios repetidos) al leerlos
+    encabezados = leer_encabezados(ruta_excel)
+    columnas = [c for c in MAPEO_COLUMNAS.values() if c in encabezados]
+    return encabezados, leer_excel_por_lotes(ruta_excel, columnas)
+
+def leer_empleados_vacaciones(lotes, indice, resumen=None):
+    """
+    Recorre todas las filas del Excel y resuelve cada empleado contra el índice.
+    Retorna (empleados, procesados, no_encontrados); `empleados` tiene por índice la fila del
+    Excel y las columnas que espera `generar_periodos_vectorizado`.
+    Sin `resumen` no se registran avances ni rechazos (lectura de un archivo anterior).
+    """
+    registros = []
+    procesados = 0
+    no_encontrados = 0
+    for index, row in iterar_filas(lotes):
+        procesados += 1
+        if resumen:
+            resumen.progreso(procesados)
+        with fase('limpieza'):
+            ficha = limpiar_ficha(row.get(MAPEO_COLUMNAS['ficha']))
+            cedula = normalizar_cedula(row.get(MAPEO_COLUMNAS['cedula']))
+        if ficha is None and cedula is None:
+            continue
+        with fase('resolucion'):
+            empleado = indice.resolver(ficha, cedula)
+        if not empleado:
+            if resumen:
+                resumen.rechazar(index+2, 'Empleado no encontrado', ficha=ficha, cedula=cedula)
+            no_encontrados += 1
+            continue
+        registros.append(registro_empleado(index, empleado, row))
+    return tabla_empleados(registros), procesados, no_encontrados
+
+def registro_empleado(index, empleado, row):
+    """Fila de `tabla_empleados` para un empleado resuelto y su fila del Excel."""
+    return (index, empleado.ficha, empleado.cedula, empleado.fecing,
+            row.get(MAPEO_COLUMNAS['dias_pendientes']), row.get(MAPEO_COLUMNAS['dias_caducados']))
+
+def tabla_empleados(registros):
+    """DataFrame indexado por fila del Excel con las columnas que espera `generar_periodos_vectorizado`."""
+    # dtype object: los valores quedan tal como vienen de la BD y del Excel (sin pasar a float)
+    empleados = pd.DataFrame(registros, columns=['indice', 'ficha', 'cedula', 'fecing', 'dias_pendientes', 'dias_caducados'],
+                             dtype=object)
+    return empleados.set_index('indice')
+
+def dependencias_periodos(cursor):
+    """
+    Claves foráneas (hacia o desde periodos_vacaciones) y triggers de la tabla. CREATE TABLE
+    ... LIKE no los copia y RENAME TABLE se lleva las claves de las tablas hijas a la tabla
+    anterior, así que con cualquiera de ellos el modo 'sombra' no es seguro.
+    """
+    cursor.execute(
+        """SELECT CONSTRAINT_NAME, TABLE_NAME, REFERENCED_TABLE_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+           WHERE CONSTRAINT_SCHEMA = DATABASE() AND (TABLE_NAME = %s OR REFERENCED_TABLE_NAME = %s)""",
+        (TABLA_PERIODOS, TABLA_PERIODOS)
+    )
+    dependencias = [f"clave foránea {nombre} ({tabla} -> {referida})" for nombre, tabla, referida in cursor.fetchall()]
+    cursor.execute(
+        """SELECT TRIGGER_NAME FROM information_schema.TRIGGERS
+           WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = %s""",
+        (TABLA_PERIODOS,)
+    )
+    dependencias += [f"trigger {nombre}" for (nombre,) in cursor.fetchall()]
+    return dependencias
+
+def cargar_tabla_sombra(connection, cursor, filas, carga=None):
+    """Crea TABLA_SOMBRA con el mismo esquema que periodos_vacaciones y carga las filas en ella."""
+    with fase('escritura'):
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLA_SOMBRA}")
+        cursor.execute(f"CREATE TABLE {TABLA_SOMBRA} LIKE {TABLA_PERIODOS}")
+    return insertar_periodos(connection, cursor, filas, carga, tabla=TABLA_SOMBRA)
+
+def validar_tabla_sombra(cursor, periodos):
+    """Compara filas, saldo y caducados de la tabla sombra con lo generado. Retorna las diferencias."""
+    cursor.execute(f"SELECT COUNT(*), COALESCE(SUM(saldo), 0), COALESCE(SUM(caducados), 0) FROM {TABLA_SOMBRA}")
+    en_tabla = [int(valor) for valor in cursor.fetchone()]
+    esperado = [len(periodos), int(periodos['saldo'].sum()), int(periodos['caducados'].sum())]
+    return [f"{nombre}: esperado {e}, en tabla {t}"
+            for nombre, e, t in zip(('filas', 'saldo', 'caducados'), esperado, en_tabla) if e != t]
+
+def intercambiar_tabla_sombra(cursor):
+    """Pone la tabla sombra en lugar de periodos_vacaciones con un solo RENAME TABLE."""
+    with fase('escritura'):
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLA_ANTERIOR}")
+        cursor.execute(f"RENAME TABLE {TABLA_PERIODOS} TO {TABLA_ANTERIOR}, {TABLA_SOMBRA} TO {TABLA_PERIODOS}")
+
+def migrar_vacaciones_sombra(lotes, ruta_excel, connection, cursor, indice, resumen, carga=None, ruta_snapshot=None):
+    """
+    Genera todos los períodos con el motor vectorizado, los carga en TABLA_SOMBRA, valida la
+    carga y solo entonces la intercambia con periodos_vacaciones. Mientras tanto la tabla en
+    uso no se toca; si algo falla antes del RENAME, la sombra se descarta y periodos_vacaciones
+    queda igual. No se usa si la tabla tiene claves foráneas o triggers (`dependencias_periodos`).
+    Tras el intercambio se reescribe el snapshot del modo 'delta'.
+    Retorna los contadores del resumen; si no se reemplazó la tabla lanza MigracionFallida.
+    """
+    dependencias = dependencias_periodos(cursor)
+    if dependencias:
+        raise MigracionFallida(f"ERROR: El modo 'sombra' no es seguro para {TABLA_PERIODOS} "
+                               f"({'; '.join(dependencias)}). Use el modo 'directo'. No se modificó nada.")
+    empleados, procesados, no_encontrados = leer_empleados_vacaciones(lotes, indice, resumen)
+    fecha_actual = datetime.now()
+    periodos, resultados = generar_periodos_vectorizado(empleados, fecha_actual)
+    migrados, sin_dias, errores = contar_resultados(empleados, resultados, resumen)
+
+    try:
+        cargar_tabla_sombra(connection, cursor, filas_periodos(periodos), carga)
+        diferencias = validar_tabla_sombra(cursor, periodos)
+        if diferencias:
+            raise ValueError("la tabla sombra no coincide con lo generado (" + "; ".join(diferencias) + ")")
+        intercambiar_tabla_sombra(cursor)
+    except (Error, ValueError) as e:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLA_SOMBRA}")
+        raise MigracionFallida(f"ERROR: No se reemplazó {TABLA_PERIODOS}, que queda sin cambios. Causa: {e}") from e
+    print(f"Tabla {TABLA_SOMBRA} validada ({len(periodos)} períodos) e intercambiada con {TABLA_PERIODOS}.")
+    guardar_snapshot(ruta_snapshot or RUTA_SNAPSHOT, ruta_excel, snapshot_vacaciones(empleados), fecha_actual)
+    # Después del RENAME los datos nuevos ya están en uso: un error aquí solo deja la tabla anterior
+    try:
+        with fase('escritura'):
+            cursor.execute(f"DROP TABLE {TABLA_ANTERIOR}")
+    except Error as e:
+        print(f"ADVERTENCIA: {TABLA_PERIODOS} ya tiene los períodos nuevos, pero no se pudo borrar "
+              f"{TABLA_ANTERIOR} (con los datos previos). Bórrela a mano. Causa: {e}")
+    return procesados, migrados, sin_dias, no_encontrados, errores
+
+def contar_resultados(empleados, resultados, resumen):
+    """Rechaza los empleados con error de generación y retorna (migrados, sin_dias, errores)."""
+    sin_dias = resultados['mensaje'].str.contains('No hay días', regex=False)
+    errores = ~resultados['exito'] & ~sin_dias
+    for index, fila in resultados[errores].iterrows():
+        resumen.rechazar(index+2, 'Error generando períodos', ficha=empleados.at[index, 'ficha'], detalle=fila['mensaje'])
+    return int(resultados['exito'].sum()), int(sin_dias.sum()), int(errores.sum())
+
+def _dias_snapshot(valor):
+    """Días comparables entre archivos: 15, 15.0 y '15' son el mismo saldo."""
+    if valor is None or pd.isna(valor):
+        return None
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        return str(valor).strip()
+
+def _clave_snapshot(ficha, cedula):
+    return f"{ficha}|{cedula}"
+
+def snapshot_vacaciones(empleados):
+    """
+    {ficha|cedula: [cedula, fecing, pendientes, caducados]} de un archivo ya resuelto.
+    Si un empleado se repite en el archivo, queda su última fila.
+    """
+    snapshot = {}
+    for ficha, cedula, fecing, pendientes, caducados in zip(
+            empleados['ficha'], empleados['cedula'], empleados['fecing'],
+            empleados['dias_pendientes'], empleados['dias_caducados']):
+        snapshot[_clave_snapshot(ficha, cedula)] = [cedula, None if pd.isna(fecing) else str(fecing),
+                                         _dias_snapshot(pendientes), _dias_snapshot(caducados)]
+    return snapshot
+
+def guardar_snapshot(ruta, archivo, snapshot, fecha_referencia):
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as salida:
+        json.dump({'archivo': os.path.basename(archivo), 'generado': datetime.now().isoformat(timespec='seconds'),
+                   'fecha_referencia': fecha_referencia.isoformat(), 'empleados': snapshot},
+                  salida, ensure_ascii=False, default=str)
+
+def cargar_snapshot(ruta):
+    """
+    Retorna (archivo, fecha_referencia, snapshot) del último archivo aplicado, o
+    (None, None, None) si no hay (o si es de una versión sin fecha de referencia).
+    """
+    if not os.path.exists(ruta):
+        return None, None, None
+    with open(ruta, encoding='utf-8') as entrada:
+        estado = json.load(entrada)
+    if 'fecha_referencia' not in estado:
+        return None, None, None
+    return estado['archivo'], datetime.fromisoformat(estado['fecha_referencia']), estado['empleados']
+
+def descartar_snapshot(ruta=None):
+    """Borra el snapshot: después de una carga que no lo registra, ya no describe la tabla."""
+    ruta = ruta or RUTA_SNAPSHOT
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+def _periodos_por_fila(empleados, fecha_referencia):
+    periodos, _ = generar_periodos_vectorizado(empleados, fecha_referencia)
+    agrupados = {}
+    for fila, periodo in zip(periodos['indice'], filas_periodos(periodos)):
+        agrupados.setdefault(fila, []).append(periodo)
+    return agrupados
+
+def claves_con_vencimientos(empleados, fecha_anterior, fecha_actual):
+    """
+    Claves de los empleados cuyos períodos cambian solo porque cambió la fecha de referencia
+    (se adquirió el derecho de un año nuevo o caducó un período), aunque su saldo no cambió.
+    """
+    antes = _periodos_por_fila(empleados, fecha_anterior)
+    ahora = _periodos_por_fila(empleados, fecha_actual)
+    return {_clave_snapshot(ficha, cedula)
+            for fila, ficha, cedula in zip(empleados.index, empleados['ficha'], empleados['cedula'])
+            if antes.get(fila) != ahora.get(fila)}
+
+def diferencias_snapshot(anterior, actual, vencimientos=()):
+    """
+    Compara dos snapshots. Retorna (claves, cedulas, conteos): las claves actuales a regenerar,
+    las cédulas cuyos períodos se borran y los conteos cambiados/nuevos/retirados/vencimientos/
+    sin_cambios. `vencimientos` son claves sin cambios cuyos períodos igual cambian con la fecha.
+    Como los períodos se guardan por cédula, también se regenera cualquier empleado sin cambios
+    que comparta cédula con uno que cambió o se retiró.
+    """
+    cambiados = {clave for clave, datos in actual.items() if clave in anterior and anterior[clave] != datos}
+    nuevos = {clave for clave in actual if clave not in anterior}
+    retirados = {clave for clave in anterior if clave not in actual}
+    vencimientos = set(vencimientos) - cambiados - nuevos
+    cedulas = {actual[clave][0] for clave in cambiados | nuevos | vencimientos}
+    cedulas |= {anterior[clave][0] for clave in cambiados | retirados}
+    claves = {clave for clave, datos in actual.items() if datos[0] in cedulas}
+    conteos = {'cambiados': len(cambiados), 'nuevos': len(nuevos), 'retirados': len(retirados),
+               'vencimientos': len(vencimientos),
+               'sin_cambios': len(actual) - len(cambiados) - len(nuevos) - len(vencimientos)}
+    return claves, cedulas, conteos
+
+def borrar_periodos(cursor, cedulas):
+    """DELETE de los períodos de las cédulas dadas, en lotes de LOTE_BORRADO."""
+    cedulas = sorted(cedulas)
+    with fase('escritura'):
+        for inicio in range(0, len(cedulas), LOTE_BORRADO):
+            lote = cedulas[inicio:inicio + LOTE_BORRADO]
+            cursor.execute(f"DELETE FROM {TABLA_PERIODOS} WHERE cedula IN ({', '.join(['%s'] * len(lote))})", lote)
+
+def migrar_vacaciones_delta(lotes, ruta_excel, connection, cursor, indice, resumen, carga=None,
+                            anterior=None, fecha_anterior=None, ruta_snapshot=None, fecha_actual=None):
+    """
+    Compara el archivo con el snapshot del último aplicado (o con el archivo `anterior`, si se
+    indica, cuyos períodos se calcularon en `fecha_anterior`) por ficha y cédula, y en una sola
+    transacción borra y regenera solo los períodos de los empleados cuyo ingreso, días pendientes
+    o caducados cambiaron, o cuyos períodos cambian entre las dos fechas de referencia (derecho
+    adquirido o caducidad); también borra los de quienes ya no vienen. Así la tabla queda igual
+    que con una carga completa en `fecha_actual`. Sin snapshot previo regenera toda la tabla.
+    El snapshot se actualiza tras el commit.
+    Retorna los contadores del resumen; si no se aplicó nada lanza MigracionFallida.
+    """
+    ruta_snapshot = ruta_snapshot or RUTA_SNAPSHOT
+    fecha_actual = fecha_actual or datetime.now()
+    empleados, procesados, no_encontrados = leer_empleados_vacaciones(lotes, indice, resumen)
+    actual = snapshot_vacaciones(empleados)
+    if anterior:
+        if fecha_anterior is None:
+            raise MigracionFallida("ERROR: Con un archivo anterior hay que indicar la fecha en que se cargaron sus períodos.")
+        origen = anterior
+        previo = snapshot_vacaciones(leer_empleados_vacaciones(abrir_excel_vacaciones(anterior)[1], indice)[0])
+    else:
+        origen, fecha_anterior, previo = cargar_snapshot(ruta_snapshot)
+
+    claves_empleados = [_clave_snapshot(ficha, cedula) for ficha, cedula in zip(empleados['ficha'], empleados['cedula'])]
+    if previo is None:
+        print(f"No hay snapshot anterior en {ruta_snapshot}: se regenera toda la tabla.")
+        a_generar = empleados
+    else:
+        sin_cambios = [clave in previo and previo[clave] == actual[clave] for clave in claves_empleados]
+        vencimientos = claves_con_vencimientos(empleados[sin_cambios], fecha_anterior, fecha_actual)
+        claves, cedulas, conteos = diferencias_snapshot(previo, actual, vencimientos)
+        print(f"Comparado con {origen}: {conteos['cambiados']} con cambios, {conteos['nuevos']} nuevos, "
+              f"{conteos['retirados']} retirados, {conteos['vencimientos']} con períodos que vencen o se "
+              f"adquieren, {conteos['sin_cambios']} sin cambios.")
+        a_generar = empleados[[clave in claves for clave in claves_empleados]]
+    periodos, resultados = generar_periodos_vectorizado(a_generar, fecha_actual)
+    migrados, sin_dias, errores = contar_resultados(a_generar, resultados, resumen)
+
+    try:
+        if previo is None:
+            with fase('escritura'):
+                cursor.execute(f"DELETE FROM {TABLA_PERIODOS}")
+        else:
+            borrar_periodos(cursor, cedulas)
+        insertar_periodos(connection, cursor, filas_periodos(periodos), carga)
+        connection.commit()
+    except Error as e:
+        connection.rollback()
+        raise MigracionFallida(f"ERROR: No se aplicaron los cambios, {TABLA_PERIODOS} queda igual. Causa: {e}") from e
+    print(f"{len(a_generar)} empleado(s) regenerados ({len(periodos)} períodos) en una transacción.")
+
+    # En modo plan el snapshot viaja en el plan y se escribe al aplicarlo
+    al_aplicar(connection, guardar_snapshot, ruta_snapshot, ruta_excel, actual, fecha_actual)
+    if getattr(connection, 'modo_plan', False):
+        print("Modo plan: el snapshot se actualizará al aplicar el plan.")
+    return procesados, migrados, sin_dias, no_encontrados, errores
 
-def migrar_vacaciones_desde_excel(ruta_excel, connection):
-    """Función principal para leer el Excel y migrar las vacaciones."""
+def mostrar_resumen_vacaciones(procesados, migrados, sin_dias, no_encontrados, errores):
+    print("\n" + "="*70)
+    print("RESUMEN DE LA MIGRACIÓN")
+    print(f"Registros procesados:         {procesados}")
+    print(f"Empleados migrados:           {migrados}")
+    print(f"Sin días para migrar:         {sin_dias}")
+    print(f"No encontrados en BD:         {no_encontrados}")
+    print(f"Errores de procesamiento:     {errores}")
+    print("="*70)
+
+def migrar_vacaciones_desde_excel(ruta_excel, connection, commit_cada=None, carga=None, modo=None, anterior=None,
+                                  fecha_anterior=None):
+    """
+    Función principal para leer el Excel y migrar las vacaciones.
+    `modo` (ver MODO_VACACIONES):
+      'directo' -> vacía periodos_vacaciones y confirma cada `commit_cada` filas
+                   (MIGRACION_COMMIT_CADA por defecto); los períodos de cada lote se generan
+                   juntos con `generar_periodos_vectorizado` antes de su commit. Si una ejecución
+                   anterior con el mismo archivo quedó a medias, continúa desde su checkpoint
+                   sin vaciar la tabla.
+      'sombra'  -> ver `migrar_vacaciones_sombra`. En modo plan se usa 'directo'.
+      'delta'   -> ver `migrar_vacaciones_delta`; `anterior` es el archivo del mes previo y
+                   `fecha_anterior` la fecha en que se cargó (por defecto se compara con el
+                   snapshot en RUTA_SNAPSHOT).
+    Los períodos generados se envían en bloque con `insertar_periodos` (método `carga`).
+    Lanza MigracionFallida si no se pudo leer el archivo o aplicar la carga.
+    """
     print(f"\nIniciando Migración de Vacaciones desde: {ruta_excel}")
+    modo = modo or MODO_VACACIONES
     
     try:
-        df = pd.read_excel(ruta_excel, dtype=str)
+        encabezados, lotes = abrir_excel_vacaciones(ruta_excel)
     except Exception as e:
-        print(f"ERROR: No se pudo leer el archivo Excel. Causa: {e}")
-        return
-
-    df.columns = df.columns.str.strip()
-    
-    # Mapeo de columnas robusto a posibles variaciones
-    MAPEO_COLUMNAS = {
-        'ficha': 'NO. DE EMPLEADO',
-        'cedula': 'No. DE CEDULA',
-        'dias_pendientes': 'DIAS PENDIENTES A LA FECHA',
-        'dias_caducados': 'DIAS CADUCADOS'
-    }
+        raise MigracionFallida(f"ERROR: No se pudo leer el archivo Excel. Causa: {e}") from e
     
-    # Normalizar nombres de columnas en el DataFrame para que coincidan
-    df.rename(columns=lambda c: re.sub(r'\s+', ' ', c).strip(), inplace=True)
-    
-    print(f"Columnas detectadas y normalizadas: {df.columns.tolist()}")
+    print(f"Columnas detectadas y normalizadas: {encabezados}")
 
     cursor = connection.cursor()
-    if not limpiar_tablas_vacaciones(cursor):
+    indice = cargar_indice_empleados(cursor)
+    if modo == 'delta' or (modo == 'sombra' and not getattr(connection, 'modo_plan', False)):
+        resumen = ResumenMigracion('vacaciones')
+        try:
+            if modo == 'delta':
+                contadores = migrar_vacaciones_delta(lotes, ruta_excel, connection, cursor, indice, resumen, carga,
+                                                     anterior, fecha_anterior)
+            else:
+                contadores = migrar_vacaciones_sombra(lotes, ruta_excel, connection, cursor, indice, resumen, carga)
+        finally:
+            cursor.close()
+            resumen.cerrar()
+        registrar_filas(contadores[0])
+        mostrar_resumen_vacaciones(*contadores)
         return
+
+    resumen = ResumenMigracion('vacaciones')
+    fecha_actual = datetime.now()
+    periodos = BufferInserciones(lambda filas: insertar_periodos(connection, cursor, filas, carga))
+    # Empleados resueltos desde el último commit: sus períodos se generan juntos al confirmar
+    por_generar = []
+    # [migrados, sin días, errores de generación]
+    conteos = [0, 0, 0]
+    # Empleados cuyo INSERT falló en el reintento (True si ya se habían contado como migrados)
+    fallidos = []
+
+    def generar_lote():
+        """Genera con el motor vectorizado los períodos de `por_generar` y los agrega al buffer."""
+        empleados = tabla_empleados(por_generar)
+        por_generar.clear()
+        generados, resultados = generar_periodos_vectorizado(empleados, fecha_actual)
+        for i, cantidad in enumerate(contar_resultados(empleados, resultados, resumen)):
+            conteos[i] += cantidad
+        por_fila = {}
+        for fila, periodo in zip(generados['indice'], filas_periodos(generados)):
+            por_fila.setdefault(fila, []).append(periodo)
+        for fila, ficha, exito in zip(empleados.index, empleados['ficha'], resultados['exito']):
+            periodos.agregar(por_fila.get(fila), (fila, ficha, bool(exito)))
+
+    def vaciar_periodos():
+        """
+        Genera y envía los períodos del lote; si el envío falla, lo revierte y reintenta
+        empleado por empleado.
+        """
+        if por_generar:
+            generar_lote()
+        try:
+            periodos.vaciar()
+        except Error as e:
+            connection.rollback()
+            print(f"ADVERTENCIA: Falló la inserción del lote ({e}). Se reintenta empleado por empleado.")
+            for (fila, ficha, migrado), error in periodos.reintentar(cursor, SAVEPOINT_EMPLEADO):
+                resumen.rechazar(fila+2, 'Error insertando períodos', ficha=ficha, error=str(error))
+                fallidos.append(migrado)
+
+    checkpoint = Checkpoint(connection, 'vacaciones', ruta_excel, commit_cada, al_confirmar=vaciar_periodos)
+    if checkpoint.reanudando:
+        print(f"Reanudando desde el checkpoint: filas confirmadas hasta la {checkpoint.ultima_fila + 2} del Excel.")
+    else:
+        with fase('escritura'):
+            tabla_limpia = limpiar_tablas_vacaciones(cursor)
+        if not tabla_limpia:
+            raise MigracionFallida(f"ERROR: No se pudo vaciar {TABLA_PERIODOS}. No se migró nada.")
+        al_aplicar(connection, descartar_snapshot, RUTA_SNAPSHOT)
     
-    migrados = 0
-    errores = 0
     no_encontrados = 0
-    sin_dias_para_migrar = 0
+    registros_procesados = 0
 
-    print(f"\nIniciando procesamiento de {len(df)} registros")
+    print("\nIniciando procesamiento de registros por lotes")
 
-    for index, row in df.iterrows():
-        ficha_raw = row.get(MAPEO_COLUMNAS['ficha'])
-        cedula_raw = row.get(MAPEO_COLUMNAS['cedula'])
+    for index, row in checkpoint.filas(iterar_filas(lotes)):
+        registros_procesados += 1
+        resumen.progreso(registros_procesados)
         
-        ficha = limpiar_ficha(ficha_raw)
-        cedula = limpiar_cedula(cedula_raw)
+        with fase('limpieza'):
+            ficha = limpiar_ficha(row.get(MAPEO_COLUMNAS['ficha']))
+            cedula = normalizar_cedula(row.get(MAPEO_COLUMNAS['cedula']))
         
         if ficha is None and cedula is None:
             continue
 
-        try:
-            empleado_info = obtener_empleado_por_ficha_cedula(cursor, ficha, cedula)
-            if not empleado_info:
-                print(f"Fila {index+2}: Empleado no encontrado (Ficha: {ficha}, Cédula: {cedula}). SALTANDO.")
-                no_encontrados += 1
-                continue
-            
-            dias_pendientes = row.get(MAPEO_COLUMNAS['dias_pendientes'])
-            dias_caducados = row.get(MAPEO_COLUMNAS['dias_caducados'])
-            
-            migrado, mensaje = generar_periodos_historicos(cursor, empleado_info, dias_pendientes, dias_caducados)
-            
-            if migrado:
-                print(f"ÉXITO Ficha {ficha}: {mensaje}")
-                migrados += 1
-            else:
-                if "No hay días" in mensaje:
-                    sin_dias_para_migrar += 1
-                else:
-                    print(f"ERROR Fila {index+2} (Ficha {ficha}): {mensaje}")
-                    errores += 1
-
-        except Exception as e:
-            print(f"ERROR CRÍTICO Fila {index+2} (Ficha {ficha}): {e}")
-            errores += 1
+        with fase('resolucion'):
+            empleado = indice.resolver(ficha, cedula)
+        if not empleado:
+            resumen.rechazar(index+2, 'Empleado no encontrado', ficha=ficha, cedula=cedula)
+            no_encontrados += 1
             continue
+        por_generar.append(registro_empleado(index, empleado, row))
 
+    registrar_filas(registros_procesados)
+    checkpoint.completar()
+    # Los que no se pudieron insertar pasan de migrados a errores (los demás ya eran errores)
+    migrados, sin_dias_para_migrar, errores = conteos
+    migrados -= sum(fallidos)
+    errores += sum(fallidos)
     if migrados > 0:
-        connection.commit()
-        print(f"\nTransacción confirmada. {migrados} empleado(s) con datos migrados.")
+        print(f"\nCambios confirmados cada {checkpoint.commit_cada} filas. {migrados} empleado(s) con datos migrados.")
     else:
-        connection.rollback()
-        print("\nNo se realizaron cambios en la base de datos.")
+        print("\nNo se migraron períodos en esta ejecución.")
     
     cursor.close()
-    
-    print("\n" + "="*70)
-    print("RESUMEN DE LA MIGRACIÓN")
-    print(f"Registros procesados:         {len(df)}")
-    print(f"Empleados migrados:           {migrados}")
-    print(f"Sin días para migrar:         {sin_dias_para_migrar}")
-    print(f"No encontrados en BD:         {no_encontrados}")
-    print(f"Errores de procesamiento:     {errores}")
-    print("="*70)
+    resumen.cerrar()
+    mostrar_resumen_vacaciones(registros_procesados, migrados, sin_dias_para_migrar, no_encontrados, errores)
 
 # --- Ejecución Principal ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migración de períodos de vacaciones desde Excel.")
+    parser.add_argument('ruta', nargs='?', default='formatos/VACACIONES-AGOSTO.xlsx', help="Archivo del mes")
+    parser.add_argument('--modo', choices=['directo', 'sombra', 'delta'], default=None,
+                        help="Modo de carga (por defecto VACACIONES_MODO)")
+    parser.add_argument('--anterior', default=None,
+                        help="Con --modo delta: archivo del mes anterior a usar en lugar del snapshot")
+    parser.add_argument('--fecha-anterior', type=datetime.fromisoformat, default=None,
+                        help="Con --anterior: fecha (AAAA-MM-DD) en que se cargaron sus períodos")
+    args = parser.parse_args()
+    if args.anterior and not args.fecha_anterior:
+        parser.error("--anterior requiere --fecha-anterior")
+
     print("MIGRADOR DE VACACIONES PENDIENTES")
     print("=" * 50)
     
     db_connection = crear_conexion_db()
 
     if db_connection:
-        ruta_archivo_excel = 'formatos/VACACIONES-AGOSTO.xlsx'
+        ruta_archivo_excel = args.ruta
         
         if os.path.exists(ruta_archivo_excel):
             print(f"Archivo encontrado: {ruta_archivo_excel}")
-            migrar_vacaciones_desde_excel(ruta_archivo_excel, db_connection)
+            try:
+                migrar_vacaciones_desde_excel(ruta_archivo_excel, db_connection, modo=args.modo,
+                                              anterior=args.anterior, fecha_anterior=args.fecha_anterior)
+            except MigracionFallida as e:
+                print(e)
             db_connection.close()
             print("\nConexión cerrada.")
         else:
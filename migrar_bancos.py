@@ -2,14 +2,11 @@ import pandas as pd
 import mysql.connector
 import os
 import re
-
-# --- Configuración de la Base de Datos ---
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'root',
-    'database': 'aitsa_rrhh'
-}
+from collections import Counter
+from lectura_excel import leer_encabezados, leer_excel_por_lotes
+from sesion_db import crear_conexion_db, insertar_multifila, max_allowed_packet
+from instrumentacion import fase, registrar_filas
+from registro import MigracionFallida
 
 # --- Configuración del Archivo XLSX ---
 XLSX_FILE_PATH = os.path.join('formatos', 'Listado_Empleado_InfoBanco.xlsx')
@@ -19,6 +16,22 @@ XLSX_COL_IDENTIFICACION = 'IDENTIFICACION'
 XLSX_COL_BANCO = 'BANCO'
 XLSX_COL_NO_CTA_ACH = 'NO_CTA_ACH'
 
+# Similitud mínima (coeficiente de Dice sobre trigramas) para aceptar un banco aproximado,
+# y ventaja mínima sobre el segundo candidato para no elegir entre dos bancos parecidos
+UMBRAL_SIMILITUD_BANCO = float(os.getenv('BANCOS_UMBRAL_SIMILITUD', 0.75))
+MARGEN_SIMILITUD_BANCO = 0.05
+
+STOPWORDS_BANCO = ["DE", "DEL", "LA", "LOS", "LAS", "Y", "E", "AND", "THE"]
+
+# Forma de escribir en nompersonal:
+#   'staging'     -> tabla temporal cargada con INSERT multi-fila + un solo UPDATE ... JOIN (por defecto)
+#   'executemany' -> un UPDATE por cédula (comportamiento original)
+UPDATE_MODE = os.getenv('BANCOS_MODO', 'staging')
+STAGING_TABLE = 'tmp_bancos_empleados'
+
+# Cédulas por consulta al precargar los datos bancarios actuales
+PRELOAD_CHUNK = 1000
+
 def normalize_bank_name(name):
     """
     Normaliza agresivamente el nombre del banco para la comparación.
@@ -28,83 +41,295 @@ def normalize_bank_name(name):
         return ""
     text = name.upper().replace("S.A.", "SA").replace("S. A.", "SA")
     text = re.sub(r'[^A-Z0-9\s]', '', text) # Solo deja letras mayúsculas, números y espacios
-    stopwords = ["DE", "DEL", "LA", "LOS", "LAS", "Y", "E", "AND", "THE"]
     words = text.split()
-    filtered_words = [word for word in words if word not in stopwords]
+    filtered_words = [word for word in words if word not in STOPWORDS_BANCO]
     return "".join(filtered_words).strip()
 
-def update_employee_bank_info():
+def normalize_bank_names(series):
+    """
+    Versión vectorizada de `normalize_bank_name`: normaliza cada valor distinto una sola vez
+    con operaciones de texto de pandas y retorna un dict {valor_original: normalizado}.
+    """
+    distinct = pd.Series(series.dropna().unique())
+    distinct = distinct[distinct.map(lambda v: isinstance(v, str))]
+    if distinct.empty:
+        return {}
+    stopwords = '|'.join(STOPWORDS_BANCO)
+    normalized = (
+        distinct.str.upper()
+        .str.replace("S.A.", "SA", regex=False)
+        .str.replace("S. A.", "SA", regex=False)
+        .str.replace(r'[^A-Z0-9\s]', '', regex=True)
+        .str.replace(rf'(?<!\S)(?:{stopwords})(?!\S)', '', regex=True)
+        .str.replace(r'\s+', '', regex=True)
+    )
+    return dict(zip(distinct, normalized))
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class BankIndex:
+    """
+    Índice de bancos de `nombancos`: coincidencia exacta por nombre normalized y, si no la hay,
+    búsqueda aproximada por trigrams (coeficiente de Dice) con un puntaje de confianza.
+    """
+
+    def __init__(self):
+        self.exact = {}
+        self.names = {}
+        self._bank_trigrams = {}
+        self._trigram_index = {}
+
+    def add(self, cod_ban, des_ban):
+        normalized = normalize_bank_name(des_ban)
+        if not normalized or normalized in self.exact:
+            return
+        self.exact[normalized] = cod_ban
+        self.names[cod_ban] = des_ban
+        trigrams = _trigrams(normalized)
+        self._bank_trigrams[cod_ban] = trigrams
+        for trigram in trigrams:
+            self._trigram_index.setdefault(trigram, set()).add(cod_ban)
+
+    def __len__(self):
+        return len(self.exact)
+
+    def lookup(self, normalized):
+        """Retorna (cod_ban, confianza); confianza 1.0 es coincidencia exacta. Si no hay banco, (None, mejor puntaje)."""
+        if not normalized:
+            return None, 0.0
+        if normalized in self.exact:
+            return self.exact[normalized], 1.0
+
+        trigrams = _trigrams(normalized)
+        candidates = set()
+        for trigram in trigrams:
+            candidates |= self._trigram_index.get(trigram, set())
+        scores = sorted(
+            ((2 * len(trigrams & self._bank_trigrams[cod]) / (len(trigrams) + len(self._bank_trigrams[cod])), cod)
+             for cod in candidates),
+            reverse=True
+        )
+        if not scores:
+            return None, 0.0
+        best, cod_ban = scores[0]
+        second = scores[1][0] if len(scores) > 1 else 0.0
+        if best >= UMBRAL_SIMILITUD_BANCO and best - second >= MARGEN_SIMILITUD_BANCO:
+            return cod_ban, round(best, 3)
+        return None, round(best, 3)
+
+def _clean_column(series):
+    """Equivalente vectorizado de `str(v).strip() if pd.notna(v) else ""`."""
+    return series.astype(object).where(series.notna(), "").astype(str).str.strip()
+
+def cedula_key(cedula):
+    """
+    Clave de comparación de una cédula como la compara MySQL en `WHERE cedula = %s` / `IN (...)`:
+    sin distinguir mayúsculas ni espacios alrededor (collation *_ci con PAD SPACE).
+    """
+    return str(cedula).strip().upper()
+
+def load_current_bank_info(cursor, cedulas):
+    """
+    Precarga codbancob/cuentacob actuales de las cédulas del archivo (en bloques de PRELOAD_CHUNK).
+    Retorna {cedula_key(cedula): [(codbancob, cuentacob), ...]}; una cédula puede tener varios empleados.
+    """
+    cedulas = list(cedulas)
+    current = {}
+    for start in range(0, len(cedulas), PRELOAD_CHUNK):
+        chunk = cedulas[start:start + PRELOAD_CHUNK]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(f"SELECT cedula, codbancob, cuentacob FROM nompersonal WHERE cedula IN ({placeholders})", chunk)
+        for cedula, codbancob, cuentacob in cursor.fetchall():
+            current.setdefault(cedula_key(cedula), []).append((codbancob, cuentacob))
+    return current
+
+def _same_value(db_value, new_value):
+    """Compara un valor de la BD con el del Excel sin importar tipo (INT vs texto) ni espacios."""
+    if db_value is None or new_value is None:
+        return db_value is None and new_value is None
+    return str(db_value).strip() == str(new_value).strip()
+
+def _has_bank_info(codbancob, cuentacob):
+    return bool(codbancob) and str(codbancob).strip() not in ("", "0") and bool(str(cuentacob or "").strip())
+
+def diff_bank_updates(batch_updates, current):
+    """
+    Compara cada (cod_banco, cuenta, cedula) con el estado actual y deja solo lo que cambia.
+    Si una cédula se repite en el archivo (según `cedula_key`) gana la última fila.
+    Retorna (updates, counts) con counts en 'sin_cambios', 'cambiados', 'nuevos' y 'sin_empleado'.
+    """
+    latest = {}
+    for cod_ban, cuenta, cedula in batch_updates:
+        latest[cedula_key(cedula)] = (cod_ban, cuenta, cedula)
+    updates = []
+    counts = Counter({'sin_cambios': 0, 'cambiados': 0, 'nuevos': 0, 'sin_empleado': 0})
+    for key, (cod_ban, cuenta, cedula) in latest.items():
+        rows = current.get(key)
+        if not rows:
+            counts['sin_empleado'] += 1
+            continue
+        if all(_same_value(db_cod, cod_ban) and _same_value(db_cta, cuenta) for db_cod, db_cta in rows):
+            counts['sin_cambios'] += 1
+            continue
+        if any(_has_bank_info(db_cod, db_cta) for db_cod, db_cta in rows):
+            counts['cambiados'] += 1
+        else:
+            counts['nuevos'] += 1
+        updates.append((cod_ban, cuenta, cedula))
+    return updates, counts
+
+def apply_bank_updates_staging(cnx, cursor, batch_updates):
+    """
+    Carga (cedula, codbancob, cuentacob) en una tabla temporal y actualiza nompersonal con un
+    solo UPDATE ... JOIN. Si una cédula aparece varias veces en el archivo (según `cedula_key`)
+    gana la última fila, igual que con los UPDATE secuenciales.
+    Retorna {cedula: (empleados_encontrados, empleados_con_cambios)}.
+    """
+    latest = {}
+    for cod_ban, cuenta, cedula in batch_updates:
+        latest[cedula_key(cedula)] = (cedula, cod_ban, cuenta)
+
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}")
+    # Mismos tipos, largos y collation que nompersonal: sin truncar valores ni mezclar collations en el JOIN
+    cursor.execute(f"CREATE TEMPORARY TABLE {STAGING_TABLE} AS SELECT cedula, codbancob, cuentacob FROM nompersonal LIMIT 0")
+    cursor.execute(f"CREATE INDEX idx_{STAGING_TABLE}_cedula ON {STAGING_TABLE} (cedula)")
+    try:
+        insertar_multifila(
+            cursor, f"INSERT INTO {STAGING_TABLE} (cedula, codbancob, cuentacob) VALUES (%s, %s, %s)",
+            latest.values(), max_bytes=max_allowed_packet(cnx) // 2
+        )
+        # Conteo real por cédula antes de escribir: empleados que coinciden y cuántos cambian
+        cursor.execute(f"""
+            SELECT t.cedula,
+                   COUNT(p.cedula),
+                   SUM(CASE WHEN p.cedula IS NULL THEN 0
+                            WHEN p.codbancob <=> t.codbancob AND p.cuentacob <=> t.cuentacob THEN 0
+                            ELSE 1 END)
+            FROM {STAGING_TABLE} t
+            LEFT JOIN nompersonal p ON p.cedula = t.cedula
+            GROUP BY t.cedula
+        """)
+        per_cedula = {cedula: (int(matched), int(changed or 0)) for cedula, matched, changed in cursor.fetchall()}
+        cursor.execute(f"""
+            UPDATE nompersonal p
+            JOIN {STAGING_TABLE} t ON p.cedula = t.cedula
+            SET p.codbancob = t.codbancob, p.cuentacob = t.cuentacob
+        """)
+        return per_cedula
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGING_TABLE}")
+
+def update_employee_bank_info(mode=None):
+    """
+    Actualiza banco y cuenta de los empleados. `mode`: 'staging' o 'executemany' (ver UPDATE_MODE).
+    Lanza MigracionFallida si no se pudo conectar, leer el archivo o guardar los cambios.
+    """
+    mode = mode or UPDATE_MODE
     cnx = None
     cursor = None
-    errors = []
     processed_rows = 0
     skipped_rows_missing_data = 0
     bank_not_found_rows = []
+    write_error = None
     print(f"Iniciando proceso de actualización de información bancaria...")
     try:
-        cnx = mysql.connector.connect(**DB_CONFIG)
+        cnx = crear_conexion_db()
+        if cnx is None:
+            raise MigracionFallida("No se pudo conectar a la base de datos.")
         cursor = cnx.cursor(buffered=True)
-        bank_map = {}
-        cursor.execute("SELECT cod_ban, des_ban FROM nombancos")
-        for db_cod_ban, db_des_ban in cursor.fetchall():
-            if db_des_ban:
-                normalized_db_name = normalize_bank_name(db_des_ban)
-                if normalized_db_name and normalized_db_name not in bank_map:
-                    bank_map[normalized_db_name] = db_cod_ban
-        if not bank_map:
-            print("No se pudieron cargar bancos desde la base de datos.")
-            return
+        bank_index = BankIndex()
+        with fase('resolucion'):
+            cursor.execute("SELECT cod_ban, des_ban FROM nombancos")
+            for db_cod_ban, db_des_ban in cursor.fetchall():
+                if db_des_ban:
+                    bank_index.add(db_cod_ban, db_des_ban)
+        if not len(bank_index):
+            raise MigracionFallida("No se pudieron cargar bancos desde la base de datos.")
         if not os.path.exists(XLSX_FILE_PATH):
-            print(f"Archivo no encontrado: {XLSX_FILE_PATH}")
-            return
-        df = pd.read_excel(XLSX_FILE_PATH, engine='openpyxl')
-        if df.empty:
-            print(f"El archivo XLSX '{XLSX_FILE_PATH}' está vacío.")
-            return
+            raise MigracionFallida(f"Archivo no encontrado: {XLSX_FILE_PATH}")
         required_cols = [XLSX_COL_IDENTIFICACION, XLSX_COL_BANCO, XLSX_COL_NO_CTA_ACH]
-        missing_cols = [col for col in required_cols if col not in df.columns]
+        missing_cols = [col for col in required_cols if col not in leer_encabezados(XLSX_FILE_PATH)]
         if missing_cols:
-            print(f"Faltan columnas requeridas: {', '.join(missing_cols)}.")
-            return
+            raise MigracionFallida(f"Faltan columnas requeridas: {', '.join(missing_cols)}.")
         batch_updates = []
-        for i, row_data in df.iterrows():
-            processed_rows += 1
-            identificacion_raw = row_data.get(XLSX_COL_IDENTIFICACION)
-            excel_banco_name_raw = row_data.get(XLSX_COL_BANCO)
-            no_cta_ach_raw = row_data.get(XLSX_COL_NO_CTA_ACH)
-            identificacion_val = str(identificacion_raw).strip() if pd.notna(identificacion_raw) else ""
-            excel_banco_name_val = str(excel_banco_name_raw).strip() if pd.notna(excel_banco_name_raw) else ""
-            no_cta_ach_val = str(no_cta_ach_raw).strip() if pd.notna(no_cta_ach_raw) else ""
-            if identificacion_val.endswith(".0"):
-                identificacion_val = identificacion_val[:-2]
-            if not identificacion_val or not excel_banco_name_val or not no_cta_ach_val:
-                skipped_rows_missing_data += 1
-                continue
-            normalized_excel_banco = normalize_bank_name(excel_banco_name_val)
-            cod_banco_db = bank_map.get(normalized_excel_banco)
-            if not cod_banco_db:
+        # Cada nombre de banco distinto del Excel se resuelve una sola vez: {original: (normalizado, cod_ban, confianza)}
+        bank_resolutions = {}
+        fuzzy_matches = Counter()
+        for chunk in leer_excel_por_lotes(XLSX_FILE_PATH, required_cols, como_texto=False):
+            processed_rows += len(chunk)
+            with fase('limpieza'):
+                identificacion = _clean_column(chunk[XLSX_COL_IDENTIFICACION]).str.replace(r'\.0$', '', regex=True)
+                banco = _clean_column(chunk[XLSX_COL_BANCO])
+                no_cta_ach = _clean_column(chunk[XLSX_COL_NO_CTA_ACH])
+                complete = (identificacion != "") & (banco != "") & (no_cta_ach != "")
+            skipped_rows_missing_data += int((~complete).sum())
+
+            with fase('resolucion'):
+                new_names = [name for name in banco[complete].unique() if name not in bank_resolutions]
+                for original, normalized in normalize_bank_names(pd.Series(new_names, dtype=object)).items():
+                    cod_ban, confidence = bank_index.lookup(normalized)
+                    bank_resolutions[original] = (normalized, cod_ban, confidence)
+                cod_banco = banco[complete].map(lambda name: bank_resolutions[name][1])
+
+            for i in cod_banco[cod_banco.isna()].index:
+                normalized, _, confidence = bank_resolutions[banco[i]]
                 bank_not_found_rows.append({
                     'fila': i+2,
-                    'identificacion': identificacion_val,
-                    'banco_original': excel_banco_name_val,
-                    'banco_normalizado': normalized_excel_banco
+                    'identificacion': identificacion[i],
+                    'banco_original': banco[i],
+                    'banco_normalizado': normalized,
+                    'similitud': confidence
                 })
-                continue
-            batch_updates.append((cod_banco_db, no_cta_ach_val, identificacion_val))
+            found = cod_banco.dropna()
+            for name in banco[found.index]:
+                if bank_resolutions[name][2] < 1.0:
+                    fuzzy_matches[name] += 1
+            batch_updates.extend(zip(found.tolist(), no_cta_ach[found.index].tolist(), identificacion[found.index].tolist()))
+        registrar_filas(processed_rows)
+        if processed_rows == 0:
+            print(f"El archivo XLSX '{XLSX_FILE_PATH}' está vacío.")
+            return
+        with fase('diferencias'):
+            current = load_current_bank_info(cursor, {cedula for _, _, cedula in batch_updates})
+            batch_updates, diff_counts = diff_bank_updates(batch_updates, current)
+        print(f"Comparación con la BD: {diff_counts['cambiados']} con cambios, {diff_counts['nuevos']} nuevos, "
+              f"{diff_counts['sin_cambios']} sin cambios, {diff_counts['sin_empleado']} sin empleado.")
         success_count = 0
-        if batch_updates:
+        per_cedula = None
+        if batch_updates and mode == 'staging':
+            try:
+                with fase('escritura'):
+                    per_cedula = apply_bank_updates_staging(cnx, cursor, batch_updates)
+                cnx.commit()
+                success_count = sum(changed for _, changed in per_cedula.values())
+                print(f"Actualización por tabla temporal completada. Empleados con cambios: {success_count}")
+            except mysql.connector.Error as db_err:
+                cnx.rollback()
+                per_cedula = None
+                write_error = f"Error en actualización por tabla temporal: {db_err}"
+                print(write_error)
+        elif batch_updates:
             query = "UPDATE nompersonal SET codbancob = %s, cuentacob = %s WHERE cedula = %s"
             try:
-                cursor.executemany(query, batch_updates)
+                with fase('escritura'):
+                    cursor.executemany(query, batch_updates)
                 cnx.commit()
                 success_count = cursor.rowcount
                 print(f"Actualización batch completada. Filas afectadas: {cursor.rowcount}")
             except mysql.connector.Error as db_err:
                 cnx.rollback()
-                print(f"Error en actualización batch: {db_err}")
-        print_summary(processed_rows, success_count, skipped_rows_missing_data, bank_not_found_rows)
+                write_error = f"Error en actualización batch: {db_err}"
+                print(write_error)
+        print_summary(processed_rows, success_count, skipped_rows_missing_data, bank_not_found_rows,
+                      fuzzy_matches, bank_resolutions, bank_index, diff_counts)
+        if per_cedula is not None:
+            print_staging_summary(per_cedula)
+        if write_error:
+            raise MigracionFallida(f"{write_error}. No se guardó ningún cambio.")
     except mysql.connector.Error as conn_err:
-        print(f"Error de conexión o base de datos: {conn_err}")
+        raise MigracionFallida(f"Error de conexión o base de datos: {conn_err}") from conn_err
     finally:
         if cursor:
             try:
@@ -117,18 +342,51 @@ def update_employee_bank_info():
             except:
                 pass
 
-def print_summary(processed_rows, success_count, skipped_rows, bank_not_found_rows):
+def print_summary(processed_rows, success_count, skipped_rows, bank_not_found_rows,
+                  fuzzy_matches=None, bank_resolutions=None, bank_index=None, diff_counts=None):
     print("\n--- Resumen de Ejecución ---")
     print(f"Total de filas leídas del XLSX: {processed_rows}")
     if skipped_rows > 0:
         print(f"Filas omitidas por falta de datos esenciales: {skipped_rows}")
+    if diff_counts is not None:
+        print(f"Cédulas sin cambios (no se escriben): {diff_counts['sin_cambios']}")
+        print(f"Cédulas con datos bancarios cambiados: {diff_counts['cambiados']}")
+        print(f"Cédulas sin datos bancarios previos (nuevos): {diff_counts['nuevos']}")
+        if diff_counts['sin_empleado']:
+            print(f"Cédulas sin empleado en nompersonal: {diff_counts['sin_empleado']}")
     print(f"Intentos de actualización batch: {success_count}")
+    if fuzzy_matches:
+        print(f"\nBancos resueltos por similitud (revisar): {sum(fuzzy_matches.values())} filas")
+        for name, count in fuzzy_matches.most_common():
+            _, cod_ban, confidence = bank_resolutions[name]
+            print(f"  '{name}' -> '{bank_index.names[cod_ban]}' (cod {cod_ban}, confianza {confidence:.2f}, {count} filas)")
     if bank_not_found_rows:
         print(f"\nBancos NO migrados (no encontrados en la BD): {len(bank_not_found_rows)}")
         for row in bank_not_found_rows:
-            print(f"  Fila {row['fila']} | ID: {row['identificacion']} | Banco original: '{row['banco_original']}' | Normalizado: '{row['banco_normalizado']}'")
+            print(f"  Fila {row['fila']} | ID: {row['identificacion']} | Banco original: '{row['banco_original']}' | Normalizado: '{row['banco_normalizado']}' | Similitud máx.: {row.get('similitud', 0):.2f}")
     print("--- Fin del Resumen ---")
 
+def print_staging_summary(per_cedula):
+    """Resumen por cédula del modo staging: sin empleado, con varios empleados y sin cambios."""
+    not_matched = sorted(cedula for cedula, (matched, _) in per_cedula.items() if matched == 0)
+    multiple = sorted(cedula for cedula, (matched, _) in per_cedula.items() if matched > 1)
+    unchanged = sum(1 for matched, changed in per_cedula.values() if matched and not changed)
+    print("\n--- Resultado por cédula (tabla temporal) ---")
+    print(f"Cédulas cargadas: {len(per_cedula)}")
+    print(f"Cédulas con empleado: {len(per_cedula) - len(not_matched)} (sin cambios: {unchanged})")
+    print(f"Empleados actualizados: {sum(changed for _, changed in per_cedula.values())}")
+    if not_matched:
+        print(f"Cédulas sin empleado en nompersonal: {len(not_matched)}")
+        for cedula in not_matched:
+            print(f"  {cedula}")
+    if multiple:
+        print(f"Cédulas asociadas a más de un empleado: {len(multiple)}")
+        for cedula in multiple:
+            print(f"  {cedula}: {per_cedula[cedula][0]} empleados")
+
 if __name__ == '__main__':
-    update_employee_bank_info()
+    try:
+        update_employee_bank_info()
+    except MigracionFallida as e:
+        print(f"❌ {e}")
     print("\nProceso de actualización finalizado.")
\ No newline at end of file
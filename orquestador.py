@@ -0,0 +1,243 @@
+import argparse
+import importlib
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Tabla de checkpoints (checkpoint.py) que escriben las migraciones que confirman por lotes
+CHECKPOINT = 'migracion_checkpoint'
+
+# Columnas de `nompersonal` que lee el índice de identidad (identidad_empleados)
+IDENTIDAD_NOMPERSONAL = [
+    'nompersonal.personal_id', 'nompersonal.ficha', 'nompersonal.cedula', 'nompersonal.nombres',
+    'nompersonal.apellidos', 'nompersonal.estado', 'nompersonal.fecing'
+]
+
+# Registro de migraciones. Cada una declara los recursos que lee y escribe, ya sea una tabla
+# completa ('nomcargos') o columnas de una tabla ('nompersonal.codbancob'). El orden de la
+# lista define la precedencia cuando dos migraciones entran en conflicto.
+MIGRACIONES = {
+    'bancos': {
+        'funcion': 'migrar_bancos:update_employee_bank_info',
+        'argumentos': [],
+        'conexion': False,
+        'lee': ['nombancos', 'nompersonal.cedula'],
+        'escribe': ['nompersonal.codbancob', 'nompersonal.cuentacob'],
+    },
+    'correos': {
+        'funcion': 'migracion_correos:migrar_correos_desde_excel',
+        'argumentos': ['formatos/Correos_V2.xlsx'],
+        'conexion': True,
+        # Las estadísticas de cobertura leen el correo, el email y la gerencia de cada empleado
+        'lee': IDENTIDAD_NOMPERSONAL + ['nompersonal.correo_institucional', 'nompersonal.email',
+                                        'nompersonal.codnivel1', 'nomnivel1'],
+        'escribe': ['nompersonal.correo_institucional'],
+    },
+    'discapacidad_144': {
+        'funcion': 'migracion_144:migrar_discapacidad_desde_excel',
+        'argumentos': ['formatos/144_horas.xlsx'],
+        'conexion': True,
+        'lee': IDENTIDAD_NOMPERSONAL + ['tipo_justificacion', 'dias_incapacidad'],
+        'escribe': ['nompersonal.tiene_discapacidad', 'nompersonal.discapacidad_senadis', 'dias_incapacidad',
+                    CHECKPOINT],
+    },
+    'acumulacion_144': {
+        'funcion': 'migracion_144:acumular_144_horas',
+        'argumentos': [],
+        'conexion': True,
+        'lee': ['nompersonal.ficha', 'nompersonal.tiene_discapacidad', 'tipo_justificacion', 'dias_incapacidad'],
+        'escribe': ['dias_incapacidad'],
+    },
+    'estructura': {
+        'funcion': 'migracion_posicion:migrar_estructura',
+        'argumentos': ['formatos/Estructura-Junio-2025.xlsx'],
+        'conexion': True,
+        'lee': ['cwprecue', 'nomcargos', 'nomposicion'],
+        'escribe': ['cwprecue', 'nomcargos', 'nomposicion', CHECKPOINT],
+    },
+    'casos_externos': {
+        'funcion': 'migracion_casos:migrar_casos_desde_hoja_excel',
+        'argumentos': ['formatos/CasosAbogados.xlsx', 'Externos'],
+        'conexion': True,
+        'lee': IDENTIDAD_NOMPERSONAL + ['abogados'],
+        'escribe': ['abogados', 'casos_legales'],
+    },
+    'casos_internos': {
+        'funcion': 'migracion_casos:migrar_casos_desde_hoja_excel',
+        'argumentos': ['formatos/CasosAbogados.xlsx', 'Internos'],
+        'conexion': True,
+        'lee': IDENTIDAD_NOMPERSONAL + ['abogados'],
+        'escribe': ['abogados', 'casos_legales'],
+    },
+    'sanciones': {
+        'funcion': 'migracion_sanciones:migrar_sanciones_desde_excel',
+        'argumentos': ['formatos/CasosSanciones.xlsx'],
+        'conexion': True,
+        'lee': IDENTIDAD_NOMPERSONAL + ['expediente', 'expediente_subtipo'],
+        'escribe': ['expediente', 'expediente_subtipo'],
+    },
+    'vacaciones': {
+        'funcion': 'migracion_vacaciones:migrar_vacaciones_desde_excel',
+        'argumentos': ['formatos/VACACIONES-AGOSTO.xlsx'],
+        'conexion': True,
+        'lee': IDENTIDAD_NOMPERSONAL,
+        'escribe': ['periodos_vacaciones', CHECKPOINT],
+    },
+    'capacitaciones': {
+        'funcion': 'migracion_capacitaciones:main',
+        'argumentos': [],
+        'conexion': False,
+        'lee': ['nompersonal.personal_id', 'nompersonal.nombres', 'nompersonal.apellidos',
+                'capacitaciones_proveedores', 'capacitaciones_cursos', 'capacitaciones_inscripciones'],
+        'escribe': ['capacitaciones_proveedores', 'capacitaciones_cursos',
+                    'capacitaciones_ofertas_cursos', 'capacitaciones_inscripciones'],
+    },
+}
+
+def recursos_se_solapan(recurso_a, recurso_b):
+    """'nompersonal' se solapa con cualquier 'nompersonal.x'; dos columnas solo si son la misma."""
+    tabla_a, _, columna_a = recurso_a.partition('.')
+    tabla_b, _, columna_b = recurso_b.partition('.')
+    if tabla_a != tabla_b:
+        return False
+    return not columna_a or not columna_b or columna_a == columna_b
+
+def _algun_solapamiento(recursos_a, recursos_b):
+    return any(recursos_se_solapan(a, b) for a in recursos_a for b in recursos_b)
+
+def hay_conflicto(migracion_a, migracion_b):
+    """Dos migraciones chocan si una escribe algo que la otra lee o escribe."""
+    return (
+        _algun_solapamiento(migracion_a['escribe'], migracion_b['escribe'] + migracion_b['lee'])
+        or _algun_solapamiento(migracion_b['escribe'], migracion_a['lee'])
+    )
+
+def construir_dag(nombres, migraciones=MIGRACIONES):
+    """
+    Retorna {nombre: set(dependencias)}. Entre dos migraciones en conflicto,
+    la que aparece antes en el registro se ejecuta primero.
+    """
+    orden = [nombre for nombre in migraciones if nombre in nombres]
+    dependencias = {nombre: set() for nombre in orden}
+    for i, posterior in enumerate(orden):
+        for anterior in orden[:i]:
+            if hay_conflicto(migraciones[anterior], migraciones[posterior]):
+                dependencias[posterior].add(anterior)
+    return dependencias
+
+def niveles_dag(dependencias):
+    """Agrupa las migraciones en niveles que pueden correr en paralelo (solo para mostrar el plan)."""
+    pendientes = dict(dependencias)
+    completadas = set()
+    niveles = []
+    while pendientes:
+        listas = [n for n, deps in pendientes.items() if deps <= completadas]
+        niveles.append(listas)
+        completadas.update(listas)
+        for nombre in listas:
+            del pendientes[nombre]
+    return niveles
+
+def ejecutar_migracion(nombre):
+    """
+    Punto de entrada de cada worker: importa el script y llama a su función principal.
+    Un script que no pudo completarse lanza `registro.MigracionFallida`, que llega al
+    orquestador como fallo.
+    """
+    # Las importaciones van aquí para que cada proceso cree su propio pool de conexiones
+    from sesion_db import crear_conexion_db
+    from instrumentacion import instrumentacion_habilitada, iniciar_instrumentacion, finalizar_instrumentacion
+
+    # Un worker puede ejecutar varias migraciones: cada una lleva su propio reporte
+    if instrumentacion_habilitada():
+        iniciar_instrumentacion(nombre)
+
+    migracion = MIGRACIONES[nombre]
+    modulo_nombre, funcion_nombre = migracion['funcion'].split(':')
+    funcion = getattr(importlib.import_module(modulo_nombre), funcion_nombre)
+
+    inicio = time.perf_counter()
+    try:
+        if migracion['conexion']:
+            connection = crear_conexion_db()
+            if connection is None:
+                raise RuntimeError(f"No se pudo conectar a la base de datos para '{nombre}'")
+            try:
+                funcion(*migracion['argumentos'], connection)
+            finally:
+                connection.close()
+        else:
+            funcion(*migracion['argumentos'])
+    finally:
+        finalizar_instrumentacion()
+    return time.perf_counter() - inicio
+
+def ejecutar_orquestado(nombres, max_workers=None):
+    """Ejecuta las migraciones respetando el DAG; las que no tienen conflictos corren a la vez."""
+    dependencias = construir_dag(nombres)
+    completadas = set()
+    fallidas = set()
+    tiempos = {}
+    en_curso = {}
+
+    inicio = time.perf_counter()
+    # 'spawn' evita heredar conexiones o estado de MySQL del proceso padre
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=contexto) as executor:
+        while len(completadas) + len(fallidas) < len(dependencias):
+            for nombre, deps in dependencias.items():
+                if nombre in completadas or nombre in fallidas or nombre in en_curso.values():
+                    continue
+                if deps & fallidas:
+                    print(f"⏭️  {nombre}: omitida porque falló una dependencia ({', '.join(sorted(deps & fallidas))})")
+                    fallidas.add(nombre)
+                elif deps <= completadas:
+                    print(f"▶️  Iniciando {nombre}")
+                    en_curso[executor.submit(ejecutar_migracion, nombre)] = nombre
+
+            if not en_curso:
+                continue
+
+            terminadas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                nombre = en_curso.pop(futuro)
+                try:
+                    tiempos[nombre] = futuro.result()
+                    completadas.add(nombre)
+                    print(f"✅ {nombre} terminada en {tiempos[nombre]:.1f}s")
+                except Exception as e:
+                    fallidas.add(nombre)
+                    print(f"❌ {nombre} falló: {e}")
+
+    total = time.perf_counter() - inicio
+    print("\n" + "=" * 60)
+    print("RESUMEN DE LA EJECUCIÓN ORQUESTADA")
+    for nombre in dependencias:
+        estado = f"{tiempos[nombre]:.1f}s" if nombre in tiempos else "FALLIDA/OMITIDA"
+        print(f"  {nombre:<20} {estado}")
+    print(f"Tiempo total: {total:.1f}s (suma secuencial: {sum(tiempos.values()):.1f}s)")
+    print("=" * 60)
+    return not fallidas
+
+# --- Ejecución Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ejecuta las migraciones en paralelo respetando sus dependencias.")
+    parser.add_argument('migraciones', nargs='*', help=f"Migraciones a ejecutar (por defecto todas): {', '.join(MIGRACIONES)}")
+    parser.add_argument('--workers', type=int, default=None, help="Máximo de procesos en paralelo")
+    parser.add_argument('--mostrar-plan', action='store_true', help="Solo muestra el orden de ejecución")
+    args = parser.parse_args()
+
+    seleccion = args.migraciones or list(MIGRACIONES)
+    desconocidas = [n for n in seleccion if n not in MIGRACIONES]
+    if desconocidas:
+        parser.error(f"Migraciones desconocidas: {', '.join(desconocidas)}")
+
+    if args.mostrar_plan:
+        dag = construir_dag(seleccion)
+        for i, nivel in enumerate(niveles_dag(dag), start=1):
+            print(f"Nivel {i}: {', '.join(nivel)}")
+        for nombre, deps in dag.items():
+            if deps:
+                print(f"  {nombre} espera a: {', '.join(sorted(deps))}")
+    else:
+        ejecutar_orquestado(seleccion, args.workers)
@@ -0,0 +1,360 @@
+import argparse
+import importlib
+import json
+import os
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from cache_excel import hash_archivo
+from instrumentacion import fase
+from orquestador import MIGRACIONES
+from sesion_db import crear_conexion_db, insertar_multifila, max_allowed_packet, _dividir_values
+
+try:
+    import msgpack
+except ImportError:  # msgpack es opcional: sin él el plan se guarda como JSON
+    msgpack = None
+
+# ==============================================================================
+# Modo plan/aplicar.
+#
+# `plan`: ejecuta la migración sobre una conexión que lee de una transacción de solo lectura
+# (snapshot consistente) y, en lugar de escribir, registra cada INSERT/UPDATE/DELETE. El
+# resultado es un archivo con las sentencias agrupadas (msgpack, o JSON si no está instalado).
+# `aplicar`: ejecuta un plan revisado en una sola transacción, con INSERT multi-fila.
+# Los efectos fuera de la BD (por ejemplo el snapshot de vacaciones) se registran con
+# `al_aplicar` y se ejecutan después del commit de `aplicar`, no al planificar.
+# El mismo plan se puede aplicar en staging y en producción sin volver a leer el Excel.
+# ==============================================================================
+
+VERSION_PLAN = 1
+
+# Migraciones que no se pueden planificar: necesitan ver el resultado de sus propias escrituras
+NO_PLANIFICABLES = {
+    'casos_externos': "usa el id (lastrowid) de los abogados que crea",
+    'casos_internos': "usa el id (lastrowid) de los abogados que crea",
+    'sanciones': "lee el correlativo del subtipo después de incrementarlo",
+    'bancos': "abre su propia conexión",
+    'capacitaciones': "abre su propia conexión y usa los id (lastrowid) que crea",
+}
+
+class PlanNoSoportado(Exception):
+    pass
+
+def _tabla_escrita(operacion):
+    coincidencia = re.match(
+        r'(?is)^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|UPDATE|DELETE\s+FROM|TRUNCATE\s+TABLE|REPLACE\s+INTO)\s+`?(\w+)`?',
+        operacion
+    )
+    return coincidencia.group(1) if coincidencia else None
+
+def _tablas_leidas(operacion):
+    return set(re.findall(r'(?i)\b(?:FROM|JOIN)\s+`?(\w+)`?', operacion))
+
+def _es_lectura(operacion):
+    return re.match(r'(?is)^\s*(SELECT|SHOW|WITH)\b', operacion) is not None
+
+def _normalizar_parametros(parametros):
+    # Los valores de pandas/numpy (np.int64, np.float64) se convierten a tipos de Python
+    return [v.item() if hasattr(v, 'item') and not isinstance(v, (Decimal, date)) else v for v in (parametros or ())]
+
+class CursorPlan:
+    """Cursor que ejecuta lecturas en el snapshot y registra las escrituras en el plan."""
+
+    def __init__(self, conexion_plan, cursor):
+        self._conexion_plan = conexion_plan
+        self._cursor = cursor
+        self._rowcount = None
+        self._inserto = False
+
+    def execute(self, operacion, parametros=None, *args, **kwargs):
+        if _es_lectura(operacion):
+            self._rowcount = None
+            self._conexion_plan.verificar_lectura(operacion)
+            return self._cursor.execute(operacion, parametros, *args, **kwargs)
+        self._conexion_plan.registrar(operacion, parametros)
+        # Se asume que la escritura afecta una fila (los scripts validan rowcount > 0)
+        self._rowcount = 1
+        self._inserto = operacion.lstrip()[:6].upper() == 'INSERT'
+
+    def executemany(self, operacion, secuencia, *args, **kwargs):
+        filas = 0
+        for parametros in secuencia:
+            self._conexion_plan.registrar(operacion, parametros)
+            filas += 1
+        self._rowcount = filas
+
+    @property
+    def rowcount(self):
+        return self._rowcount if self._rowcount is not None else self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        if self._inserto:
+            raise PlanNoSoportado("El script usa lastrowid de un INSERT: no se puede planificar")
+        return self._cursor.lastrowid
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+class ConexionPlan:
+    """
+    Envuelve una conexión real. Abre una transacción READ ONLY con snapshot consistente;
+    `commit()` confirma las escrituras registradas desde el último commit y `rollback()`
+    las descarta, igual que lo haría la base de datos.
+    """
+    modo_plan = True
+
+    def __init__(self, connection):
+        object.__setattr__(self, '_connection', connection)
+        object.__setattr__(self, 'confirmadas', [])
+        object.__setattr__(self, 'pendientes', [])
+        object.__setattr__(self, 'tablas_escritas', set())
+        object.__setattr__(self, 'advertencias', [])
+        object.__setattr__(self, 'acciones', [])
+        cursor = connection.cursor()
+        try:
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+        finally:
+            cursor.close()
+
+    def cursor(self, *args, **kwargs):
+        return CursorPlan(self, self._connection.cursor(*args, **kwargs))
+
+    def registrar(self, operacion, parametros):
+        self.pendientes.append((re.sub(r'\s+', ' ', operacion).strip(), _normalizar_parametros(parametros)))
+        tabla = _tabla_escrita(operacion)
+        if tabla:
+            self.tablas_escritas.add(tabla)
+
+    def verificar_lectura(self, operacion):
+        for tabla in _tablas_leidas(operacion) & self.tablas_escritas:
+            advertencia = f"Se lee `{tabla}` después de planificar escrituras sobre ella: el plan no ve sus propios cambios"
+            if advertencia not in self.advertencias:
+                self.advertencias.append(advertencia)
+
+    def commit(self):
+        self.confirmadas.extend(self.pendientes)
+        self.pendientes.clear()
+
+    def rollback(self):
+        self.pendientes.clear()
+
+    def terminar(self):
+        """Cierra el snapshot; lo que quedó sin commit no entra al plan."""
+        self._connection.rollback()
+
+    def __getattr__(self, nombre):
+        return getattr(self._connection, nombre)
+
+    def __setattr__(self, nombre, valor):
+        # `autocommit` y demás ajustes de sesión no se aplican durante el plan
+        pass
+
+def al_aplicar(connection, funcion, *argumentos):
+    """
+    Ejecuta `funcion(*argumentos)` ya o, si `connection` es de un plan, la registra para que
+    `aplicar_plan` la ejecute después de su commit. `funcion` debe estar definida a nivel de
+    módulo (se guarda como 'modulo:nombre') y los argumentos deben poder guardarse en el plan.
+    """
+    if not getattr(connection, 'modo_plan', False):
+        return funcion(*argumentos)
+    connection.acciones.append({'funcion': f"{funcion.__module__}:{funcion.__name__}",
+                                'argumentos': list(argumentos)})
+
+def ejecutar_acciones(acciones):
+    """Ejecuta las acciones registradas con `al_aplicar`. Retorna las que fallaron: [(funcion, error)]."""
+    fallidas = []
+    for accion in acciones:
+        modulo_nombre, funcion_nombre = accion['funcion'].split(':')
+        try:
+            getattr(importlib.import_module(modulo_nombre), funcion_nombre)(*accion['argumentos'])
+        except Exception as e:
+            fallidas.append((accion['funcion'], e))
+    return fallidas
+
+def _insert_una_fila(sql):
+    """True si es un INSERT ... VALUES de una sola tupla (se puede reenviar multi-fila)."""
+    if not re.match(r'(?i)^\s*INSERT\s', sql):
+        return False
+    try:
+        return not _dividir_values(sql)[2].lstrip().startswith(',')
+    except ValueError:
+        return False
+
+def agrupar_sentencias(operaciones):
+    """Agrupa sentencias consecutivas idénticas conservando el orden: [{'sql', 'filas'}]."""
+    grupos = []
+    for sql, parametros in operaciones:
+        if grupos and grupos[-1]['sql'] == sql:
+            grupos[-1]['filas'].append(parametros)
+        else:
+            grupos.append({'sql': sql, 'filas': [parametros]})
+    return grupos
+
+def resumen_plan(grupos):
+    resumen = {}
+    for grupo in grupos:
+        tabla = _tabla_escrita(grupo['sql']) or '(sesión)'
+        operacion = grupo['sql'].split()[0].upper()
+        conteo = resumen.setdefault(tabla, {})
+        conteo[operacion] = conteo.get(operacion, 0) + len(grupo['filas'])
+    return resumen
+
+# --- Serialización -----------------------------------------------------------
+
+def _codificar(valor):
+    if isinstance(valor, Decimal):
+        return {'__dec': str(valor)}
+    if isinstance(valor, datetime):
+        return {'__dt': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'__d': valor.isoformat()}
+    if isinstance(valor, (bytes, bytearray)):
+        return {'__b': bytes(valor).hex()}
+    if hasattr(valor, 'item'):
+        return valor.item()
+    raise TypeError(f"Tipo no serializable en el plan: {type(valor).__name__}")
+
+def _decodificar(objeto):
+    if len(objeto) == 1:
+        if '__dec' in objeto:
+            return Decimal(objeto['__dec'])
+        if '__dt' in objeto:
+            return datetime.fromisoformat(objeto['__dt'])
+        if '__d' in objeto:
+            return date.fromisoformat(objeto['__d'])
+        if '__b' in objeto:
+            return bytes.fromhex(objeto['__b'])
+    return objeto
+
+def guardar_plan(plan, ruta):
+    if msgpack is not None and not ruta.endswith('.json'):
+        with open(ruta, 'wb') as archivo:
+            archivo.write(msgpack.packb(plan, default=_codificar, use_bin_type=True))
+    else:
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump(plan, archivo, default=_codificar, ensure_ascii=False)
+
+def cargar_plan(ruta):
+    if ruta.endswith('.json'):
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo, object_hook=_decodificar)
+    if msgpack is None:
+        raise RuntimeError("Se necesita msgpack para leer planes .msgpack")
+    with open(ruta, 'rb') as archivo:
+        return msgpack.unpackb(archivo.read(), object_hook=_decodificar, raw=False, strict_map_key=False)
+
+# --- Fases ---------------------------------------------------------------------
+
+def planificar(nombre, connection, ruta_plan=None):
+    """Ejecuta la migración `nombre` en modo plan y guarda el plan. Retorna la ruta."""
+    if nombre in NO_PLANIFICABLES:
+        raise PlanNoSoportado(f"'{nombre}' no se puede planificar: {NO_PLANIFICABLES[nombre]}")
+    migracion = MIGRACIONES[nombre]
+    modulo_nombre, funcion_nombre = migracion['funcion'].split(':')
+    funcion = getattr(importlib.import_module(modulo_nombre), funcion_nombre)
+
+    origen = {}
+    if migracion['argumentos'] and os.path.exists(migracion['argumentos'][0]):
+        origen = {'archivo': migracion['argumentos'][0], 'hash': hash_archivo(migracion['argumentos'][0])}
+
+    conexion_plan = ConexionPlan(connection)
+    try:
+        funcion(*migracion['argumentos'], conexion_plan)
+    finally:
+        conexion_plan.terminar()
+
+    grupos = agrupar_sentencias(conexion_plan.confirmadas)
+    plan = {
+        'version': VERSION_PLAN,
+        'migracion': nombre,
+        'creado': datetime.now().isoformat(timespec='seconds'),
+        'origen': origen,
+        'advertencias': conexion_plan.advertencias,
+        'resumen': resumen_plan(grupos),
+        'sentencias': grupos,
+        'acciones': conexion_plan.acciones,
+    }
+    extension = 'msgpack' if msgpack is not None else 'json'
+    ruta_plan = ruta_plan or f"plan_{nombre}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    guardar_plan(plan, ruta_plan)
+    mostrar_plan(plan)
+    print(f"\n💾 Plan guardado en: {ruta_plan}")
+    return ruta_plan
+
+def mostrar_plan(plan):
+    print(f"\n=== Plan de '{plan['migracion']}' ({plan['creado']}) ===")
+    if plan.get('origen'):
+        print(f"Origen: {plan['origen']['archivo']} (sha256 {plan['origen']['hash'][:12]}…)")
+    for tabla, conteo in plan['resumen'].items():
+        detalle = ', '.join(f"{operacion}: {cantidad}" for operacion, cantidad in conteo.items())
+        print(f"  {tabla:<30} {detalle}")
+    for accion in plan.get('acciones', []):
+        print(f"  Después de aplicar: {accion['funcion']}")
+    for advertencia in plan.get('advertencias', []):
+        print(f"⚠️  {advertencia}")
+
+def aplicar_plan(ruta_plan, connection):
+    """
+    Ejecuta el plan en una sola transacción. Los INSERT de una fila se envían multi-fila.
+    Tras el commit ejecuta las acciones del plan (`al_aplicar`).
+    """
+    plan = cargar_plan(ruta_plan)
+    if plan.get('version') != VERSION_PLAN:
+        raise ValueError(f"Versión de plan no soportada: {plan.get('version')}")
+    mostrar_plan(plan)
+
+    max_bytes = max_allowed_packet(connection) // 2
+    cursor = connection.cursor()
+    try:
+        with fase('escritura'):
+            for grupo in plan['sentencias']:
+                sql, filas = grupo['sql'], grupo['filas']
+                if _insert_una_fila(sql) and len(filas) > 1:
+                    insertar_multifila(cursor, sql, filas, max_bytes=max_bytes)
+                elif len(filas) == 1:
+                    cursor.execute(sql, filas[0] or None)
+                else:
+                    cursor.executemany(sql, filas)
+        connection.commit()
+        print(f"✅ Plan aplicado: {sum(len(g['filas']) for g in plan['sentencias'])} operaciones.")
+    except Exception as e:
+        connection.rollback()
+        print(f"❌ Error aplicando el plan, se revirtieron los cambios: {e}")
+        raise
+    finally:
+        cursor.close()
+
+    # Los datos ya están confirmados: una acción fallida solo se informa
+    for funcion, error in ejecutar_acciones(plan.get('acciones', [])):
+        print(f"⚠️  El plan se aplicó, pero falló {funcion}: {error}. Ejecútela a mano antes de la próxima migración.")
+
+# --- Ejecución Principal ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera o aplica planes de migración.")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    parser_plan = subcomandos.add_parser('plan', help="Genera el plan de una migración sin escribir en la BD")
+    parser_plan.add_argument('migracion', choices=[n for n in MIGRACIONES if n not in NO_PLANIFICABLES])
+    parser_plan.add_argument('--salida', help="Ruta del plan (.msgpack o .json)")
+    parser_aplicar = subcomandos.add_parser('aplicar', help="Aplica un plan generado antes")
+    parser_aplicar.add_argument('plan')
+    parser_ver = subcomandos.add_parser('ver', help="Muestra el resumen de un plan")
+    parser_ver.add_argument('plan')
+    args = parser.parse_args()
+
+    if args.comando == 'ver':
+        mostrar_plan(cargar_plan(args.plan))
+    else:
+        db_connection = crear_conexion_db()
+        if db_connection:
+            try:
+                if args.comando == 'plan':
+                    planificar(args.migracion, db_connection, args.salida)
+                else:
+                    aplicar_plan(args.plan, db_connection)
+            finally:
+                db_connection.close()
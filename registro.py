@@ -0,0 +1,143 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from collections import Counter
+from datetime import date, datetime
+
+# ==============================================================================
+# Registro de las migraciones.
+#
+# Los mensajes por fila van a nivel DEBUG y solo se ven con MIGRACION_LOG_NIVEL=DEBUG;
+# por defecto la consola muestra progreso y resúmenes. La escritura la hace un hilo
+# (QueueListener), así el bucle principal no se bloquea en stdout; arranca con el primer mensaje,
+# no al importar, y escribe en el sys.stdout vigente en ese momento. Con MIGRACION_LOG_ARCHIVO
+# también se guarda todo en un archivo. Las filas rechazadas van a un JSONL en RECHAZOS_DIR.
+# ==============================================================================
+
+NIVEL = os.getenv('MIGRACION_LOG_NIVEL', 'INFO').upper()
+RECHAZOS_DIR = os.getenv('MIGRACION_RECHAZOS_DIR', 'rechazos')
+PROGRESO_CADA = int(os.getenv('MIGRACION_PROGRESO_CADA', 1000))
+
+_cola = None
+_listener = None
+_bloqueo = threading.Lock()
+
+class MigracionFallida(Exception):
+    """
+    La migración no se completó (archivo ilegible, sin conexión, transacción revertida...).
+    Los scripts la lanzan en lugar de solo imprimir el error para que el orquestador la cuente
+    como fallida y omita las que dependen de ella; ejecutados solos, la muestran y terminan.
+    """
+
+class _ConsolaActual(logging.StreamHandler):
+    """Escribe en el sys.stdout de cada momento, así respeta contextlib.redirect_stdout."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, valor):
+        pass
+
+class _ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler que arranca el hilo escritor al recibir el primer mensaje."""
+
+    def emit(self, record):
+        if _listener is None:
+            _iniciar_listener()
+        super().emit(record)
+
+def _iniciar_listener():
+    global _listener
+    with _bloqueo:
+        if _listener is not None:
+            return
+        _listener = _crear_listener()
+        _listener.start()
+        atexit.register(_listener.stop)
+
+def _crear_listener():
+    consola = _ConsolaActual()
+    consola.setFormatter(logging.Formatter('%(message)s'))
+    manejadores = [consola]
+
+    ruta_archivo = os.getenv('MIGRACION_LOG_ARCHIVO')
+    if ruta_archivo:
+        archivo = logging.FileHandler(ruta_archivo, encoding='utf-8')
+        archivo.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        manejadores.append(archivo)
+
+    return logging.handlers.QueueListener(_cola, *manejadores, respect_handler_level=True)
+
+def _configurar_raiz():
+    global _cola
+    _cola = queue.Queue(-1)
+    raiz = logging.getLogger('migracion')
+    raiz.setLevel(getattr(logging, NIVEL, logging.INFO))
+    raiz.addHandler(_ManejadorCola(_cola))
+    raiz.propagate = False
+
+def obtener_logger(nombre):
+    """Logger 'migracion.<nombre>'. Se puede pedir al importar: no arranca ningún hilo."""
+    if _cola is None:
+        _configurar_raiz()
+    return logging.getLogger(f'migracion.{nombre}')
+
+def esperar_registro():
+    """Bloquea hasta que el hilo escritor vació la cola (para no intercalar con print)."""
+    if _listener is not None:
+        _cola.join()
+
+def _serializable(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, (str, int, float, bool)) or valor is None:
+        return valor
+    return str(valor)
+
+class ResumenMigracion:
+    """
+    Acumula los rechazos de una migración: los cuenta por motivo y escribe cada fila
+    rechazada como una línea JSON en RECHAZOS_DIR/<nombre>_<fecha>.jsonl.
+    """
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.logger = obtener_logger(nombre)
+        self.motivos = Counter()
+        self.ruta_rechazos = None
+        self._archivo = None
+
+    def rechazar(self, fila, motivo, **datos):
+        self.motivos[motivo] += 1
+        if self._archivo is None:
+            os.makedirs(RECHAZOS_DIR, exist_ok=True)
+            marca = datetime.now().strftime('%Y%m%d_%H%M%S')
+            self.ruta_rechazos = os.path.join(RECHAZOS_DIR, f"{self.nombre}_{marca}_{os.getpid()}.jsonl")
+            self._archivo = open(self.ruta_rechazos, 'w', encoding='utf-8')
+        registro = {'fila': _serializable(fila), 'motivo': motivo}
+        registro.update({clave: _serializable(valor) for clave, valor in datos.items()})
+        self._archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        self.logger.debug(f"Fila {fila}: {motivo} {datos or ''}")
+
+    def progreso(self, procesadas, total=None):
+        if procesadas and procesadas % PROGRESO_CADA == 0:
+            sufijo = f"/{total}" if total else ""
+            self.logger.info(f"  … {procesadas}{sufijo} filas procesadas")
+
+    def cerrar(self):
+        """Cierra el archivo de rechazos, imprime el conteo por motivo y vacía la cola de logs."""
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+        if self.motivos:
+            self.logger.info(f"Filas rechazadas: {sum(self.motivos.values())} (detalle en {self.ruta_rechazos})")
+            for motivo, cantidad in self.motivos.most_common():
+                self.logger.info(f"  - {motivo}: {cantidad}")
+        esperar_registro()
@@ -0,0 +1,267 @@
+from mysql.connector import Error, pooling
+import io
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from dotenv import load_dotenv
+from instrumentacion import instrumentar_conexion
+
+# Cargar variables de entorno desde el archivo .env
+load_dotenv()
+
+POOL_NOMBRE = 'migraciones'
+POOL_TAMANO_DEFECTO = 5
+
+_pool = None
+
+def configuracion_db():
+    """
+    Parámetros de conexión tomados del .env (DB_HOST, DB_USER, DB_PASSWORD, DB_DATABASE).
+    Con DB_LOCAL_INFILE=1 se habilita LOAD DATA LOCAL INFILE (ver `cargar_datos_local`); el
+    servidor también debe tener local_infile=ON.
+    """
+    configuracion = {
+        'host': os.getenv('DB_HOST'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'database': os.getenv('DB_DATABASE'),
+    }
+    if os.getenv('DB_LOCAL_INFILE') == '1':
+        configuracion['allow_local_infile'] = True
+    return configuracion
+
+def obtener_pool():
+    """
+    Pool de conexiones del proceso actual. Se crea la primera vez que se pide;
+    cada proceso (por ejemplo, cada worker del orquestador) tiene el suyo.
+    El tamaño se configura con DB_POOL_SIZE.
+    """
+    global _pool
+    if _pool is None:
+        _pool = pooling.MySQLConnectionPool(
+            pool_name=POOL_NOMBRE,
+            pool_size=int(os.getenv('DB_POOL_SIZE', POOL_TAMANO_DEFECTO)),
+            # Al devolver la conexión se reinician las variables de sesión
+            # (autocommit, unique_checks, foreign_key_checks...)
+            pool_reset_session=True,
+            **configuracion_db()
+        )
+    return _pool
+
+def crear_conexion_db(carga_masiva=False, **opciones_carga):
+    """
+    Obtiene una conexión del pool. `connection.close()` la devuelve al pool.
+    Con `carga_masiva=True` aplica `configurar_carga_masiva(connection, **opciones_carga)`.
+    Si la instrumentación está activa (MIGRACION_INSTRUMENTAR=1) la conexión se entrega envuelta.
+    """
+    try:
+        connection = instrumentar_conexion(obtener_pool().get_connection())
+        if connection.is_connected():
+            print("Conexión a MySQL exitosa.")
+            if carga_masiva:
+                configurar_carga_masiva(connection, **opciones_carga)
+            return connection
+    except Error as e:
+        print(f"Error al conectar a MySQL: {e}")
+        return None
+    return None
+
+def configurar_carga_masiva(connection, unique_checks=True, foreign_key_checks=True):
+    """
+    Ajustes de sesión para cargas grandes: autocommit desactivado y, opcionalmente,
+    sin verificación de claves únicas/foráneas. Solo afecta a esta conexión y se
+    revierte al devolverla al pool.
+    """
+    connection.autocommit = False
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SET SESSION unique_checks = {1 if unique_checks else 0}")
+        cursor.execute(f"SET SESSION foreign_key_checks = {1 if foreign_key_checks else 0}")
+    finally:
+        cursor.close()
+
+def max_allowed_packet(connection):
+    """
+    Tamaño máximo de paquete aceptado por el servidor. En MySQL 8 la variable de sesión
+    es de solo lectura, así que en lugar de subirla se usa para dimensionar los lotes.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT @@max_allowed_packet")
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+def indice_unico(cursor, tabla, columna):
+    """
+    True si `columna` tiene por sí sola un índice único (o es la clave primaria) en `tabla`
+    de la base actual. Un índice único compuesto no cuenta: no impide repetir la columna.
+    """
+    cursor.execute(
+        """SELECT COUNT(*) FROM information_schema.STATISTICS s
+           WHERE s.TABLE_SCHEMA = DATABASE() AND s.TABLE_NAME = %s AND s.COLUMN_NAME = %s AND s.NON_UNIQUE = 0
+             AND NOT EXISTS (
+                 SELECT 1 FROM information_schema.STATISTICS o
+                 WHERE o.TABLE_SCHEMA = s.TABLE_SCHEMA AND o.TABLE_NAME = s.TABLE_NAME
+                   AND o.INDEX_NAME = s.INDEX_NAME AND o.COLUMN_NAME <> s.COLUMN_NAME)""",
+        (tabla, columna)
+    )
+    return cursor.fetchone()[0] > 0
+
+def _dividir_values(sentencia):
+    """
+    Separa 'INSERT ... VALUES (%s, ..., NOW()) [ON DUPLICATE KEY UPDATE ...]' en
+    (prefijo, tupla de una fila, resto). La tupla se localiza balanceando paréntesis.
+    """
+    coincidencia = re.search(r'(?i)\bVALUES\s*\(', sentencia)
+    if not coincidencia:
+        raise ValueError("La sentencia no tiene cláusula VALUES")
+    inicio = coincidencia.end() - 1
+    profundidad = 0
+    for posicion in range(inicio, len(sentencia)):
+        if sentencia[posicion] == '(':
+            profundidad += 1
+        elif sentencia[posicion] == ')':
+            profundidad -= 1
+            if profundidad == 0:
+                return sentencia[:inicio], sentencia[inicio:posicion + 1], sentencia[posicion + 1:]
+    raise ValueError("Paréntesis desbalanceados en VALUES")
+
+def insertar_multifila(cursor, sentencia, filas, max_bytes=1024 * 1024, max_filas=1000):
+    """
+    Ejecuta un INSERT de una fila (`VALUES (%s, ...)`) para todas las `filas` usando sentencias
+    multi-fila. Cada sentencia lleva como máximo `max_filas` filas y aproximadamente `max_bytes`
+    de datos (usar `max_allowed_packet(connection)` como referencia). Retorna las filas enviadas.
+    """
+    filas = [tuple(fila) for fila in filas]
+    if not filas:
+        return 0
+    prefijo, tupla, resto = _dividir_values(sentencia)
+
+    def enviar(lote):
+        cursor.execute(prefijo + ', '.join([tupla] * len(lote)) + resto, [v for fila in lote for v in fila])
+
+    lote = []
+    bytes_lote = 0
+    for fila in filas:
+        bytes_fila = len(tupla) + sum(len(str(v)) + 3 for v in fila)
+        if lote and (len(lote) >= max_filas or bytes_lote + bytes_fila > max_bytes):
+            enviar(lote)
+            lote = []
+            bytes_lote = 0
+        lote.append(fila)
+        bytes_lote += bytes_fila
+    enviar(lote)
+    return len(filas)
+
+class BufferInserciones:
+    """
+    Acumula filas en memoria y las envía juntas con `enviar(filas)` (por ejemplo
+    `insertar_multifila` o `cargar_datos_local`) al llamar a `vaciar()`, típicamente justo
+    antes de cada commit para que las filas queden en la misma transacción.
+    Las filas se agregan por grupos (`clave` identifica, por ejemplo, la fila de origen): si el
+    envío conjunto falla, lo pendiente se conserva y `reintentar` lo reenvía grupo por grupo.
+    """
+
+    def __init__(self, enviar):
+        self.enviar = enviar
+        self.pendientes = []
+        self.enviadas = 0
+
+    def agregar(self, filas, clave=None):
+        if filas:
+            self.pendientes.append((clave, filas))
+
+    def vaciar(self):
+        if self.pendientes:
+            self.enviadas += self.enviar([fila for _, filas in self.pendientes for fila in filas])
+            self.pendientes = []
+
+    def reintentar(self, cursor, savepoint='grupo_buffer'):
+        """
+        Reenvía lo pendiente grupo por grupo, cada uno con su SAVEPOINT, después de un `vaciar()`
+        fallido y su rollback. Retorna [(clave, error)] de los grupos que no se pudieron enviar.
+        """
+        fallidos = []
+        for clave, filas in self.pendientes:
+            cursor.execute(f"SAVEPOINT {savepoint}")
+            try:
+                self.enviadas += self.enviar(filas)
+            except Error as e:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                fallidos.append((clave, e))
+        self.pendientes = []
+        return fallidos
+
+def _valor_carga(valor):
+    """Valor en el formato por defecto de LOAD DATA (campos separados por tabulador, escape con \\)."""
+    if valor is None:
+        return '\\N'
+    if isinstance(valor, bool):
+        return '1' if valor else '0'
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return format(valor, 'f')
+    texto = str(valor)
+    for caracter, escape in (('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r'), ('\0', '\\0')):
+        texto = texto.replace(caracter, escape)
+    return texto
+
+def cargar_datos_local(cursor, tabla, columnas, filas):
+    """
+    Carga `filas` en `tabla` con LOAD DATA LOCAL INFILE. Las filas se arman en un buffer en
+    memoria y se escriben a un archivo temporal, que es lo que acepta el conector.
+    Requiere DB_LOCAL_INFILE=1 y local_infile=ON en el servidor. Retorna las filas enviadas.
+    """
+    buffer = io.StringIO()
+    cantidad = 0
+    for fila in filas:
+        buffer.write('\t'.join(_valor_carga(valor) for valor in fila))
+        buffer.write('\n')
+        cantidad += 1
+    if not cantidad:
+        return 0
+    archivo = tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.tsv', delete=False)
+    try:
+        with archivo:
+            archivo.write(buffer.getvalue())
+        ruta = archivo.name.replace('\\', '/')
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{ruta}' INTO TABLE {tabla} CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({', '.join(columnas)})"
+        )
+    finally:
+        os.unlink(archivo.name)
+    return cantidad
+
+def cursor_preparado(connection):
+    """
+    Cursor de sentencias preparadas del lado del servidor. La sentencia se prepara una
+    sola vez y se reutiliza mientras el cursor ejecute la misma consulta, por lo que
+    conviene dedicar un cursor a cada INSERT/UPDATE repetido dentro de un bucle.
+    """
+    return connection.cursor(prepared=True)
+
+@contextmanager
+def conexion_tarea(carga_masiva=False, **opciones_carga):
+    """
+    Conexión propia para una tarea (hilo o proceso): confirma al terminar sin errores,
+    revierte si hay una excepción y siempre devuelve la conexión al pool.
+    """
+    connection = instrumentar_conexion(obtener_pool().get_connection())
+    try:
+        if carga_masiva:
+            configurar_carga_masiva(connection, **opciones_carga)
+        yield connection
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()